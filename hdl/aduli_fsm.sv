@@ -11,26 +11,40 @@ typedef enum logic [1:0] {
 } aduli_state_t;
 `endif
 
+// start_in runs a full calibration, NUM_STEPS steps the first of which wipes the table.
+// recalibrate_in checks the table instead: VERIFY_STEPS verification steps (verify_out), the first steps of a
+// calibration, in which calibration_step_fsm flags the blocks that do not match and starts them over. Only if
+// it flagged any (verify_failed_in when a step ends) a repair pass (repair_out) runs the remaining steps for
+// those. A layout that did not change costs VERIFY_STEPS steps, one that did costs NUM_STEPS steps like a
+// full calibration (a new LED in a block needs every address bit), but only the flagged blocks are written.
 module aduli_fsm #(
     parameter int NUM_LEDS = 50,
     parameter int LED_ADDRESS_WIDTH = $clog2(NUM_LEDS),
-    parameter int LED_ADDR_BIT_SEL_WIDTH = $clog2(LED_ADDRESS_WIDTH)
+    parameter int LED_ADDR_BIT_SEL_WIDTH = $clog2(LED_ADDRESS_WIDTH),
+    // address bits id_shower shows per calibration step, led_addr_bit_sel_out counts steps
+    parameter int BITS_PER_STEP = 1,
+    localparam int NUM_STEPS = (LED_ADDRESS_WIDTH + BITS_PER_STEP - 1) / BITS_PER_STEP,
+    localparam int VERIFY_STEPS = (NUM_STEPS < 2) ? NUM_STEPS : 2
 ) (
     input wire clk_in,
     input wire rst_in,
 
     // User interactions
     input wire start_in,
+    input wire recalibrate_in,
 
     // Module interfaction
     input wire led_display_valid_in,
     // input wire calibration_step_state_t calibration_state_in,
     input wire calibration_step_going_in,
     input wire calibration_step_ready_in,
+    input wire verify_failed_in,
     output logic [LED_ADDR_BIT_SEL_WIDTH-1:0] led_addr_bit_sel_out,
     output logic led_addr_bit_sel_start_out,
     output logic calibration_start_out,
     output logic calibration_first_out,
+    output logic verify_out,
+    output logic repair_out,
 
     output aduli_state_t state,
     output logic calibration_started,
@@ -40,6 +54,7 @@ module aduli_fsm #(
     // logic calibration_started;
     // calibration_step_state_t prev_calibration_state;
     logic led_display_valid_latch;
+    logic repair_needed;
 
     always_ff @(posedge clk_in) begin
         if (rst_in) begin
@@ -47,16 +62,22 @@ module aduli_fsm #(
             led_addr_bit_sel_start_out <= 0;
             calibration_started <= 0;
             led_display_valid_latch <= 0;
+            verify_out <= 0;
+            repair_out <= 0;
+            repair_needed <= 0;
         end else begin
             case (state)
                 DISPLAY: begin
                     calibration_start_out   <= 0;
                     led_display_valid_latch <= 0;
 
-                    if (start_in) begin
+                    if (start_in || recalibrate_in) begin
                         led_addr_bit_sel_out <= 0;
                         led_addr_bit_sel_start_out <= 1;
                         calibration_first_out <= 1;
+                        verify_out <= !start_in;
+                        repair_out <= 0;
+                        repair_needed <= 0;
                         state <= SHOW_CALIB_LED;
                     end else begin
                         led_addr_bit_sel_start_out <= 0;
@@ -78,8 +99,20 @@ module aduli_fsm #(
                     if ((calibration_step_ready_in) && calibration_started) begin //  && calibration_started
                         calibration_started <= 0;
 
-                        if (led_addr_bit_sel_out + 1 == LED_ADDRESS_WIDTH) begin
-                            state <= DISPLAY;
+                        repair_needed <= repair_needed || (verify_out && verify_failed_in);
+
+                        if (led_addr_bit_sel_out + 1 == (verify_out ? VERIFY_STEPS : NUM_STEPS)) begin
+                            if (verify_out && (repair_needed || verify_failed_in) && (VERIFY_STEPS < NUM_STEPS)) begin
+                                // go on with the next steps for the flagged blocks
+                                led_addr_bit_sel_out <= VERIFY_STEPS;
+                                led_addr_bit_sel_start_out <= 1;
+                                calibration_first_out <= 0;
+                                verify_out <= 0;
+                                repair_out <= 1;
+                                state <= SHOW_CALIB_LED;
+                            end else begin
+                                state <= DISPLAY;
+                            end
                         end else begin
                             led_addr_bit_sel_out <= led_addr_bit_sel_out + 1;
                             led_addr_bit_sel_start_out <= 1;
@@ -0,0 +1,100 @@
+`timescale 1ns / 1ps
+`include "mem/xilinx_true_dual_port_read_first_1_clock_ram.v"
+`default_nettype none
+
+// Votes over every pixel of each (1 << SHIFT) square block as the raster streams past, for
+// calibration_step_fsm to write one symbol per block instead of trusting its top left pixel.
+// The pixels of a block line are counted per symbol in registers and added to a line buffer entry per
+// block column, so by the block's last (bottom right) pixel the counts cover the whole block: done_out
+// is high on that pixel and symbol_out is the symbol most of its pixels showed. valid_out needs at least
+// AGREE of them to show it, pixels with valid_in low count for no symbol. With AGREE above half of the
+// pixels the winner is unique, otherwise ties go to the lower symbol.
+// Combinational on the pixel, like the top left pixel it replaces.
+module block_vote #(
+    parameter int SHIFT = 2,
+    parameter int SYMBOL_WIDTH = 1,
+    parameter int AGREE = 9,
+    parameter int ACTIVE_H_PIXELS = 1280,
+    localparam int NUM_SYMBOLS = 1 << SYMBOL_WIDTH,
+    localparam int COUNT_WIDTH = $clog2((1 << (2 * SHIFT)) + 1)
+) (
+    input wire clk_in,
+    input wire rst_in,
+    input wire [10:0] hcount_in,
+    input wire [9:0] vcount_in,
+    input wire active_in,
+    input wire [SYMBOL_WIDTH-1:0] symbol_in,
+    input wire valid_in,
+    output logic done_out,
+    output logic [SYMBOL_WIDTH-1:0] symbol_out,
+    output logic valid_out
+);
+    localparam int BLOCK = 1 << SHIFT;
+    localparam int COLUMNS = ACTIVE_H_PIXELS >> SHIFT;
+
+    wire first_col = (hcount_in % BLOCK) == 0;
+    wire last_col = (hcount_in % BLOCK) == BLOCK - 1;
+    wire first_row = (vcount_in % BLOCK) == 0;
+    wire last_row = (vcount_in % BLOCK) == BLOCK - 1;
+
+    // counts of this block line so far, and of the lines above from the line buffer
+    logic [COUNT_WIDTH-1:0] run_count[NUM_SYMBOLS];
+    logic [NUM_SYMBOLS*COUNT_WIDTH-1:0] stored;
+    logic [COUNT_WIDTH-1:0] line_count[NUM_SYMBOLS];
+    logic [COUNT_WIDTH-1:0] total[NUM_SYMBOLS];
+    logic [NUM_SYMBOLS*COUNT_WIDTH-1:0] total_packed;
+
+    always_comb begin
+        for (int s = 0; s < NUM_SYMBOLS; s++) begin
+            line_count[s] = (first_col ? '0 : run_count[s]) + COUNT_WIDTH'(valid_in && (symbol_in == s));
+            // the buffer was read the cycle before, the same column unless the block is 1 pixel wide
+            total[s] = line_count[s] + (first_row ? '0 : stored[s*COUNT_WIDTH+:COUNT_WIDTH]);
+            total_packed[s*COUNT_WIDTH+:COUNT_WIDTH] = total[s];
+        end
+    end
+
+    always_ff @(posedge clk_in) begin
+        if (active_in) begin
+            for (int s = 0; s < NUM_SYMBOLS; s++) begin
+                run_count[s] <= line_count[s];
+            end
+        end
+    end
+
+    // port A reads the block column, port B writes it back at the end of the block line
+    xilinx_true_dual_port_read_first_1_clock_ram #(
+        .RAM_WIDTH(NUM_SYMBOLS * COUNT_WIDTH),
+        .RAM_DEPTH(COLUMNS),
+        .RAM_PERFORMANCE("LOW_LATENCY")  // 1 cycle reading
+    ) line_buffer (
+        .clka(clk_in),
+        .addra(hcount_in >> SHIFT),
+        .douta(stored),
+        .dina('0),
+        .wea(1'b0),
+        .addrb(hcount_in >> SHIFT),
+        .dinb(total_packed),
+        .web(active_in && last_col && !last_row),
+        .doutb(),
+        .ena(1'b1),
+        .enb(1'b1),
+        .rsta(rst_in),
+        .rstb(rst_in),
+        .regcea(1'b1),
+        .regceb(1'b0)
+    );
+
+    always_comb begin
+        symbol_out = 0;
+        for (int s = 1; s < NUM_SYMBOLS; s++) begin
+            if (total[s] > total[symbol_out]) begin
+                symbol_out = s;
+            end
+        end
+    end
+    assign valid_out = total[symbol_out] >= AGREE;
+    assign done_out = active_in && last_col && last_row;
+
+endmodule
+
+`default_nettype wire
@@ -1,5 +1,10 @@
 `timescale 1ns / 1ps
 `include "mem/shift_accum_ram.sv"
+`include "mem/sparse_accum_table.sv"
+`include "calibration/settle_detector.sv"
+`include "calibration/block_vote.sv"
+`include "pixel/symbol_classifier.sv"
+`include "mem/xilinx_true_dual_port_read_first_1_clock_ram.v"
 `default_nettype none
 
 `ifndef CALIBRATION_STEP_FSM_DEFINES
@@ -12,14 +17,48 @@ typedef enum logic [1:0] {
 } calibration_step_state_t;
 `endif
 
+// Steps started with verify_in (verification steps) check the table against the first two steps of a
+// calibration: the LEDs show step 0 (should_overwrite_latch) or step 1 and every block's detects are
+// compared with that step's bits (or symbol) of the ID it stores, a block that stores the disabled value
+// should see no LED. Mismatching blocks are flagged, the first step clears the old flags, and mismatches
+// counts the blocks the step flagged. With REPAIR a flagged block's entry starts over with what it showed,
+// so after both steps it holds steps 0 and 1 of its new ID, or the disabled value if it was dark.
+// Steps started with repair_in then go on from step 2, writing only the flagged blocks and leaving the
+// rest of the table alone.
 module calibration_step_fsm #(
     parameter int NUM_LEDS = 50,
     parameter int LED_ADDRESS_WIDTH = $clog2(NUM_LEDS),
+    // address bits shown per step: 1 takes detect_0/detect_1 (red/blue), more take symbol_in/symbol_valid_in
+    parameter int BITS_PER_STEP = 1,
     parameter int WAIT_CYCLES = 5_000_000,
+    // 1: leave WAIT_FOR_CAM as soon as settle_detector sees the sampled detects stop changing,
+    // WAIT_CYCLES is only the upper bound then
+    parameter int ADAPTIVE_SETTLE = 0,
+    parameter int SETTLE_FRAMES = 2,
+    parameter int SETTLE_TOLERANCE_SHIFT = 3,  // a stable frame changed on at most 1/8 of its lit samples
     parameter int ACTIVE_H_PIXELS = 1280,
     parameter int ACTIVE_LINES = 720,
-    localparam int downsample_shift = 2,
-    localparam int NUM_FRAME_BUFFER_PIXELS = (ACTIVE_H_PIXELS>>downsample_shift) * (ACTIVE_LINES>>downsample_shift),
+    // calibration map to boot with (see sim/model/calibration_map.py), the table starts out all zeros if blank
+    parameter CALIBRATION_INIT_FILE = "",
+    // one table entry per (1 << DOWNSAMPLE_SHIFT) square block of pixels
+    parameter int DOWNSAMPLE_SHIFT = 2,
+    // 0: an ID for every block; otherwise only TABLE_SLOTS blocks get one (sparse_accum_table), handed
+    // out to the blocks that see an LED in the overwriting step, and the rest read the disabled value.
+    // Reads then take READ_LATENCY = 5 cycles instead of 2 and CALIBRATION_INIT_FILE is not used.
+    parameter int TABLE_SLOTS = 0,
+    // frames a step votes over: every block commits the value it showed in more than half of them, and the
+    // disabled value if there is none (dark counts as a value). The step stops early once no block's result
+    // can change in the frames left (1: a single frame, no tallies)
+    parameter int VOTE_FRAMES = 1,
+    // 0: a block is what its top left pixel shows; otherwise block_vote takes the symbol most of its
+    // pixels show, once at least BLOCK_AGREE of them show it, and the block is written at its last pixel
+    parameter int BLOCK_AGREE = 0,
+    // 1: keep a flag per block for verification steps to set and repair steps to check (a 1 bit RAM over the
+    // table), verification steps rewrite the flagged blocks. Needs DOWNSAMPLE_SHIFT >= 2, those writes take
+    // the two cycles after a block's table read. 0 for builds that never verify, repair steps write nothing
+    parameter int REPAIR = 0,
+    localparam int READ_LATENCY = TABLE_SLOTS ? 5 : 2,
+    localparam int NUM_FRAME_BUFFER_PIXELS = (ACTIVE_H_PIXELS>>DOWNSAMPLE_SHIFT) * (ACTIVE_LINES>>DOWNSAMPLE_SHIFT),
     localparam int WAIT_COUNTER_WIDTH = $clog2(WAIT_CYCLES),
     localparam int ADDRB_DEPTH_WIDTH = $clog2(NUM_FRAME_BUFFER_PIXELS)
 ) (
@@ -29,6 +68,8 @@ module calibration_step_fsm #(
     input  wire  start_calibration_step,
     input  wire  read_request,
     input  wire  should_overwrite_latch,
+    input  wire  verify_in,
+    input  wire  repair_in,
     output logic should_overwrite,
 
     // Address, thresh, nframe inputs
@@ -37,30 +78,125 @@ module calibration_step_fsm #(
     input wire new_frame_in,
     input wire detect_0,
     input wire detect_1,
+    input wire [BITS_PER_STEP-1:0] symbol_in,
+    input wire symbol_valid_in,
     output calibration_step_state_t state,
     output logic [LED_ADDRESS_WIDTH-1:0] read_out,
-    output logic [WAIT_COUNTER_WIDTH-1:0] wait_counter
+    output logic [WAIT_COUNTER_WIDTH-1:0] wait_counter,
+    // how long the last step waited for the camera, in cycles and in frames
+    output logic [WAIT_COUNTER_WIDTH-1:0] settle_cycles,
+    output logic [7:0] settle_frames,
+    // blocks the last overwriting step found an LED in, with TABLE_SLOTS
+    output logic [15:0] slots_used,
+    // blocks the last verification step flagged
+    output logic [15:0] mismatches,
+    // frames the last step captured
+    output logic [7:0] capture_frames,
+    // cycles the last step took, from start_calibration_step back to IDLE (saturating)
+    output logic [31:0] step_cycles
 );
 
     logic old_nf;
     logic old_start_calibration_step;
     wire active_draw = ((hcount_in < ACTIVE_H_PIXELS) && (vcount_in < ACTIVE_LINES)) && !rst;
-    wire top_left = ((hcount_in[1:0] == 2'b00) && (vcount_in[1:0] == 2'b00));
-    wire good_addrb = top_left && active_draw;
-    wire [ADDRB_DEPTH_WIDTH-1:0] addrb = (hcount_in >> downsample_shift) + (ACTIVE_H_PIXELS>>downsample_shift) * (vcount_in >> 2);
+    wire top_left = ((hcount_in % (1 << DOWNSAMPLE_SHIFT)) == 0) && ((vcount_in % (1 << DOWNSAMPLE_SHIFT)) == 0);
+    wire [ADDRB_DEPTH_WIDTH-1:0] addrb = (hcount_in >> DOWNSAMPLE_SHIFT) + (ACTIVE_H_PIXELS>>DOWNSAMPLE_SHIFT) * (vcount_in >> DOWNSAMPLE_SHIFT);
+
+    logic verifying, repairing;  // the kind of step that is running
+
+    // what a pixel shows: red/blue with one bit per step, a symbol otherwise
+    wire one_bit = (BITS_PER_STEP == 1);
+    wire pixel_valid = one_bit ? (detect_0 ^ detect_1) : symbol_valid_in;
+    wire [BITS_PER_STEP-1:0] pixel_symbol = one_bit ? BITS_PER_STEP'(detect_1) : symbol_in;
+
+    // and what the block shows, good_addrb is the pixel that decides it
+    logic block_done;
+    logic block_valid;
+    logic [BITS_PER_STEP-1:0] block_symbol;
+    generate
+        if (BLOCK_AGREE) begin : g_block_vote
+            block_vote #(
+                .SHIFT(DOWNSAMPLE_SHIFT),
+                .SYMBOL_WIDTH(BITS_PER_STEP),
+                .AGREE(BLOCK_AGREE),
+                .ACTIVE_H_PIXELS(ACTIVE_H_PIXELS)
+            ) block_vote_m (
+                .clk_in(clk_pixel),
+                .rst_in(rst),
+                .hcount_in(hcount_in),
+                .vcount_in(vcount_in),
+                .active_in(active_draw),
+                .symbol_in(pixel_symbol),
+                .valid_in(pixel_valid),
+                .done_out(block_done),
+                .symbol_out(block_symbol),
+                .valid_out(block_valid)
+            );
+        end else begin : g_top_left
+            assign block_done = top_left;
+            assign block_valid = pixel_valid;
+            assign block_symbol = pixel_symbol;
+        end
+    endgenerate
+    wire good_addrb = block_done && active_draw;
+
+    // with symbols, split the valid ones on their top bit
+    wire [1:0] settle_mask = (BITS_PER_STEP == 1) ? {detect_1, detect_0} :
+        {symbol_valid_in && symbol_in[BITS_PER_STEP-1], symbol_valid_in && !symbol_in[BITS_PER_STEP-1]};
+    logic settled;
+    logic [7:0] frames_waited;
+    settle_detector #(
+        .NUM_PIXELS(NUM_FRAME_BUFFER_PIXELS),
+        .SETTLE_FRAMES(SETTLE_FRAMES),
+        .TOLERANCE_SHIFT(SETTLE_TOLERANCE_SHIFT)
+    ) settle_detector_m (
+        .clk_in(clk_pixel),
+        .rst_in(rst),
+        .start_in((state == IDLE) && start_calibration_step),
+        .new_frame_in(new_frame_in),
+        .pixel_valid_in(top_left && active_draw),
+        .mask_in(settle_mask),
+        .settled_out(settled),
+        .frames_out(frames_waited)
+    );
+    wire camera_settled = (wait_counter == WAIT_CYCLES - 1) || (ADAPTIVE_SETTLE && settled);
+
+    logic [15:0] mismatch_count;
+    logic mismatch;
+    // CAPTURE_FRAME tallies votes until the committing frame, which writes the table
+    logic committing;
+    logic [7:0] vote_frame;  // frames tallied so far
+    logic undecided;  // a block of this frame could still end up with another result
+    logic vote_undecided;
+    logic [31:0] step_counter;
 
     always_ff @(posedge clk_pixel) begin
         if (rst) begin
             state <= IDLE;
+            verifying <= 0;
+            repairing <= 0;
+            mismatch_count <= 0;
+            mismatches <= 0;
+            committing <= 0;
+            vote_frame <= 0;
+            undecided <= 0;
+            capture_frames <= 0;
             wait_counter <= 0;
             old_nf <= 0;
             old_start_calibration_step <= 0;
             should_overwrite <= 0;
+            settle_cycles <= 0;
+            settle_frames <= 0;
+            step_counter <= 0;
+            step_cycles <= 0;
         end else begin
             old_nf <= new_frame_in;
+            if ((state != IDLE) && (step_counter != '1)) begin
+                step_counter <= step_counter + 1;
+            end
             old_start_calibration_step <= start_calibration_step;
 
-            if ((state == CAPTURE_FRAME) && new_frame_in) begin
+            if ((state == CAPTURE_FRAME) && new_frame_in && committing) begin
                 should_overwrite <= 0;
             end else if ((state == IDLE) && should_overwrite_latch) begin
                 should_overwrite <= 1;
@@ -71,23 +207,44 @@ module calibration_step_fsm #(
                     if (start_calibration_step) begin  // && !old_start_calibration_step
                         state <= WAIT_FOR_CAM;
                         wait_counter <= 0;
+                        verifying <= verify_in;
+                        repairing <= repair_in && !verify_in;
+                        mismatch_count <= 0;
+                        step_counter <= 1;
                     end
                 end
                 WAIT_FOR_CAM: begin
                     wait_counter <= wait_counter + 1;
-                    if (wait_counter == WAIT_CYCLES - 1) begin
+                    if (camera_settled) begin
                         state <= WAIT_FOR_NFRAME;
                         wait_counter <= 0;
+                        settle_cycles <= wait_counter + 1;
+                        settle_frames <= frames_waited;
                     end
                 end
                 WAIT_FOR_NFRAME: begin
                     if (new_frame_in) begin
                         state <= CAPTURE_FRAME;
+                        committing <= (VOTE_FRAMES == 1) || verifying;
+                        vote_frame <= 0;
+                        undecided <= 0;
                     end
                 end
                 CAPTURE_FRAME: begin
-                    if (new_frame_in) begin
+                    // the comparisons trail the raster by READ_LATENCY, done long before the frame ends
+                    mismatch_count <= mismatch_count + mismatch;
+                    undecided <= undecided || vote_undecided;
+                    if (new_frame_in && committing) begin
                         state <= IDLE;
+                        capture_frames <= vote_frame + 1;
+                        step_cycles <= step_counter + (step_counter != '1);
+                        if (verifying) begin
+                            mismatches <= mismatch_count;
+                        end
+                    end else if (new_frame_in) begin
+                        vote_frame <= vote_frame + 1;
+                        committing <= !undecided || (vote_frame + 2 == VOTE_FRAMES);
+                        undecided <= 0;
                     end
                 end
             endcase
@@ -95,14 +252,15 @@ module calibration_step_fsm #(
     end
 
 
-    wire summand_in = detect_1;
+    wire [BITS_PER_STEP-1:0] summand_in = block_symbol;
+    wire conflict = !block_valid;
     accum_request_t request_wire;
-    wire request_valid_in = read_request || (good_addrb && active_draw && (state == CAPTURE_FRAME));
+    wire capture = good_addrb && (state == CAPTURE_FRAME) && !verifying;
     wire [ADDRB_DEPTH_WIDTH-1:0] addr_out_wire;
 
     always_comb begin  // https://github.com/steveicarus/iverilog/issues/1015
-        if ((state == CAPTURE_FRAME) && good_addrb) begin
-            if (!(detect_0 ^ detect_1)) begin  // conflict
+        if (capture) begin
+            if (conflict) begin
                 request_wire = DISABLE;
             end else if (should_overwrite) begin
                 request_wire = WRITE_OVER;
@@ -114,25 +272,311 @@ module calibration_step_fsm #(
         end
     end
 
-    // Instantiat the accum thing
-    shift_accum_ram #(
-        .WIDTH(LED_ADDRESS_WIDTH),
-        .DEPTH(NUM_FRAME_BUFFER_PIXELS)
-    ) accum_ram (
-        .clk_in(clk_pixel),
-        .rst_in(rst),
-        .addr_in(addrb),
-        .summand_in(summand_in),
-        .request_type_in(request_wire),
-        .request_valid_in(request_valid_in),
-        .read_out(read_out),
-        .summand_out(),
-        .sum_out(),
-        .addr_out(addr_out_wire),
-        .request_type_out(),
-        .result_valid_out()
-    );
+    // VERIFY: the block's detects wait for the table to read out its ID
+    logic verify_valid_pipe[READ_LATENCY];
+    logic [ADDRB_DEPTH_WIDTH-1:0] verify_addr_pipe[READ_LATENCY];
+    logic verify_lit_pipe[READ_LATENCY];
+    logic [BITS_PER_STEP-1:0] verify_symbol_pipe[READ_LATENCY];
 
+    always_ff @(posedge clk_pixel) begin
+        verify_valid_pipe[0] <= !rst && verifying && good_addrb && (state == CAPTURE_FRAME);
+        verify_addr_pipe[0] <= addrb;
+        verify_lit_pipe[0] <= block_valid;
+        verify_symbol_pipe[0] <= block_symbol;
+        for (int i = 1; i < READ_LATENCY; i++) begin
+            verify_valid_pipe[i] <= !rst && verify_valid_pipe[i-1];
+            verify_addr_pipe[i] <= verify_addr_pipe[i-1];
+            verify_lit_pipe[i] <= verify_lit_pipe[i-1];
+            verify_symbol_pipe[i] <= verify_symbol_pipe[i-1];
+        end
+    end
+    wire verify_valid = verify_valid_pipe[READ_LATENCY-1];
+    wire verify_lit = verify_lit_pipe[READ_LATENCY-1];
+    wire [BITS_PER_STEP-1:0] verify_symbol = verify_symbol_pipe[READ_LATENCY-1];
+    wire [ADDRB_DEPTH_WIDTH-1:0] verify_addr = verify_addr_pipe[READ_LATENCY-1];
+
+    // steps 0 and 1 of the stored ID, the address zero padded at the top like id_shower shows it (and a zero
+    // step below, an address of a single step has no step 1)
+    localparam int NUM_STEPS = (LED_ADDRESS_WIDTH + BITS_PER_STEP - 1) / BITS_PER_STEP;
+    localparam int PADDED_ADDRESS_WIDTH = (NUM_STEPS + 1) * BITS_PER_STEP;
+    wire [PADDED_ADDRESS_WIDTH-1:0] padded_stored = {(PADDED_ADDRESS_WIDTH - BITS_PER_STEP)'(read_out),
+        BITS_PER_STEP'(0)};
+    wire [BITS_PER_STEP-1:0] stored_first = padded_stored[PADDED_ADDRESS_WIDTH-1-:BITS_PER_STEP];
+    wire [BITS_PER_STEP-1:0] stored_second = padded_stored[PADDED_ADDRESS_WIDTH-1-BITS_PER_STEP-:BITS_PER_STEP];
+    wire stored_lit = read_out != {LED_ADDRESS_WIDTH{1'b1}};
+    wire verify_second = !should_overwrite;
+    // a block the first step flagged already starts over, the second step does not compare it again
+    logic verify_flagged;
+    assign mismatch = verify_valid && !(verify_second && verify_flagged) && ((verify_lit != stored_lit) ||
+        (stored_lit && (verify_symbol != (verify_second ? stored_second : stored_first))));
+
+    // the flagged blocks start over with what they show: the first step writes its symbol over a mismatching
+    // block, the second shifts its symbol into a block the first step flagged. A block only the second step
+    // flags matched the first, so it gets the first step's symbol of its stored ID and then this one (a second
+    // write on the next cycle). A block dark in either step is disabled.
+    logic verify_request;
+    accum_request_t verify_type;
+    logic [BITS_PER_STEP-1:0] verify_summand;
+    logic verify_more;
+    always_comb begin
+        verify_request = 0;
+        verify_type = WRITE_OVER;
+        verify_summand = verify_symbol;
+        verify_more = 0;
+        if (REPAIR && verify_valid) begin
+            if (!verify_second) begin
+                verify_request = mismatch;
+                verify_type = verify_lit ? WRITE_OVER : DISABLE;
+            end else if (verify_flagged) begin
+                verify_request = 1;
+                verify_type = verify_lit ? WRITE : DISABLE;
+            end else if (mismatch) begin
+                verify_request = 1;
+                if (verify_lit && stored_lit) begin
+                    verify_summand = stored_first;
+                    verify_more = 1;
+                end else begin
+                    verify_type = DISABLE;
+                end
+            end
+        end
+    end
+    logic more_request;
+    logic [ADDRB_DEPTH_WIDTH-1:0] more_addr;
+    logic [BITS_PER_STEP-1:0] more_summand;
+    always_ff @(posedge clk_pixel) begin
+        more_request <= !rst && verify_more;
+        more_addr <= verify_addr;
+        more_summand <= verify_symbol;
+    end
+
+    // DELAYED CAPTURE: with votes or repairs the request waits FLAG_LATENCY cycles for the block's tally
+    // and repair flag. Tallying frames only update the tally, the committing frame sends the vote to the
+    // table (when repairing only for flagged blocks).
+    localparam int FLAG_LATENCY = 2;
+    // a vote counter per class: every symbol, then dark
+    localparam int NUM_CLASSES = (1 << BITS_PER_STEP) + 1;
+    localparam int CLASS_WIDTH = $clog2(NUM_CLASSES);
+    localparam int COUNT_WIDTH = $clog2(VOTE_FRAMES + 1);
+    localparam int VOTE_WIDTH = NUM_CLASSES * COUNT_WIDTH;
+    wire delay_capture = repairing || (VOTE_FRAMES > 1);
+    logic flagged;
+    logic [VOTE_WIDTH-1:0] stored_votes;
+    logic capture_valid_pipe[FLAG_LATENCY];
+    logic [ADDRB_DEPTH_WIDTH-1:0] capture_addr_pipe[FLAG_LATENCY];
+    logic [BITS_PER_STEP:0] capture_vote_pipe[FLAG_LATENCY];  // {dark, symbol}
+
+    always_ff @(posedge clk_pixel) begin
+        capture_valid_pipe[0] <= !rst && delay_capture && capture;
+        capture_addr_pipe[0] <= addrb;
+        capture_vote_pipe[0] <= {conflict, conflict ? BITS_PER_STEP'(0) : summand_in};
+        for (int i = 1; i < FLAG_LATENCY; i++) begin
+            capture_valid_pipe[i] <= !rst && capture_valid_pipe[i-1];
+            capture_addr_pipe[i] <= capture_addr_pipe[i-1];
+            capture_vote_pipe[i] <= capture_vote_pipe[i-1];
+        end
+    end
+
+    // strict majority: the class seen in more than half of the VOTE_FRAMES frames wins, without one the block
+    // is disabled. A block is decided once a class has that many votes, or none can get there in the frames
+    // after this one; the committing frame adds a vote but cannot change a decided result.
+    wire [BITS_PER_STEP:0] vote = capture_vote_pipe[FLAG_LATENCY-1];
+    wire [CLASS_WIDTH-1:0] vote_class = vote[BITS_PER_STEP] ? CLASS_WIDTH'(NUM_CLASSES - 1) : CLASS_WIDTH'(vote[BITS_PER_STEP-1:0]);
+    wire [31:0] frames_left = 32'(VOTE_FRAMES - 1) - 32'(vote_frame);
+    logic [COUNT_WIDTH-1:0] new_count[NUM_CLASSES];
+    logic [VOTE_WIDTH-1:0] new_votes;
+    logic [31:0] top_count;
+    logic majority;
+    logic [BITS_PER_STEP:0] majority_vote;  // {dark, symbol}
+    logic decided;
+    always_comb begin
+        top_count = 0;
+        majority = 0;
+        majority_vote = '0;
+        for (int c = 0; c < NUM_CLASSES; c++) begin
+            new_count[c] = ((vote_frame == 0) ? COUNT_WIDTH'(0) : stored_votes[c*COUNT_WIDTH+:COUNT_WIDTH]) +
+                COUNT_WIDTH'(vote_class == c);
+            new_votes[c*COUNT_WIDTH+:COUNT_WIDTH] = new_count[c];
+            if (32'(new_count[c]) > top_count) begin
+                top_count = 32'(new_count[c]);
+            end
+            if (2 * 32'(new_count[c]) > VOTE_FRAMES) begin
+                majority = 1;
+                majority_vote = (c == NUM_CLASSES - 1) ? {1'b1, BITS_PER_STEP'(0)} : {1'b0, BITS_PER_STEP'(c)};
+            end
+        end
+        decided = majority || (2 * (top_count + frames_left) <= VOTE_FRAMES);
+    end
+    wire tally = capture_valid_pipe[FLAG_LATENCY-1] && !committing;
+    assign vote_undecided = tally && !decided;
+
+    generate
+        if (VOTE_FRAMES > 1) begin : g_votes
+            // port A reads the tallies ahead of the requests, port B writes them back
+            xilinx_true_dual_port_read_first_1_clock_ram #(
+                .RAM_WIDTH(VOTE_WIDTH),
+                .RAM_DEPTH(NUM_FRAME_BUFFER_PIXELS),
+                .RAM_PERFORMANCE("HIGH_PERFORMANCE")  // FLAG_LATENCY cycle reading
+            ) votes (
+                .clka(clk_pixel),
+                .addra(addrb),
+                .douta(stored_votes),
+                .dina('0),
+                .wea(1'b0),
+                .addrb(capture_addr_pipe[FLAG_LATENCY-1]),
+                .dinb(new_votes),
+                .web(tally),
+                .doutb(),
+                .ena(1'b1),
+                .enb(1'b1),
+                .rsta(rst),
+                .rstb(rst),
+                .regcea(1'b1),
+                .regceb(1'b0)
+            );
+        end else begin : g_single_frame
+            assign stored_votes = '0;
+        end
+    endgenerate
+
+    generate
+        if (REPAIR) begin : g_repair_flags
+            // one flag per block: port A looks them up for repairs, port B writes the verification results
+            xilinx_true_dual_port_read_first_1_clock_ram #(
+                .RAM_WIDTH(1),
+                .RAM_DEPTH(NUM_FRAME_BUFFER_PIXELS),
+                .RAM_PERFORMANCE("HIGH_PERFORMANCE")  // FLAG_LATENCY cycle reading
+            ) repair_flags (
+                .clka(clk_pixel),
+                .addra(addrb),
+                .douta(flagged),
+                .dina(1'b0),
+                .wea(1'b0),
+                .addrb(verify_addr),
+                .dinb(mismatch),
+                .web(mismatch || (verify_valid && should_overwrite)),
+                .doutb(),
+                .ena(1'b1),
+                .enb(1'b1),
+                .rsta(rst),
+                .rstb(rst),
+                .regcea(1'b1),
+                .regceb(1'b0)
+            );
+            // port A reads every block's flag FLAG_LATENCY cycles after its sample, verification wants it
+            // READ_LATENCY cycles after
+            if (READ_LATENCY > FLAG_LATENCY) begin : g_flag_delay
+                logic flag_delay[READ_LATENCY-FLAG_LATENCY];
+                always_ff @(posedge clk_pixel) begin
+                    flag_delay[0] <= flagged;
+                    for (int i = 1; i < READ_LATENCY - FLAG_LATENCY; i++) begin
+                        flag_delay[i] <= flag_delay[i-1];
+                    end
+                end
+                assign verify_flagged = flag_delay[READ_LATENCY-FLAG_LATENCY-1];
+            end else begin : g_flag_now
+                assign verify_flagged = flagged;
+            end
+        end else begin : g_no_repair_flags
+            assign flagged = 0;
+            assign verify_flagged = 0;
+        end
+    endgenerate
+
+    // a delayed request takes the table from the display read of that cycle, the LEDs show id_shower anyway.
+    // Blocks without a majority or dark most of the time are disabled.
+    wire delayed_request = capture_valid_pipe[FLAG_LATENCY-1] && committing && (!repairing || flagged);
+    accum_request_t delayed_type;
+    always_comb begin
+        if (!majority || majority_vote[BITS_PER_STEP]) begin
+            delayed_type = DISABLE;
+        end else if (should_overwrite) begin
+            delayed_type = WRITE_OVER;
+        end else begin
+            delayed_type = WRITE;
+        end
+    end
+
+    // verification writes take the display reads of their cycles the same way
+    logic [ADDRB_DEPTH_WIDTH-1:0] table_addr;
+    logic [BITS_PER_STEP-1:0] table_summand;
+    wire table_request_valid = read_request || delayed_request || verify_request || more_request ||
+        (capture && !delay_capture);
+    accum_request_t table_request;
+    always_comb begin
+        if (delayed_request) begin
+            table_addr = capture_addr_pipe[FLAG_LATENCY-1];
+            table_summand = majority_vote[BITS_PER_STEP-1:0];
+        end else if (verify_request) begin
+            table_addr = verify_addr;
+            table_summand = verify_summand;
+        end else if (more_request) begin
+            table_addr = more_addr;
+            table_summand = more_summand;
+        end else begin
+            table_addr = addrb;
+            table_summand = summand_in;
+        end
+    end
+    always_comb begin
+        if (delayed_request) begin
+            table_request = delayed_type;
+        end else if (verify_request) begin
+            table_request = verify_type;
+        end else if (more_request) begin
+            table_request = WRITE;
+        end else if (delay_capture) begin
+            table_request = READ;
+        end else begin
+            table_request = request_wire;
+        end
+    end
+
+    // Instantiat the accum thing
+    generate
+        if (TABLE_SLOTS) begin : g_sparse
+            logic [$clog2(TABLE_SLOTS+1)-1:0] slots_taken;
+            sparse_accum_table #(
+                .WIDTH(LED_ADDRESS_WIDTH),
+                .BLOCKS(NUM_FRAME_BUFFER_PIXELS),
+                .SLOTS(TABLE_SLOTS),
+                .SUMMAND_WIDTH(BITS_PER_STEP)
+            ) accum_ram (
+                .clk_in(clk_pixel),
+                .rst_in(rst),
+                // repairs cannot hand out slots, a flagged block without one stays disabled
+                .allocate_in(should_overwrite && (state == CAPTURE_FRAME) && !verifying && !repairing),
+                .addr_in(table_addr),
+                .summand_in(table_summand),
+                .request_type_in(table_request),
+                .request_valid_in(table_request_valid),
+                .read_out(read_out),
+                .slots_used_out(slots_taken)
+            );
+            assign slots_used = 16'(slots_taken);
+        end else begin : g_dense
+            shift_accum_ram #(
+                .WIDTH(LED_ADDRESS_WIDTH),
+                .DEPTH(NUM_FRAME_BUFFER_PIXELS),
+                .SUMMAND_WIDTH(BITS_PER_STEP),
+                .INIT_FILE(CALIBRATION_INIT_FILE)
+            ) accum_ram (
+                .clk_in(clk_pixel),
+                .rst_in(rst),
+                .addr_in(table_addr),
+                .summand_in(table_summand),
+                .request_type_in(table_request),
+                .request_valid_in(table_request_valid),
+                .read_out(read_out),
+                .summand_out(),
+                .sum_out(),
+                .addr_out(addr_out_wire),
+                .request_type_out(),
+                .result_valid_out()
+            );
+            assign slots_used = 0;
+        end
+    endgenerate
 
 endmodule
 `default_nettype wire
@@ -1,6 +1,7 @@
 `timescale 1ns / 1ps  // (comment to prevent autoformatting)
 `include "mem/xilinx_single_port_ram_read_first.v"
 `include "common/debouncer.sv"
+`include "pixel/symbol_classifier.sv"
 `default_nettype none
 
 // Module to debug calibration, four user interactions
@@ -8,9 +9,12 @@
 // Reset: reset
 // Increment: displays next bit of led address
 // Decrement: displays previous bit of led address
+// With BITS_PER_STEP > 1 every step shows a symbol of that many address bits (MSB first, the
+// address zero padded at the top) in one of symbol_color's colors.
 module id_shower #(
     parameter int NUM_LEDS = 50,
-    parameter int LED_ADDRESS_WIDTH = $clog2(NUM_LEDS)
+    parameter int LED_ADDRESS_WIDTH = $clog2(NUM_LEDS),
+    parameter int BITS_PER_STEP = 1
 ) (
     input wire clk,
     input wire rst,
@@ -21,10 +25,15 @@ module id_shower #(
     output logic color_valid,
     output logic displayed_frame_valid,
     input wire update_address_bit_num, 
-    input wire [ADDRESS_BIT_NUMER_WIDTH-1:0] address_bit_num_req, // hold what bit lsb part of ids are showing
-    output logic [ADDRESS_BIT_NUMER_WIDTH-1:0] current_address_bit_num // hold what bit lsb part of ids are showing
+    input wire [ADDRESS_BIT_NUMER_WIDTH-1:0] address_bit_num_req, // which step (bit or symbol) the ids are showing
+    output logic [ADDRESS_BIT_NUMER_WIDTH-1:0] current_address_bit_num // which step (bit or symbol) the ids are showing
 );
     localparam ADDRESS_BIT_NUMER_WIDTH = $clog2($clog2(NUM_LEDS));
+    localparam int NUM_STEPS = (LED_ADDRESS_WIDTH + BITS_PER_STEP - 1) / BITS_PER_STEP;
+    localparam int PADDED_ADDRESS_WIDTH = NUM_STEPS * BITS_PER_STEP;
+
+    wire [PADDED_ADDRESS_WIDTH-1:0] padded_request = next_led_request;
+    wire [BITS_PER_STEP-1:0] symbol = padded_request[PADDED_ADDRESS_WIDTH-1-current_address_bit_num*BITS_PER_STEP-:BITS_PER_STEP];
 
     logic [LED_ADDRESS_WIDTH-1:0] prev_request;
 
@@ -53,27 +62,10 @@ module id_shower #(
             display_state   <= SEEN_ZERO_ZERO_REQUESTS;
             // HANDLE GENERAL CASE
         end else begin
-            // DISPLAY CURRENT BIT OF REQUEST ADDRESS
-            case (next_led_request[LED_ADDRESS_WIDTH-1-current_address_bit_num])
-                0: begin
-                    green_out <= 0;
-                    red_out <= 8'hFF;
-                    blue_out <= 0;
-                    color_valid <= 1;
-                end
-                1: begin
-                    green_out <= 0;
-                    red_out <= 0;
-                    blue_out <= 8'h8F;
-                    color_valid <= 1;
-                end
-                default: begin  // SHOULD NEVER GO HERE
-                    green_out <= 8'hFF;
-                    red_out <= 0;
-                    blue_out <= 0;
-                    color_valid <= 1;
-                end
-            endcase
+            // DISPLAY CURRENT BIT (OR SYMBOL) OF REQUEST ADDRESS
+            // one bit: red for 0, blue for 1
+            {red_out, green_out, blue_out} <= symbol_color(BITS_PER_STEP, symbol);
+            color_valid <= 1;
 
             prev_request <= next_led_request;
             // accept new requests
@@ -0,0 +1,206 @@
+`timescale 1ns / 1ps
+`include "mem/xilinx_true_dual_port_read_first_1_clock_ram.v"
+`default_nettype none
+
+// Averages the camera color of every pixel that maps to an LED over a whole frame, each of the three
+// CHANNEL_WIDTH bit channels on its own (led_pixel_map averages pixel coordinates with it).
+// Runs of consecutive valid pixels with the same LED id are summed in registers and only folded into
+// the per-LED {count, sums} RAM (one read-modify-write) when the id changes, so consecutive RAM
+// writes always go to different LEDs and the 1 cycle read never sees a stale entry.
+// On new_frame_in (the end of the active frame) the RAM is walked: every LED that saw pixels gets
+// its rounded average color out on led_id_out/color_out/valid_out and its entry is cleared, then
+// frame_done_out pulses. Pixels arriving during the walk are dropped, it takes CHANNEL_WIDTH + 3
+// cycles per LED, which fits the vertical blanking for thousands of LEDs.
+module led_color_accumulator #(
+    parameter int NUM_LEDS = 50,
+    parameter int LED_ADDRESS_WIDTH = $clog2(NUM_LEDS),
+    parameter int CHANNEL_WIDTH = 8,
+    parameter int COUNT_WIDTH = $clog2(1280 * 720 + 1),  // pixels one LED can collect in a frame
+    localparam int SumWidth = CHANNEL_WIDTH + COUNT_WIDTH,
+    localparam int EntryWidth = COUNT_WIDTH + 3 * SumWidth
+) (
+    input wire clk_in,
+    input wire rst_in,
+    input wire [LED_ADDRESS_WIDTH-1:0] led_id_in,
+    input wire [3*CHANNEL_WIDTH-1:0] color_in,  // {red, green, blue}
+    input wire valid_in,
+    input wire new_frame_in,
+    output logic [LED_ADDRESS_WIDTH-1:0] led_id_out,
+    output logic [3*CHANNEL_WIDTH-1:0] color_out,
+    output logic valid_out,
+    output logic frame_done_out,
+    output logic [COUNT_WIDTH-1:0] rmw_count_out  // RAM read-modify-writes in the last frame
+);
+    enum logic [2:0] {
+        ACCUMULATE,
+        DRAIN,
+        READ,
+        LOAD,
+        DIVIDE,
+        EMIT
+    } state;
+
+    // Current run of pixels
+    logic run_valid;
+    logic [LED_ADDRESS_WIDTH-1:0] run_id;
+    logic [SumWidth-1:0] run_sum[3];
+    logic [COUNT_WIDTH-1:0] run_count;
+
+    // Read-modify-write: the run read from the RAM (req_*), then added and written back (wr_*)
+    logic req_valid, wr_valid;
+    logic [LED_ADDRESS_WIDTH-1:0] req_id, wr_id;
+    logic [SumWidth-1:0] req_sum[3], wr_sum[3];
+    logic [COUNT_WIDTH-1:0] req_count, wr_count;
+    logic [COUNT_WIDTH-1:0] rmw_count;
+
+    // Frame end walk
+    logic [LED_ADDRESS_WIDTH-1:0] walk_id;
+    logic [SumWidth-1:0] remainder[3];
+    logic [CHANNEL_WIDTH-1:0] quotient[3];
+    logic [COUNT_WIDTH-1:0] divisor;
+    logic [$clog2(CHANNEL_WIDTH)-1:0] div_step;
+
+    logic [EntryWidth-1:0] entry;
+    wire [COUNT_WIDTH-1:0] entry_count = entry[EntryWidth-1-:COUNT_WIDTH];
+    wire start_run = valid_in && (state == ACCUMULATE) && !new_frame_in;
+    wire end_run = run_valid && (new_frame_in || (start_run && led_id_in != run_id));
+
+    always_ff @(posedge clk_in) begin
+        if (rst_in) begin
+            state <= ACCUMULATE;
+            run_valid <= 0;
+            req_valid <= 0;
+            wr_valid <= 0;
+            valid_out <= 0;
+            frame_done_out <= 0;
+            rmw_count <= 0;
+            rmw_count_out <= 0;
+        end else begin
+            valid_out <= 0;
+            frame_done_out <= 0;
+
+            // coalesce, a finished run goes to the RAM
+            req_valid <= end_run;
+            if (end_run) begin
+                req_id <= run_id;
+                req_count <= run_count;
+                for (int c = 0; c < 3; c++) begin
+                    req_sum[c] <= run_sum[c];
+                end
+            end
+            if (start_run) begin
+                run_valid <= 1;
+                run_id <= led_id_in;
+                run_count <= end_run || !run_valid ? 1 : run_count + 1;
+                for (int c = 0; c < 3; c++) begin
+                    run_sum[c] <= (end_run || !run_valid ? 0 : run_sum[c]) + color_in[CHANNEL_WIDTH*c+:CHANNEL_WIDTH];
+                end
+            end else if (new_frame_in) begin
+                run_valid <= 0;
+            end
+
+            // the RAM answers req_id a cycle later, wr_* is added to it and written back
+            wr_valid <= req_valid;
+            wr_id <= req_id;
+            wr_count <= req_count;
+            for (int c = 0; c < 3; c++) begin
+                wr_sum[c] <= req_sum[c];
+            end
+            if (wr_valid) begin
+                rmw_count <= rmw_count + 1;
+            end
+
+            case (state)
+                ACCUMULATE: begin
+                    if (new_frame_in) begin
+                        state <= DRAIN;
+                    end
+                end
+                DRAIN: begin
+                    // wait for the last run's read-modify-write
+                    if (!req_valid && !wr_valid) begin
+                        walk_id <= 0;
+                        state <= READ;
+                        rmw_count_out <= rmw_count;
+                        rmw_count <= 0;
+                    end
+                end
+                READ: begin
+                    state <= LOAD;
+                end
+                LOAD: begin
+                    divisor <= entry_count;
+                    div_step <= CHANNEL_WIDTH - 1;
+                    for (int c = 0; c < 3; c++) begin
+                        // round to nearest
+                        remainder[c] <= entry[c*SumWidth+:SumWidth] + (entry_count >> 1);
+                        quotient[c] <= 0;
+                    end
+                    state <= (entry_count == 0) ? EMIT : DIVIDE;
+                end
+                DIVIDE: begin
+                    for (int c = 0; c < 3; c++) begin
+                        if (remainder[c] >= (SumWidth'(divisor) << div_step)) begin
+                            remainder[c] <= remainder[c] - (SumWidth'(divisor) << div_step);
+                            quotient[c][div_step] <= 1'b1;
+                        end
+                    end
+                    div_step <= div_step - 1;
+                    if (div_step == 0) begin
+                        state <= EMIT;
+                    end
+                end
+                EMIT: begin
+                    if (divisor != 0) begin
+                        led_id_out <= walk_id;
+                        color_out <= {quotient[2], quotient[1], quotient[0]};
+                        valid_out <= 1;
+                    end
+                    if (walk_id == NUM_LEDS - 1) begin
+                        frame_done_out <= 1;
+                        state <= ACCUMULATE;
+                    end else begin
+                        walk_id <= walk_id + 1;
+                        state <= READ;
+                    end
+                end
+                default: begin
+                    state <= ACCUMULATE;
+                end
+            endcase
+        end
+    end
+
+    logic [EntryWidth-1:0] wr_entry;
+    always_comb begin
+        wr_entry[EntryWidth-1-:COUNT_WIDTH] = entry_count + wr_count;
+        for (int c = 0; c < 3; c++) begin
+            wr_entry[c*SumWidth+:SumWidth] = entry[c*SumWidth+:SumWidth] + wr_sum[c];
+        end
+    end
+
+    // port A reads, port B writes: the run sums, or zeros behind the walk
+    xilinx_true_dual_port_read_first_1_clock_ram #(
+        .RAM_WIDTH(EntryWidth),
+        .RAM_DEPTH(NUM_LEDS),
+        .RAM_PERFORMANCE("LOW_LATENCY")  // 1 cycle reading
+    ) sums (
+        .clka(clk_in),
+        .addra((state == READ) ? walk_id : req_id),
+        .douta(entry),
+        .dina('0),
+        .wea(1'b0),
+        .addrb((state == LOAD) ? walk_id : wr_id),
+        .dinb((state == LOAD) ? '0 : wr_entry),
+        .web(wr_valid || (state == LOAD)),
+        .ena(1'b1),
+        .enb(1'b1),
+        .rsta(rst_in),
+        .rstb(rst_in),
+        .regcea(1'b1),
+        .regceb(1'b0),
+        .doutb()
+    );
+endmodule
+
+`default_nettype wire
@@ -2,13 +2,27 @@
 `include "mem/xilinx_true_dual_port_read_first_2_clock_ram.v"
 `include "calibration/id_shower.sv"
 `include "common/synchronizer.sv"
+`include "calibration/led_color_accumulator.sv"
 `default_nettype none
 
+// Colors of every LED, written from the camera side (clk_pixel) and read by the LED driver (clk_led).
+// With DOUBLE_BUFFER the RAM holds two banks: the camera writes the back bank while the LED side reads
+// the front one, and the banks swap on new_frame_in. The LED side only picks up the new front bank
+// (crossed into clk_led) when the driver asks for LED 0, so a refresh never mixes two banks, and the
+// bank it reads is crossed back: the camera side only writes the back bank (and only swaps) once the
+// LED side has left it. Without DOUBLE_BUFFER there is a single bank written and read at once.
+// A rising wipe invalidates every LED in one cycle by clearing per-LED valid bits, invalid LEDs read
+// black. With DOUBLE_BUFFER the bank the LED side is on is cleared as soon as it is the free back bank.
+// With ACCUMULATE an LED gets the average of every pixel mapped to it in a frame instead of the last
+// one (see led_color_accumulator), written when the frame ends, and the banks swap once all of them
+// are written. The LED outputs are then rounded down to 4 bits instead of truncated.
 module led_color_buffer
 #(
     parameter int NUM_LEDS = 50,
     parameter int LED_ADDRESS_WIDTH = $clog2(NUM_LEDS),
-    parameter int FBUF_COLOR_WIDTH = 24
+    parameter int FBUF_COLOR_WIDTH = 24,
+    parameter int DOUBLE_BUFFER = 0,
+    parameter int ACCUMULATE = 0
 )(  
     input wire rst,
     input wire wipe,
@@ -18,6 +32,7 @@ module led_color_buffer
         input wire [LED_ADDRESS_WIDTH-1:0] led_lookup_address,
         input wire [FBUF_COLOR_WIDTH-1:0] camera_color,
         input wire led_color_buffer_update_enable,
+        input wire new_frame_in,
     
     // For requests from led driver
     // Clocked off of LED driver clock
@@ -30,74 +45,181 @@ module led_color_buffer
         output logic color_valid,
         output logic wiping
 );
+localparam int NUM_BANKS = DOUBLE_BUFFER ? 2 : 1;
+localparam int RAM_ADDRESS_WIDTH = $clog2(NUM_BANKS * NUM_LEDS);
+
+// CAMERA SIDE
+logic [LED_ADDRESS_WIDTH-1:0] write_led;
+logic [FBUF_COLOR_WIDTH-1:0] write_color;
+logic write_request;
+logic frame_end;
+generate
+    if (ACCUMULATE) begin : g_accumulate
+        led_color_accumulator #(
+            .NUM_LEDS(NUM_LEDS),
+            .LED_ADDRESS_WIDTH(LED_ADDRESS_WIDTH)
+        ) accumulator (
+            .clk_in(clk_pixel),
+            .rst_in(rst),
+            .led_id_in(led_lookup_address),
+            .color_in(camera_color),
+            .valid_in(led_color_buffer_update_enable && (led_lookup_address < NUM_LEDS)),
+            .new_frame_in(new_frame_in),
+            .led_id_out(write_led),
+            .color_out(write_color),
+            .valid_out(write_request),
+            .frame_done_out(frame_end),
+            .rmw_count_out()
+        );
+    end else begin : g_direct
+        assign write_led = led_lookup_address;
+        assign write_color = camera_color;
+        assign write_request = led_color_buffer_update_enable && (led_lookup_address < NUM_LEDS);
+        assign frame_end = new_frame_in;
+    end
+endgenerate
+
+logic front;  // bank the LED side should read
+logic read_bank_pixel;  // bank the LED side is reading
+logic [NUM_LEDS-1:0] valid_bits[NUM_BANKS];
+logic [NUM_BANKS-1:0] stale;  // bank still has to be invalidated
+wire back = DOUBLE_BUFFER ? !front : 1'b0;
+wire back_free = !DOUBLE_BUFFER || (read_bank_pixel != back);
 
-logic [LED_ADDRESS_WIDTH-1:0] address_counter;
 logic last_wipe;
 always_ff @(posedge clk_pixel) begin
     last_wipe <= wipe;
     if (rst) begin
-        address_counter <= 0;
-        wiping <= 0;
-    end else if (wipe && !last_wipe) begin
-        wiping <= 1;
-        address_counter <= 0;
-    end else if (wiping) begin
-        if (address_counter == NUM_LEDS-1) begin
-            address_counter <= 0;
-            wiping <= 0;
-        end else begin
-            address_counter <= address_counter + 1;
+        front <= 0;
+        stale <= 0;
+    end else begin
+        if (wipe && !last_wipe) begin
+            stale <= '1;
+        end else if (back_free && stale[back]) begin
+            stale[back] <= 0;
+        end
+        if (DOUBLE_BUFFER && frame_end && back_free) begin
+            front <= back;
         end
     end
 end
-
+assign wiping = |stale;
 
 logic write_to_buffer;
-assign write_to_buffer = ((led_color_buffer_update_enable) && (led_lookup_address < NUM_LEDS) && !wiping);
-wire [23:0] write_value = write_to_buffer ? camera_color : 0;
-wire [LED_ADDRESS_WIDTH-1:0] writing_address = wiping ? address_counter : led_lookup_address;
+assign write_to_buffer = write_request && back_free;
+wire [RAM_ADDRESS_WIDTH-1:0] writing_address = back * NUM_LEDS + write_led;
+
+always_ff @(posedge clk_pixel) begin
+    if (rst) begin
+        for (int b = 0; b < NUM_BANKS; b++) begin
+            valid_bits[b] <= 0;
+        end
+    end else if (back_free && stale[back]) begin
+        valid_bits[back] <= 0;
+    end
+    if (!rst && write_to_buffer) begin
+        valid_bits[back][write_led] <= 1'b1;
+    end
+end
+
+// LED SIDE
+logic front_led;
+logic read_bank;
+generate
+    if (DOUBLE_BUFFER) begin : g_bank_cross
+        synchronizer #(
+            .DEPTH(2)
+        ) sync_front (
+            .clk_in(clk_led),
+            .rst_in(rst),
+            .data_in(front),
+            .data_out(front_led)
+        );
+        synchronizer #(
+            .DEPTH(2)
+        ) sync_read_bank (
+            .clk_in(clk_pixel),
+            .rst_in(rst),
+            .data_in(read_bank),
+            .data_out(read_bank_pixel)
+        );
+    end else begin : g_single_bank
+        assign front_led = 1'b0;
+        assign read_bank_pixel = 1'b0;
+    end
+endgenerate
+
+always_ff @(posedge clk_led) begin
+    if (rst) begin
+        read_bank <= 0;
+    end else if (next_led_request_address == 0) begin
+        // a new refresh starts
+        read_bank <= front_led;
+    end
+end
+wire [RAM_ADDRESS_WIDTH-1:0] reading_address = read_bank * NUM_LEDS + next_led_request_address;
+
+// delayed to line up with the RAM output; with DOUBLE_BUFFER the read bank's valid bits do not change
+// while it is read
+logic [1:0] read_valid;
+always_ff @(posedge clk_led) begin
+    if (rst) begin
+        read_valid <= 0;
+    end else begin
+        read_valid <= {read_valid[0], (next_led_request_address < NUM_LEDS) && valid_bits[read_bank][next_led_request_address]};
+    end
+end
+logic [FBUF_COLOR_WIDTH-1:0] ram_out;
+assign data_out = read_valid[1] ? ram_out : 0;
 
 xilinx_true_dual_port_read_first_2_clock_ram #(
     .RAM_WIDTH(FBUF_COLOR_WIDTH),
-    .RAM_DEPTH(NUM_LEDS)
+    .RAM_DEPTH(NUM_BANKS * NUM_LEDS)
 ) led_color_ram (
     // INPUT FROM CAMERA
     .clka(clk_pixel),                       // Port A clock
     .addra(writing_address),             // Port A address bus, width determined from RAM_DEPTH
-    .dina(write_value),                    // Port A RAM input data
-    .wea(1'b1),                  // Port A write enable
+    .dina(write_color),                    // Port A RAM input data
+    .wea(write_to_buffer),  // Port A write enable
     .ena(1'b1),                             // Port A RAM Enable, for additional power savings, disable port when not in use
     .rsta(rst),                             // Port A output reset (does not affect memory contents)
     .douta(),                               // Port A RAM output data
     .regcea(1'b1),                          // Port A output register enable
     // OUTPUT TO LED DRIVER
     .clkb(clk_led),                         // Port B clock
-    .addrb(next_led_request_address),       // Port B address bus, width determined from RAM_DEPTH
+    .addrb(reading_address),       // Port B address bus, width determined from RAM_DEPTH
     .web(1'b0),                             // Port B write enable
     .enb(1'b1),                             // Port B RAM Enable, for additional power savings, disable port when not in use
     .rstb(rst),                             // Port B output reset (does not affect memory contents)
-    .doutb(data_out),                       // Port B RAM output data
+    .doutb(ram_out),                       // Port B RAM output data
     .regceb(1'b1)                          // Port B output register enable
 );
 
 
 // LED DRIVER LOGIC
-assign red_out = {4'b0, data_out[23:20]};
-assign green_out = {4'b0, data_out[15:12]};
-assign blue_out = {4'b0, data_out[7:4]};
+// 4 bits of brightness is plenty
+function automatic logic [7:0] dim(input logic [7:0] color);
+    if (!ACCUMULATE) begin
+        return {4'b0, color[7:4]};
+    end
+    return (color >= 8'hF8) ? 8'h0F : {4'b0, 4'((color + 8'h8) >> 4)};
+endfunction
+assign red_out = dim(data_out[23:16]);
+assign green_out = dim(data_out[15:8]);
+assign blue_out = dim(data_out[7:0]);
 
-logic [LED_ADDRESS_WIDTH-1:0] last_led_request_address;
-logic [LED_ADDRESS_WIDTH-1:0] last_last_led_request_address;
+logic [RAM_ADDRESS_WIDTH-1:0] last_led_request_address;
+logic [RAM_ADDRESS_WIDTH-1:0] last_last_led_request_address;
 
 always_ff @(posedge clk_led) begin
     if (rst) begin
-        last_led_request_address <= next_led_request_address;
+        last_led_request_address <= reading_address;
         last_last_led_request_address <= 0;
     end else begin
         last_last_led_request_address <= last_led_request_address;
-        last_led_request_address <= next_led_request_address;
-        // Color is valid if current request is the same as the request the last 2 cycles
-        color_valid <= ((next_led_request_address == last_last_led_request_address) && (last_led_request_address == next_led_request_address));
+        last_led_request_address <= reading_address;
+        // Color is valid if current request (and bank) is the same as the request the last 2 cycles
+        color_valid <= ((reading_address == last_last_led_request_address) && (last_led_request_address == reading_address));
     end
 end
 
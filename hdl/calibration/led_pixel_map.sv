@@ -0,0 +1,196 @@
+`timescale 1ns / 1ps
+`include "mem/xilinx_true_dual_port_read_first_2_clock_ram.v"
+`include "common/synchronizer.sv"
+`include "calibration/led_color_accumulator.sv"
+`default_nettype none
+
+// LED to camera frame buffer map: the centroid of every LED's pixels, built once after calibration,
+// so the LED side can read each LED's color straight out of the frame buffer instead of waiting for
+// the HDMI raster to stream the calibration table past led_color_buffer.
+// Building (clk_pixel): a rising build_in waits for the next frame, then feeds that frame's
+// (led_id_in, hcount_in, vcount_in) through led_color_accumulator, which averages the frame buffer
+// coordinates (the HDMI ones shifted down by SCALE_SHIFT) of every LED, center_of_mass for every LED
+// at once. When the frame ends each LED that was seen gets the frame buffer address of its centroid,
+// mirrored like top_level's addrb, and LEDs that were not seen read black. ready_out (clk_led) goes
+// high once a map is built and low again on the next rising build_in.
+// Fetching (clk_led): next_led_request_address is looked up in the map and the address goes out on
+// fb_addr_out to a frame buffer port with 2 cycles of latency, the RGB565 pixel on fb_pixel_in is
+// dimmed to 4 bits like led_color_buffer. color_valid is high once the request has been stable long
+// enough for the pixel to be the one it asked for.
+module led_pixel_map #(
+    parameter int NUM_LEDS = 50,
+    parameter int LED_ADDRESS_WIDTH = $clog2(NUM_LEDS),
+    parameter int FB_WIDTH = 320,
+    parameter int FB_HEIGHT = 180,
+    parameter int SCALE_SHIFT = 2,  // HDMI pixels are 1 << SCALE_SHIFT frame buffer pixels wide
+    localparam int FB_SIZE = $clog2(FB_WIDTH * FB_HEIGHT),
+    localparam int CoordWidth = $clog2(FB_WIDTH > FB_HEIGHT ? FB_WIDTH : FB_HEIGHT)
+) (
+    input wire rst,
+    // Clocked off of HDMI pixel clock
+    input wire clk_pixel,
+    input wire build_in,
+    input wire [LED_ADDRESS_WIDTH-1:0] led_id_in,
+    input wire [10:0] hcount_in,
+    input wire [9:0] vcount_in,
+    input wire valid_in,
+    input wire new_frame_in,
+    // Clocked off of LED driver clock
+    input wire clk_led,
+    output logic ready_out,
+    input wire [LED_ADDRESS_WIDTH-1:0] next_led_request_address,
+    output logic [FB_SIZE-1:0] fb_addr_out,
+    input wire [15:0] fb_pixel_in,  // 5:6:5
+    output logic [7:0] green_out,
+    output logic [7:0] red_out,
+    output logic [7:0] blue_out,
+    output logic color_valid
+);
+    // frame buffer address to pixel
+    localparam int FB_LATENCY = 2;
+
+    // PIXEL SIDE
+    enum logic [1:0] {
+        IDLE,
+        WAIT_FRAME,
+        COLLECT,
+        WALK
+    } state;
+
+    logic last_build;
+    logic built;
+    logic [NUM_LEDS-1:0] valid_bits;
+
+    logic [LED_ADDRESS_WIDTH-1:0] centroid_led;
+    logic [3*CoordWidth-1:0] centroid;
+    logic centroid_valid;
+    logic walk_done;
+
+    // the frame buffer column of hcount is mirrored, see top_level's addrb
+    wire [CoordWidth-1:0] centroid_x = centroid[2*CoordWidth+:CoordWidth];
+    wire [CoordWidth-1:0] centroid_y = centroid[CoordWidth+:CoordWidth];
+    wire [FB_SIZE-1:0] centroid_address = (FB_WIDTH - 1 - centroid_x) + FB_WIDTH * centroid_y;
+
+    always_ff @(posedge clk_pixel) begin
+        last_build <= build_in;
+        if (rst) begin
+            state <= IDLE;
+            built <= 0;
+            valid_bits <= 0;
+        end else if (build_in && !last_build) begin
+            state <= WAIT_FRAME;
+            built <= 0;
+        end else begin
+            case (state)
+                WAIT_FRAME: begin
+                    if (new_frame_in) begin
+                        state <= COLLECT;
+                    end
+                end
+                COLLECT: begin
+                    if (new_frame_in) begin
+                        // the accumulator walks its LEDs now, forget the old map
+                        valid_bits <= 0;
+                        state <= WALK;
+                    end
+                end
+                WALK: begin
+                    if (centroid_valid) begin
+                        valid_bits[centroid_led] <= 1'b1;
+                    end
+                    if (walk_done) begin
+                        built <= 1;
+                        state <= IDLE;
+                    end
+                end
+                default: begin
+                    state <= IDLE;
+                end
+            endcase
+        end
+    end
+
+    led_color_accumulator #(
+        .NUM_LEDS(NUM_LEDS),
+        .LED_ADDRESS_WIDTH(LED_ADDRESS_WIDTH),
+        .CHANNEL_WIDTH(CoordWidth)
+    ) centroids (
+        .clk_in(clk_pixel),
+        .rst_in(rst),
+        .led_id_in(led_id_in),
+        .color_in({CoordWidth'(hcount_in >> SCALE_SHIFT), CoordWidth'(vcount_in >> SCALE_SHIFT), CoordWidth'(0)}),
+        .valid_in(valid_in && (state == COLLECT) && (led_id_in < NUM_LEDS)),
+        .new_frame_in(new_frame_in && (state == COLLECT)),
+        .led_id_out(centroid_led),
+        .color_out(centroid),
+        .valid_out(centroid_valid),
+        .frame_done_out(walk_done),
+        .rmw_count_out()
+    );
+
+    // LED SIDE
+    synchronizer #(
+        .DEPTH(2)
+    ) sync_built (
+        .clk_in(clk_led),
+        .rst_in(rst),
+        .data_in(built),
+        .data_out(ready_out)
+    );
+
+    // delayed to line up with the frame buffer pixel, the map does not change while ready_out is high
+    logic [FB_LATENCY+1:0] read_valid;
+    always_ff @(posedge clk_led) begin
+        if (rst) begin
+            read_valid <= 0;
+        end else begin
+            read_valid <= {read_valid[FB_LATENCY:0], (next_led_request_address < NUM_LEDS) && valid_bits[next_led_request_address]};
+        end
+    end
+
+    xilinx_true_dual_port_read_first_2_clock_ram #(
+        .RAM_WIDTH(FB_SIZE),
+        .RAM_DEPTH(NUM_LEDS)
+    ) centroid_ram (
+        // INPUT FROM THE BUILD
+        .clka(clk_pixel),
+        .addra(centroid_led),
+        .dina(centroid_address),
+        .wea(centroid_valid && (state == WALK)),
+        .ena(1'b1),
+        .rsta(rst),
+        .douta(),
+        .regcea(1'b1),
+        // OUTPUT TO THE FRAME BUFFER
+        .clkb(clk_led),
+        .addrb(next_led_request_address),
+        .web(1'b0),
+        .enb(1'b1),
+        .rstb(rst),
+        .doutb(fb_addr_out),
+        .regceb(1'b1)
+    );
+
+    // 4 bits of brightness is plenty
+    wire pixel_valid = read_valid[FB_LATENCY+1];
+    assign red_out = pixel_valid ? {4'b0, fb_pixel_in[15:12]} : 8'b0;
+    assign green_out = pixel_valid ? {4'b0, fb_pixel_in[10:7]} : 8'b0;
+    assign blue_out = pixel_valid ? {4'b0, fb_pixel_in[4:1]} : 8'b0;
+
+    // 2 cycles of map and FB_LATENCY of frame buffer after the request changed
+    localparam int SETTLE = 2 + FB_LATENCY - 1;
+    logic [LED_ADDRESS_WIDTH-1:0] last_led_request_address;
+    logic [$clog2(SETTLE+1)-1:0] stable_cycles;
+    always_ff @(posedge clk_led) begin
+        last_led_request_address <= next_led_request_address;
+        if (rst || (next_led_request_address != last_led_request_address)) begin
+            stable_cycles <= 0;
+        end else if (stable_cycles != SETTLE) begin
+            stable_cycles <= stable_cycles + 1;
+        end
+    end
+    assign color_valid = (next_led_request_address == last_led_request_address) && (stable_cycles == SETTLE);
+
+endmodule
+
+`default_nettype wire
@@ -0,0 +1,124 @@
+`timescale 1ns / 1ps  // (comment to prevent autoformatting)
+`include "mem/xilinx_true_dual_port_read_first_1_clock_ram.v"
+`default_nettype none
+
+// Tells when the camera has settled on a new LED pattern.
+// Keeps the two mask bits of every sampled pixel of the last frame in BRAM and counts the samples whose
+// mask changed since then, along with the lit samples (either mask set). Whole-frame counts barely move
+// between address bits of the same LED layout, the changed samples are about half the lit ones. A frame is
+// stable when at most lit >> TOLERANCE_SHIFT of its samples changed, so the noise allowed grows with the
+// LEDs in view. Stable frames only count once the masks moved away from the pattern at start_in: a frame
+// since then was not stable (the reference frame too, it compares with the frame start_in came in). From
+// there, once SETTLE_FRAMES frames in a row are stable, settled_out goes high and stays high until the next
+// start_in. A camera that never shows a change (still on the old pattern, or a pattern that did not change)
+// never settles, the caller's timeout has to end the wait.
+// start_in restarts the detector (the pattern just changed); the frame in progress is partial, so
+// counting starts at the next new_frame_in and that first frame only serves as the reference.
+// The samples have to come in the same order every frame, at most NUM_PIXELS of them.
+module settle_detector #(
+    parameter int NUM_PIXELS = 320 * 180,  // sampled pixels per frame
+    parameter int SETTLE_FRAMES = 2,
+    parameter int TOLERANCE_SHIFT = 3,  // a stable frame changed on at most 1/8 of its lit samples
+    localparam int COUNT_WIDTH = $clog2(NUM_PIXELS + 1),
+    localparam int ADDR_WIDTH = $clog2(NUM_PIXELS)
+) (
+    input wire clk_in,
+    input wire rst_in,
+    input wire start_in,
+    input wire new_frame_in,
+    input wire pixel_valid_in,  // the pixel is sampled
+    input wire [1:0] mask_in,
+    output logic settled_out,
+    output logic [7:0] frames_out  // whole frames seen since start_in, saturating
+);
+
+    logic armed;  // seen the first frame boundary since start_in
+    logic have_reference;
+    logic moved;  // a frame since start_in was not stable
+    logic [$clog2(SETTLE_FRAMES+1)-1:0] stable_frames;
+
+    // port A reads a sample's last mask, port B writes the new one on the next cycle
+    logic [COUNT_WIDTH-1:0] sample;  // index of the next sample in the frame
+    wire sampling = pixel_valid_in && !new_frame_in && (sample < NUM_PIXELS);
+    logic compare;
+    logic [ADDR_WIDTH-1:0] compare_addr;
+    logic [1:0] compare_mask;
+    logic [1:0] last_mask;
+
+    xilinx_true_dual_port_read_first_1_clock_ram #(
+        .RAM_WIDTH(2),
+        .RAM_DEPTH(NUM_PIXELS),
+        .RAM_PERFORMANCE("LOW_LATENCY")  // 1 cycle reading
+    ) last_frame (
+        .clka(clk_in),
+        .addra(sample[ADDR_WIDTH-1:0]),
+        .douta(last_mask),
+        .dina('0),
+        .wea(1'b0),
+        .addrb(compare_addr),
+        .dinb(compare_mask),
+        .web(compare),
+        .doutb(),
+        .ena(1'b1),
+        .enb(1'b1),
+        .rsta(rst_in),
+        .rstb(rst_in),
+        .regcea(1'b1),
+        .regceb(1'b0)
+    );
+
+    // the sample being compared counts towards the frame it came in
+    logic [COUNT_WIDTH-1:0] changed;
+    logic [COUNT_WIDTH-1:0] lit;
+    wire [COUNT_WIDTH-1:0] changed_total = changed + (compare && (last_mask != compare_mask));
+    wire [COUNT_WIDTH-1:0] lit_total = lit + (compare && (compare_mask != 0));
+    wire still = changed_total <= (lit_total >> TOLERANCE_SHIFT);
+    wire stable = have_reference && moved && still;
+
+    always_ff @(posedge clk_in) begin
+        if (rst_in) begin
+            sample <= 0;
+            compare <= 0;
+        end else begin
+            // the masks are kept across start_in, only the counts start over
+            sample <= new_frame_in ? 0 : sample + sampling;
+            compare <= sampling;
+            compare_addr <= sample[ADDR_WIDTH-1:0];
+            compare_mask <= mask_in;
+        end
+
+        if (rst_in || start_in) begin
+            armed <= 0;
+            have_reference <= 0;
+            moved <= 0;
+            stable_frames <= 0;
+            settled_out <= 0;
+            frames_out <= 0;
+            changed <= 0;
+            lit <= 0;
+        end else if (new_frame_in) begin
+            armed <= 1;
+            if (armed) begin
+                have_reference <= 1;
+                moved <= moved || !still;
+                frames_out <= (frames_out == 8'hFF) ? frames_out : frames_out + 1;
+                if (stable) begin
+                    if (stable_frames + 1 >= SETTLE_FRAMES) begin
+                        settled_out <= 1;
+                    end
+                    stable_frames <= (stable_frames == SETTLE_FRAMES) ? stable_frames : stable_frames + 1;
+                end else begin
+                    stable_frames <= 0;
+                end
+            end
+            changed <= 0;
+            lit <= 0;
+        end else begin
+            changed <= changed_total;
+            lit <= lit_total;
+        end
+    end
+
+endmodule
+
+`default_nettype wire
@@ -1,10 +1,13 @@
 `timescale 1ns / 1ps  // (comment to prevent autoformatting)
 `include "pixel/pixel_reconstruct.sv"
-`include "pixel/rgb_to_ycrcb.sv"
+`include "pixel/fb_pixel_convert.sv"
 `include "common/synchronizer.sv"
 `default_nettype none
 
 module camera_reader #(
+    // second copy of the frame buffer read on clk_led at led_addr/led_pixel (led_pixel_map), another
+    // 320x180x16 of BRAM because both ports of the first one are taken
+    parameter LED_PORT = 0,
     localparam FB_DEPTH = 320 * 180,
     localparam FB_SIZE  = $clog2(FB_DEPTH)
 ) (
@@ -19,6 +22,10 @@ module camera_reader #(
     input wire [FB_SIZE-1:0] addrb,
     input wire good_addrb,
     input wire pattern_enable,
+    input wire clk_led,
+    input wire [FB_SIZE-1:0] led_addr,
+    output logic [15:0] led_pixel,  // 5:6:5, 2 cycles after led_addr
+    output logic camera_frame_out,  // on clk_camera, a pulse at the end of every camera frame
     output logic [7:0] red,
     green,
     blue,
@@ -62,7 +69,8 @@ module camera_reader #(
         .pixel_valid_out(camera_valid),
         .pixel_hcount_out(camera_hcount),
         .pixel_vcount_out(camera_vcount),
-        .pixel_data_out(camera_pixel)
+        .pixel_data_out(camera_pixel),
+        .frame_done_out(camera_frame_out)
     );
 
     //two-port BRAM used to hold image from camera.
@@ -142,42 +150,42 @@ module camera_reader #(
         .enb(1'b1),
         .doutb(frame_buff_raw)
     );
+    if (LED_PORT) begin : g_led_port
+        blk_mem_gen_0 frame_buffer_led (
+            .addra(addra),  //written exactly like frame_buffer
+            .clka(clk_camera),
+            .wea(valid_camera_mem),
+            .dina(camera_mem),
+            .ena(1'b1),
+            .douta(),
+            .addrb(led_addr),
+            .dinb(16'b0),
+            .clkb(clk_led),
+            .web(1'b0),
+            .enb(1'b1),
+            .doutb(led_pixel)
+        );
+    end else begin : g_no_led_port
+        assign led_pixel = 16'b0;
+    end
 `endif
     logic [15:0] frame_buff_raw;  //data out of frame buffer (565)
 
     //split fame_buff into 3 8 bit color channels (5:6:5 adjusted accordingly)
-    //remapped frame_buffer outputs with 8 bits for r, g, b
+    //and convert them to YCrCb, the YCrCb outputs lag the RGB ones by 3 cycles
     logic [7:0] fb_red, fb_green, fb_blue;
-    always_ff @(posedge clk_pixel) begin
-        fb_red   <= good_addrb ? {frame_buff_raw[15:11], 3'b0} : 8'b0;
-        fb_green <= good_addrb ? {frame_buff_raw[10:5], 2'b0} : 8'b0;
-        fb_blue  <= good_addrb ? {frame_buff_raw[4:0], 3'b0} : 8'b0;
-    end
-    // Pixel Processing pre-HDMI output
-
-    // RGB to YCrCb
-
-    //output of rgb to ycrcb conversion (10 bits due to module):
-    logic [9:0] y_full, cr_full, cb_full;  //ycrcb conversion of full pixel
-    //Convert RGB of full pixel to YCrCb
-    //See lecture 07 for YCrCb discussion.
-    //Module has a 3 cycle latency
-    rgb_to_ycrcb rgbtoycrcb_m (
+    fb_pixel_convert fb_pixel_convert_m (
         .clk_in(clk_pixel),
-        .r_in  (fb_red),
-        .g_in  (fb_green),
-        .b_in  (fb_blue),
-        .y_out (y_full),
-        .cr_out(cr_full),
-        .cb_out(cb_full)
+        .pixel_in(frame_buff_raw),
+        .valid_in(good_addrb),
+        .red_out(fb_red),
+        .green_out(fb_green),
+        .blue_out(fb_blue),
+        .y_out(y),
+        .cr_out(cr),
+        .cb_out(cb)
     );
 
-    //take lower 8 of full outputs.
-    // treat cr and cb as signed numbers, invert the MSB to get an unsigned equivalent ( [-128,128) maps to [0,256) )
-    assign y  = y_full[7:0];
-    assign cr = {!cr_full[7], cr_full[6:0]};
-    assign cb = {!cb_full[7], cb_full[6:0]};
-
     synchronizer #(
         .DEPTH(3),
         .WIDTH(3 * 8)
@@ -0,0 +1,126 @@
+`timescale 1ns / 1ps  // (comment to prevent autoformatting)
+`include "common/synchronizer.sv"
+`default_nettype none
+
+// Telemetry for the whole pipeline, all on clk_in.
+// Rates: every event input flips once per event and may come from any clock domain, it is synchronized
+// here and its flips are counted over a second (CLOCK_SPEED cycles). The *_rate_out hold the last
+// second's count, saturating.
+// Residency: cycles state_in (aduli_fsm's state) spent in every state since it last left state 0
+// (DISPLAY), so once a calibration is over they split its time between showing IDs and running steps.
+// The last calibration step's figures come from calibration_step_fsm, crossed into clk_in by the caller.
+// select_in picks one value for value_out (sim/model/telemetry.py has the same list):
+//   0: camera frames / s           4: cycles in state 1 (SHOW_CALIB_LED)   8: step camera wait, frames
+//   1: HDMI frames / s             5: cycles in state 2 (RUN_CALIB_STEP)   9: step frames captured
+//   2: LED refreshes / s           6: step cycles                         10: verification mismatches
+//   3: LED underruns / s           7: step camera wait, cycles            11: table slots used
+// anything else reads 0.
+module perf_counters #(
+    parameter int CLOCK_SPEED = 100_000_000
+) (
+    input wire clk_in,
+    input wire rst_in,
+    // event toggles
+    input wire camera_frame_in,
+    input wire hdmi_frame_in,
+    input wire led_refresh_in,
+    input wire led_underrun_in,
+    input wire [1:0] state_in,
+    // the last calibration step
+    input wire [31:0] step_cycles_in,
+    input wire [31:0] wait_cycles_in,
+    input wire [7:0] wait_frames_in,
+    input wire [7:0] capture_frames_in,
+    input wire [15:0] mismatches_in,
+    input wire [15:0] slots_used_in,
+    output logic [15:0] camera_rate_out,
+    output logic [15:0] hdmi_rate_out,
+    output logic [15:0] led_refresh_rate_out,
+    output logic [15:0] led_underrun_rate_out,
+    output logic [3:0][31:0] residency_out,
+    input wire [3:0] select_in,
+    output logic [31:0] value_out
+);
+
+    logic [3:0] events_sync;
+    logic [3:0] events_prev;
+    synchronizer #(
+        .DEPTH(2),
+        .WIDTH(4)
+    ) sync_events (
+        .clk_in(clk_in),
+        .rst_in(rst_in),
+        .data_in({led_underrun_in, led_refresh_in, hdmi_frame_in, camera_frame_in}),
+        .data_out(events_sync)
+    );
+    wire [3:0] events = events_sync ^ events_prev;
+
+    logic [$clog2(CLOCK_SPEED)-1:0] window_counter;
+    wire window_end = window_counter == CLOCK_SPEED - 1;
+    logic [15:0] counts[4];
+    logic [15:0] rates[4];
+    logic [15:0] next_counts[4];
+    always_comb begin
+        for (int i = 0; i < 4; i++) begin
+            next_counts[i] = counts[i] + (events[i] && (counts[i] != 16'hFFFF));
+        end
+    end
+
+    logic [1:0] prev_state;
+
+    always_ff @(posedge clk_in) begin
+        if (rst_in) begin
+            events_prev <= 0;
+            window_counter <= 0;
+            prev_state <= 0;
+            for (int i = 0; i < 4; i++) begin
+                counts[i] <= 0;
+                rates[i] <= 0;
+                residency_out[i] <= 0;
+            end
+        end else begin
+            events_prev <= events_sync;
+
+            window_counter <= window_end ? 0 : window_counter + 1;
+            for (int i = 0; i < 4; i++) begin
+                counts[i] <= window_end ? 0 : next_counts[i];
+                if (window_end) begin
+                    rates[i] <= next_counts[i];
+                end
+            end
+
+            prev_state <= state_in;
+            for (int s = 0; s < 4; s++) begin
+                if ((prev_state == 0) && (state_in != 0)) begin
+                    residency_out[s] <= (state_in == s);
+                end else if ((state_in == s) && (residency_out[s] != '1)) begin
+                    residency_out[s] <= residency_out[s] + 1;
+                end
+            end
+        end
+    end
+    assign camera_rate_out = rates[0];
+    assign hdmi_rate_out = rates[1];
+    assign led_refresh_rate_out = rates[2];
+    assign led_underrun_rate_out = rates[3];
+
+    always_comb begin
+        case (select_in)
+            4'd0: value_out = camera_rate_out;
+            4'd1: value_out = hdmi_rate_out;
+            4'd2: value_out = led_refresh_rate_out;
+            4'd3: value_out = led_underrun_rate_out;
+            4'd4: value_out = residency_out[1];
+            4'd5: value_out = residency_out[2];
+            4'd6: value_out = step_cycles_in;
+            4'd7: value_out = wait_cycles_in;
+            4'd8: value_out = wait_frames_in;
+            4'd9: value_out = capture_frames_in;
+            4'd10: value_out = mismatches_in;
+            4'd11: value_out = slots_used_in;
+            default: value_out = 0;
+        endcase
+    end
+endmodule
+
+`default_nettype wire
@@ -0,0 +1,51 @@
+`timescale 1ns / 1ps
+`default_nettype none
+
+// Single clock first-word-fall-through FIFO with valid/ready on both sides.
+// A word is written when valid_in && ready_out and read when valid_out && ready_in.
+// flush_in drops everything stored.
+module sync_fifo #(
+    parameter int WIDTH = 24,
+    parameter int DEPTH = 4,
+    localparam int CountWidth = $clog2(DEPTH + 1)
+) (
+    input wire clk_in,
+    input wire rst_in,
+    input wire flush_in,
+    input wire [WIDTH-1:0] data_in,
+    input wire valid_in,
+    output logic ready_out,
+    output logic [WIDTH-1:0] data_out,
+    output logic valid_out,
+    input wire ready_in,
+    output logic [CountWidth-1:0] count_out
+);
+    logic [WIDTH-1:0] words[DEPTH];
+    logic [$clog2(DEPTH)-1:0] read_ptr, write_ptr;
+
+    wire push = valid_in && ready_out;
+    wire pop = valid_out && ready_in;
+
+    assign ready_out = count_out != DEPTH;
+    assign valid_out = count_out != 0;
+    assign data_out = words[read_ptr];
+
+    always_ff @(posedge clk_in) begin
+        if (rst_in || flush_in) begin
+            read_ptr <= 0;
+            write_ptr <= 0;
+            count_out <= 0;
+        end else begin
+            if (push) begin
+                words[write_ptr] <= data_in;
+                write_ptr <= (write_ptr == DEPTH - 1) ? 0 : write_ptr + 1;
+            end
+            if (pop) begin
+                read_ptr <= (read_ptr == DEPTH - 1) ? 0 : read_ptr + 1;
+            end
+            count_out <= count_out + push - pop;
+        end
+    end
+endmodule
+
+`default_nettype wire
@@ -4,15 +4,17 @@
 module lab05_ssc #(
     parameter COUNT_TO = 100000
 ) (
-    input  wire        clk_in,
-    input  wire        rst_in,
-    input  wire  [7:0] lt_in,
-    input  wire  [7:0] ut_in,
-    input  wire  [7:0] val3_in,
-    input  wire  [3:0] step_in,
-    input  wire  [3:0] sel_led_in,
-    output logic [6:0] cat_out,
-    output logic [7:0] an_out
+    input  wire         clk_in,
+    input  wire         rst_in,
+    input  wire  [ 7:0] lt_in,
+    input  wire  [ 7:0] ut_in,
+    input  wire  [ 7:0] val3_in,
+    input  wire  [ 3:0] step_in,
+    input  wire  [ 3:0] sel_led_in,
+    input  wire         show_value_in,  // all eight digits show value_in instead
+    input  wire  [31:0] value_in,
+    output logic [ 6:0] cat_out,
+    output logic [ 7:0] an_out
 );
 
     logic [ 7:0] segment_state;
@@ -39,17 +41,26 @@ module lab05_ssc #(
     end
 
     always_comb begin
-        case (segment_state)
-            8'b0000_0001: routed_vals = val3_in[3:0];
-            8'b0000_0010: routed_vals = val3_in[7:4];
-            8'b0000_0100: routed_vals = sel_led_in[3:0];
-            8'b0000_1000: routed_vals = step_in[3:0];
-            8'b0001_0000: routed_vals = lt_in[3:0];
-            8'b0010_0000: routed_vals = lt_in[7:4];
-            8'b0100_0000: routed_vals = ut_in[3:0];
-            8'b1000_0000: routed_vals = ut_in[7:4];
-            default:      routed_vals = 4'b0;
-        endcase
+        if (show_value_in) begin
+            routed_vals = 4'b0;
+            for (int i = 0; i < 8; i++) begin
+                if (segment_state[i]) begin
+                    routed_vals = value_in[4*i+:4];
+                end
+            end
+        end else begin
+            case (segment_state)
+                8'b0000_0001: routed_vals = val3_in[3:0];
+                8'b0000_0010: routed_vals = val3_in[7:4];
+                8'b0000_0100: routed_vals = sel_led_in[3:0];
+                8'b0000_1000: routed_vals = step_in[3:0];
+                8'b0001_0000: routed_vals = lt_in[3:0];
+                8'b0010_0000: routed_vals = lt_in[7:4];
+                8'b0100_0000: routed_vals = ut_in[3:0];
+                8'b1000_0000: routed_vals = ut_in[7:4];
+                default:      routed_vals = 4'b0;
+            endcase
+        end
     end
 
 
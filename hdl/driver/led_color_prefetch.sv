@@ -0,0 +1,108 @@
+`timescale 1ns / 1ps
+`include "common/sync_fifo.sv"
+`default_nettype none
+
+// Fetches LED colors ahead of multi_strand_driver into a FIFO.
+// The color sources (led_color_buffer, id_shower, moving_pix, pat_gradient) answer a next_led_request
+// address with a color and color_valid. This walks the addresses in the order the strands are sent:
+// LED 0 of every strand, then LED 1 of every strand and so on, LED l of strand s being
+// s*LEDS_PER_STRAND + l. Each address is held for REQUEST_LATENCY cycles (the sources answer a
+// changed request a few cycles late and keep color_valid high meanwhile) and its color is taken on
+// the first color_valid after that. Addresses past NUM_LEDS are not requested (next_led_request keeps
+// the last real address, the sources take a request for LED 0 as the start of a refresh) and come
+// out black.
+// Once every strand has its color the LED is pushed into the FIFO as one word, strand 0 in the low
+// bits, and fetching carries on with the next LED (wrapping around to the next refresh) as long as
+// there is room. flush_in drops the FIFO and starts over at LED 0.
+module led_color_prefetch #(
+    parameter int NUM_LEDS = 20,
+    parameter int NUM_STRANDS = 4,
+    parameter int COLOR_WIDTH = 8,
+    parameter int REQUEST_LATENCY = 3,
+    parameter int DEPTH = 4,
+    localparam int LEDS_PER_STRAND = (NUM_LEDS + NUM_STRANDS - 1) / NUM_STRANDS,
+    localparam int CounterWidth = $clog2(NUM_LEDS),
+    localparam int WordWidth = COLOR_WIDTH * 3
+) (
+    input wire rst_in,
+    input wire clk_in,
+    input wire flush_in,
+    // color source
+    output logic [CounterWidth-1:0] next_led_request,
+    output logic request_valid,  // a fetch is waiting on next_led_request
+    input wire [COLOR_WIDTH-1:0] green_in,
+    input wire [COLOR_WIDTH-1:0] red_in,
+    input wire [COLOR_WIDTH-1:0] blue_in,
+    input wire color_valid,
+    // driver, {green, red, blue} of every strand
+    output logic [NUM_STRANDS*WordWidth-1:0] words_out,
+    output logic words_valid_out,
+    input wire words_ready_in
+);
+    localparam int AddressWidth = $clog2(LEDS_PER_STRAND * NUM_STRANDS + 1);
+
+    logic [NUM_STRANDS*WordWidth-1:0] next_words;
+    logic next_full;
+    logic [$clog2(LEDS_PER_STRAND+1)-1:0] fetch_led;
+    logic [$clog2(NUM_STRANDS+1)-1:0] fetch_strand;
+    logic [$clog2(REQUEST_LATENCY+1)-1:0] fetch_wait;
+    logic fifo_ready;
+
+    wire [AddressWidth-1:0] fetch_address = fetch_strand * LEDS_PER_STRAND + fetch_led;
+    wire fetch_black = fetch_address >= NUM_LEDS;
+    wire fetch_done = !next_full && (fetch_black || (fetch_wait == REQUEST_LATENCY && color_valid));
+
+    logic [CounterWidth-1:0] last_request;
+    always_ff @(posedge clk_in) begin
+        if (rst_in) begin
+            last_request <= 0;
+        end else if (!fetch_black) begin
+            last_request <= fetch_address[CounterWidth-1:0];
+        end
+    end
+    assign next_led_request = fetch_black ? last_request : fetch_address[CounterWidth-1:0];
+    assign request_valid = !next_full && !fetch_black;
+
+    always_ff @(posedge clk_in) begin
+        if (rst_in || flush_in) begin
+            next_full <= 0;
+            fetch_led <= 0;
+            fetch_strand <= 0;
+            fetch_wait <= 0;
+        end else if (next_full) begin
+            if (fifo_ready) begin
+                next_full <= 0;
+            end
+        end else if (fetch_done) begin
+            next_words[fetch_strand*WordWidth+:WordWidth] <= fetch_black ? 0 : {green_in, red_in, blue_in};
+            fetch_wait <= 0;
+            if (fetch_strand == NUM_STRANDS - 1) begin
+                fetch_strand <= 0;
+                fetch_led <= (fetch_led == LEDS_PER_STRAND - 1) ? 0 : fetch_led + 1;
+                next_full <= 1;
+            end else begin
+                fetch_strand <= fetch_strand + 1;
+            end
+        end else if (fetch_wait != REQUEST_LATENCY) begin
+            fetch_wait <= fetch_wait + 1;
+        end
+    end
+
+    sync_fifo #(
+        .WIDTH(NUM_STRANDS * WordWidth),
+        .DEPTH(DEPTH)
+    ) fifo (
+        .clk_in(clk_in),
+        .rst_in(rst_in),
+        .flush_in(flush_in),
+        .data_in(next_words),
+        .valid_in(next_full),
+        .ready_out(fifo_ready),
+        .data_out(words_out),
+        .valid_out(words_valid_out),
+        .ready_in(words_ready_in),
+        .count_out()
+    );
+endmodule
+
+`default_nettype wire
@@ -0,0 +1,157 @@
+`timescale 1ns / 1ps
+`ifndef max2
+`define max2(v1, v2) ((v1) > (v2) ? (v1) : (v2))
+`endif
+`default_nettype none  // prevents system from inferring an undeclared logic (good practice)
+// Drives NUM_STRANDS WS2812B strands in lockstep, same bit timing as led_driver.
+// The NUM_LEDS global LED addresses are split into contiguous runs of LEDS_PER_STRAND:
+// strand s shows LEDs s*LEDS_PER_STRAND .. (s+1)*LEDS_PER_STRAND-1, so a refresh takes
+// LEDS_PER_STRAND * 30us + 55us instead of NUM_LEDS * 30us + 55us.
+//
+// Colors come in as a stream from led_color_prefetch, one word per LED with the {green, red, blue}
+// of every strand, strand 0 in the low bits. A word is taken when words_valid_in && words_ready_out.
+// If the next word is not there when the last bit of an LED ends the strands go to RESET early,
+// underrun_count counts that and flush_out restarts the stream at LED 0 for the next refresh.
+// refresh_out pulses when the strands finish sending their last LED.
+module multi_strand_driver #(
+    parameter int CLOCK_SPEED = 100_000_000,  // 100MHz
+    parameter int NUM_LEDS = 20,
+    parameter int NUM_STRANDS = 4,
+    parameter int COLOR_WIDTH = 8,
+    localparam int LEDS_PER_STRAND = (NUM_LEDS + NUM_STRANDS - 1) / NUM_STRANDS,
+    localparam int WordWidth = COLOR_WIDTH * 3
+) (
+    input wire rst_in,  // active high
+    input wire clk_in,  // 100MHz
+    input wire force_reset,  // active high
+    input wire [NUM_STRANDS*WordWidth-1:0] words_in,
+    input wire words_valid_in,
+    output logic words_ready_out,
+    output logic flush_out,  // single cycle pulse, the next word has to be LED 0 again
+    output logic [NUM_STRANDS-1:0] strand_out,
+    output logic [15:0] underrun_count,  // saturating
+    output logic refresh_out  // single cycle pulse
+);
+    localparam int  // Signal timing per WS2812B datasheet (in ns units
+    T0H = 400,  // 0.4us high
+    T1H = 800,  // 0.8us high
+    T0L = 850,  // 0.85us low
+    T1L = 450,  // 0.45us low
+    RES = 55000;  // >50us reset
+
+    // Cycles for bit timing
+    localparam int  //
+    T0HCyc = T0H / 1e9 * CLOCK_SPEED,
+    T1HCyc = T1H / 1e9 * CLOCK_SPEED,
+    T0LCyc = T0L / 1e9 * CLOCK_SPEED,
+    T1LCyc = T1L / 1e9 * CLOCK_SPEED,
+    RESCyc = RES / 1e9 * CLOCK_SPEED;
+
+    // both bit values take the same time, so one counter times every strand
+    localparam int CycBitMax = `max2(T0HCyc + T0LCyc, T1HCyc + T1LCyc);
+    localparam int CycMax = `max2(CycBitMax, RESCyc);
+
+    enum logic [1:0] {
+        IDLE,
+        SEND,
+        RESET
+    } state;
+
+    logic [$clog2(CycMax)-1:0] cyc_counter;
+    logic [$clog2(WordWidth)-1:0] bit_counter;
+    logic [$clog2(LEDS_PER_STRAND+1)-1:0] led_counter;  // LED being sent on every strand
+    logic [WordWidth-1:0] bit_buffer[NUM_STRANDS];
+
+    wire bit_end = cyc_counter == CycBitMax - 1;
+    wire reset_end = cyc_counter == RESCyc - 1;
+    wire last_bit = bit_counter == WordWidth - 1;
+    wire last_led = led_counter == LEDS_PER_STRAND - 1;
+
+    wire word_end = state == SEND && bit_end && last_bit;
+    assign words_ready_out = !force_reset && (state == IDLE || (word_end && !last_led));
+    wire take_next = words_ready_out && words_valid_in;
+    wire underrun = !force_reset && word_end && !last_led && !words_valid_in;
+
+    always_ff @(posedge clk_in) begin
+        if (rst_in) begin
+            flush_out <= 0;
+            underrun_count <= 0;
+            refresh_out <= 0;
+        end else begin
+            refresh_out <= !force_reset && word_end && last_led;
+            // after the last LED the stream already carries on with LED 0
+            flush_out <= force_reset || underrun;
+            if (underrun && underrun_count != 16'hFFFF) begin
+                underrun_count <= underrun_count + 1;
+            end
+        end
+    end
+
+    // Signal driving
+    always_ff @(posedge clk_in) begin
+        if (rst_in) begin
+            state <= IDLE;
+            strand_out <= 0;
+            cyc_counter <= 0;
+            bit_counter <= 0;
+            led_counter <= 0;
+        end else if (force_reset) begin
+            state <= RESET;
+            strand_out <= 0;
+            cyc_counter <= 0;
+        end else begin
+            case (state)
+                IDLE: begin
+                    if (take_next) begin
+                        for (int s = 0; s < NUM_STRANDS; s++) begin
+                            bit_buffer[s] <= words_in[s*WordWidth+:WordWidth];
+                        end
+                        strand_out <= '1;
+                        cyc_counter <= 0;
+                        bit_counter <= 0;
+                        led_counter <= 0;
+                        state <= SEND;
+                    end
+                end
+                SEND: begin
+                    cyc_counter <= bit_end ? 0 : cyc_counter + 1;
+                    for (int s = 0; s < NUM_STRANDS; s++) begin
+                        if (cyc_counter == (bit_buffer[s][WordWidth-1] ? T1HCyc : T0HCyc) - 1) begin
+                            strand_out[s] <= 1'b0;
+                        end
+                    end
+                    if (bit_end) begin
+                        bit_counter <= last_bit ? 0 : bit_counter + 1;
+                        if (!last_bit) begin
+                            for (int s = 0; s < NUM_STRANDS; s++) begin
+                                bit_buffer[s] <= {bit_buffer[s][WordWidth-2:0], 1'b0};
+                            end
+                            strand_out <= '1;
+                        end else if (take_next) begin
+                            for (int s = 0; s < NUM_STRANDS; s++) begin
+                                bit_buffer[s] <= words_in[s*WordWidth+:WordWidth];
+                            end
+                            led_counter <= led_counter + 1;
+                            strand_out <= '1;
+                        end else begin
+                            // end of the strands, or the next word did not arrive in time
+                            strand_out <= 0;
+                            state <= RESET;
+                        end
+                    end
+                end
+                RESET: begin  // 50us reset
+                    cyc_counter <= cyc_counter + 1;
+                    if (reset_end) begin
+                        cyc_counter <= 0;
+                        state <= IDLE;
+                    end
+                end
+                default: begin
+                end
+            endcase
+        end
+    end
+endmodule
+
+`default_nettype wire
@@ -13,18 +13,25 @@ typedef enum logic [1:0] {
 } accum_request_t;
 `endif
 
+// Shift accumulating RAM: every write request reads its address and writes back the summand shifted
+// in at the bottom (WRITE), the summand alone (WRITE_OVER) or the disabled value (DISABLE), which locks
+// the address until it is written over. Results come out 2 cycles after the request and the write
+// lands the cycle after; the two writes still in flight are forwarded to a read of the same address,
+// so a stream of requests to any addresses, the same one every cycle included, sees every earlier write.
 module shift_accum_ram #(
     parameter WIDTH,
-    parameter DEPTH
+    parameter DEPTH,
+    parameter SUMMAND_WIDTH = 1,  // bits shifted in per write
+    parameter INIT_FILE = ""  // $readmemh file to preload the RAM with, all zeros if blank
 ) (
     input wire clk_in,
     input wire rst_in,
     input wire [$clog2(DEPTH)-1:0] addr_in,
-    input wire summand_in,
+    input wire [SUMMAND_WIDTH-1:0] summand_in,
     input wire accum_request_t request_type_in,
     input wire request_valid_in,
     output logic [WIDTH-1:0] read_out,
-    output logic summand_out,
+    output logic [SUMMAND_WIDTH-1:0] summand_out,
     output logic [WIDTH-1:0] sum_out,
     output logic [$clog2(DEPTH)-1:0] addr_out,
     output accum_request_t request_type_out,
@@ -42,7 +49,7 @@ module shift_accum_ram #(
         .data_out(addr_out)
     );
     synchronizer #(
-        .WIDTH(1),
+        .WIDTH(SUMMAND_WIDTH),
         .DEPTH(2)
     ) summand_sync (
         .clk_in  (clk_in),
@@ -69,27 +76,53 @@ module shift_accum_ram #(
         .data_out(result_valid_out)
     );
 
+    wire is_write = (request_type_out == WRITE) || (request_type_out == WRITE_OVER) || (request_type_out == DISABLE);
+
+    // the last two writes: the RAM read of the current request went out before they landed
+    logic [WIDTH-1:0] ram_out;
+    logic fwd_valid[2];
+    logic [$clog2(DEPTH)-1:0] fwd_addr[2];
+    logic [WIDTH-1:0] fwd_data[2];
+
+    always_ff @(posedge clk_in) begin
+        fwd_valid[0] <= !rst_in && result_valid_out && is_write;
+        fwd_valid[1] <= !rst_in && fwd_valid[0];
+        fwd_addr[0] <= addr_out;
+        fwd_addr[1] <= fwd_addr[0];
+        fwd_data[0] <= sum_out;
+        fwd_data[1] <= fwd_data[0];
+    end
+
+    always_comb begin
+        if (fwd_valid[0] && (fwd_addr[0] == addr_out)) begin
+            read_out = fwd_data[0];
+        end else if (fwd_valid[1] && (fwd_addr[1] == addr_out)) begin
+            read_out = fwd_data[1];
+        end else begin
+            read_out = ram_out;
+        end
+    end
+
     always_comb begin
         if (request_type_out == WRITE_OVER) begin
             sum_out = summand_sync.data_out;
         end else if ((request_type_out == DISABLE) || (read_out == DISABLED_VAL)) begin
             sum_out = DISABLED_VAL;  // maintain disable lockout
         end else begin
-            sum_out = {read_out[WIDTH-2:0], summand_sync.data_out};
+            sum_out = (read_out << SUMMAND_WIDTH) | summand_sync.data_out;
         end
     end
 
-    wire is_write = (request_type_out == WRITE) || (request_type_out == WRITE_OVER) || (request_type_out == DISABLE);
-
     xilinx_true_dual_port_read_first_1_clock_ram #(
         .RAM_WIDTH(WIDTH),
         .RAM_DEPTH(DEPTH),
-        .RAM_PERFORMANCE("HIGH_PERFORMANCE")  // 2 cycle reading
+        .RAM_PERFORMANCE("HIGH_PERFORMANCE"),  // 2 cycle reading
+        .INIT_FILE(INIT_FILE)
     ) mem (
         .clka(clk_in),  // Clock
         //reading port:
         .addra(addr_in),  // Port A address bus,
-        .douta(read_out),  // Port A RAM output data, width determined from RAM_WIDTH
+        .douta(ram_out),  // Port A RAM output data, width determined from RAM_WIDTH
         // .dina(pixel_data_in),  // Port A RAM input data
         .wea(1'b0),  // Port A write enable
         //writing port:
@@ -0,0 +1,179 @@
+`timescale 1ns / 1ps
+`include "mem/xilinx_true_dual_port_read_first_1_clock_ram.v"
+`include "mem/shift_accum_ram.sv"
+`default_nettype none
+
+// shift_accum_ram for a table where most entries are DISABLED_VAL: only SLOTS entries are stored.
+// An occupancy bitmap (WORD_BITS blocks per word, each word with the number of occupied blocks before
+// it) maps a block to its slot: the word's count plus the occupied blocks below it in the word.
+// Blocks that are not occupied read DISABLED_VAL and ignore writes.
+// Slots are handed out while allocate_in is high: the requests then have to come in block order, one
+// per block (a calibration capture frame); a WRITE_OVER occupies its block with the next slot, any
+// other request leaves it unoccupied. Once the slots run out the remaining blocks stay unoccupied,
+// slots_used_out is how many the last allocation took.
+// Requests are answered like shift_accum_ram, READ_LATENCY cycles after they come in.
+module sparse_accum_table #(
+    parameter WIDTH,
+    parameter BLOCKS,
+    parameter SLOTS,
+    parameter SUMMAND_WIDTH = 1,
+    parameter WORD_BITS = 32,
+    localparam WORDS = (BLOCKS + WORD_BITS - 1) / WORD_BITS,
+    localparam RANK_WIDTH = $clog2(SLOTS + 1),
+    localparam READ_LATENCY = 5  // bitmap read, slot, shift_accum_ram read
+) (
+    input wire clk_in,
+    input wire rst_in,
+    input wire allocate_in,
+    input wire [$clog2(BLOCKS)-1:0] addr_in,
+    input wire [SUMMAND_WIDTH-1:0] summand_in,
+    input wire accum_request_t request_type_in,
+    input wire request_valid_in,
+    output logic [WIDTH-1:0] read_out,
+    output logic [RANK_WIDTH-1:0] slots_used_out
+);
+    localparam DISABLED_VAL = {WIDTH{1'b1}};
+    localparam BIT_WIDTH = $clog2(WORD_BITS);
+
+    function automatic logic [BIT_WIDTH:0] popcount(input logic [WORD_BITS-1:0] bits);
+        popcount = 0;
+        for (int i = 0; i < WORD_BITS; i++) begin
+            popcount += bits[i];
+        end
+    endfunction
+
+    wire [$clog2(WORDS)-1:0] word = addr_in / WORD_BITS;
+    wire [BIT_WIDTH-1:0] word_bit = addr_in % WORD_BITS;
+
+    // ALLOCATION, one request per block in block order
+    logic last_allocate;
+    logic [RANK_WIDTH-1:0] next_slot;
+    logic [$clog2(WORDS)-1:0] alloc_word;
+    logic [RANK_WIDTH-1:0] alloc_rank;  // slots taken before alloc_word
+    logic [WORD_BITS-1:0] alloc_bits;
+    logic alloc_write;
+    logic alloc_open;  // alloc_* hold a word of this allocation
+
+    wire allocating = allocate_in && request_valid_in && (request_type_in != READ);
+    wire occupy = allocating && (request_type_in == WRITE_OVER) && (next_slot != SLOTS);
+    wire new_word = !alloc_open || (word != alloc_word);
+
+    always_ff @(posedge clk_in) begin
+        last_allocate <= allocate_in;
+        alloc_write <= 0;
+        if (rst_in) begin
+            next_slot <= 0;
+            slots_used_out <= 0;
+            alloc_open <= 0;
+        end else begin
+            if (allocate_in && !last_allocate) begin
+                next_slot <= 0;
+                alloc_open <= 0;
+            end else if (occupy) begin
+                next_slot <= next_slot + 1;
+            end
+            if (!allocate_in && last_allocate) begin
+                slots_used_out <= next_slot;
+            end
+            if (allocating) begin
+                // the entry is rewritten with every block, the last write of a word has all of it
+                alloc_write <= 1;
+                alloc_open <= 1;
+                alloc_word <= word;
+                alloc_rank <= new_word ? next_slot : alloc_rank;
+                alloc_bits <= (new_word ? '0 : alloc_bits) | (WORD_BITS'(occupy) << word_bit);
+            end
+        end
+    end
+
+    // LOOKUP, stage 0 reads the bitmap, stage 2 turns it into a slot
+    logic [RANK_WIDTH+WORD_BITS-1:0] entry;
+    logic [BIT_WIDTH-1:0] bit_pipe[2];
+    logic [SUMMAND_WIDTH-1:0] summand_pipe[3];
+    accum_request_t type_pipe[3];
+    logic valid_pipe[3];
+    logic alloc_pipe[2];  // allocated: slot_pipe holds the new slot
+    logic [RANK_WIDTH-1:0] slot_pipe[2];
+
+    wire [WORD_BITS-1:0] entry_bits = entry[WORD_BITS-1:0];
+    wire [RANK_WIDTH-1:0] entry_rank = entry[RANK_WIDTH+WORD_BITS-1-:RANK_WIDTH];
+    wire entry_occupied = alloc_pipe[1] || entry_bits[bit_pipe[1]];
+    wire [RANK_WIDTH-1:0] entry_slot = alloc_pipe[1] ? slot_pipe[1] :
+        entry_rank + popcount(entry_bits & ((WORD_BITS'(1) << bit_pipe[1]) - 1));
+
+    logic [RANK_WIDTH-1:0] slot;
+    logic occupied;
+    logic [1:0] occupied_pipe;
+
+    always_ff @(posedge clk_in) begin
+        bit_pipe[0] <= word_bit;
+        bit_pipe[1] <= bit_pipe[0];
+        summand_pipe[0] <= summand_in;
+        type_pipe[0] <= request_type_in;
+        // an allocated block that did not get a slot is not written
+        valid_pipe[0] <= request_valid_in && (!allocating || occupy);
+        alloc_pipe[0] <= occupy;
+        slot_pipe[0] <= next_slot;
+        for (int i = 1; i < 3; i++) begin
+            summand_pipe[i] <= summand_pipe[i-1];
+            type_pipe[i] <= type_pipe[i-1];
+            valid_pipe[i] <= valid_pipe[i-1];
+        end
+        alloc_pipe[1] <= alloc_pipe[0];
+        slot_pipe[1] <= slot_pipe[0];
+
+        slot <= entry_slot;
+        occupied <= entry_occupied;
+        occupied_pipe <= {occupied_pipe[0], occupied};
+        if (rst_in) begin
+            for (int i = 0; i < 3; i++) begin
+                valid_pipe[i] <= 0;
+            end
+        end
+    end
+
+    xilinx_true_dual_port_read_first_1_clock_ram #(
+        .RAM_WIDTH(RANK_WIDTH + WORD_BITS),
+        .RAM_DEPTH(WORDS),
+        .RAM_PERFORMANCE("HIGH_PERFORMANCE")  // 2 cycle reading
+    ) bitmap (
+        .clka(clk_in),
+        .addra(word),
+        .douta(entry),
+        .dina('0),
+        .wea(1'b0),
+        .addrb(alloc_word),
+        .dinb({alloc_rank, alloc_bits}),
+        .web(alloc_write),
+        .doutb(),
+        .ena(1'b1),
+        .enb(1'b1),
+        .rsta(rst_in),
+        .rstb(rst_in),
+        .regcea(1'b1),
+        .regceb(1'b0)
+    );
+
+    logic [WIDTH-1:0] slot_out;
+    shift_accum_ram #(
+        .WIDTH(WIDTH),
+        .DEPTH(SLOTS),
+        .SUMMAND_WIDTH(SUMMAND_WIDTH)
+    ) slots (
+        .clk_in(clk_in),
+        .rst_in(rst_in),
+        .addr_in(slot[$clog2(SLOTS)-1:0]),
+        .summand_in(summand_pipe[2]),
+        .request_type_in(type_pipe[2]),
+        .request_valid_in(valid_pipe[2] && occupied),
+        .read_out(slot_out),
+        .summand_out(),
+        .sum_out(),
+        .addr_out(),
+        .request_type_out(),
+        .result_valid_out()
+    );
+    assign read_out = occupied_pipe[1] ? slot_out : DISABLED_VAL;
+
+endmodule
+`default_nettype wire
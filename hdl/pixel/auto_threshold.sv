@@ -0,0 +1,142 @@
+`timescale 1ns / 1ps  // (comment to prevent autoformatting)
+`include "mem/xilinx_true_dual_port_read_first_1_clock_ram.v"
+`default_nettype none
+
+// Picks the lower bound of a threshold from the frame itself instead of a fixed value.
+// Counts the valid pixels of every frame into a 256 bin histogram in BRAM and scans it in the vertical
+// blank after new_frame_in (reading and clearing a bin per cycle, 258 cycles). level_out is the
+// percentile_in / 256 quantile of the frame: the lowest value with more than that share of the pixels at
+// or below it. The background covers most of the frame, so a quantile below the LEDs' share follows the
+// room's lighting and the camera's exposure, and threshold_out = level_out + margin_in (saturating) keeps
+// the background out of the mask.
+// pixel_in is registered like threshold does, valid_in and new_frame_in line up with its mask_out.
+// Counting starts at the first new_frame_in after reset, threshold_out stays INIT_THRESHOLD until a whole
+// frame was counted and keeps its value over frames without valid pixels.
+module auto_threshold #(
+    parameter int NUM_PIXELS = 1280 * 720,  // valid pixels per frame
+    parameter logic [7:0] INIT_THRESHOLD = 8'h80,
+    localparam int COUNT_WIDTH = $clog2(NUM_PIXELS + 1)
+) (
+    input wire clk_in,
+    input wire rst_in,
+    input wire [7:0] pixel_in,
+    input wire valid_in,
+    input wire new_frame_in,  // after the frame's last valid pixel
+    input wire [7:0] percentile_in,
+    input wire [7:0] margin_in,
+    output logic [7:0] level_out,
+    output logic [7:0] threshold_out
+);
+
+    logic [7:0] pixel;
+    always_ff @(posedge clk_in) begin
+        pixel <= pixel_in;
+    end
+
+    enum logic {
+        ACCUMULATE,
+        SCAN
+    } state;
+    logic armed;  // seen a frame boundary since reset, counting whole frames
+    logic whole;  // the frame being scanned was counted whole
+
+    // A run of pixels with the same value is counted in a register and added to its bin when it ends.
+    // Port A reads the bin at every pixel, so on the cycle after the run it holds the run's bin, with
+    // the write of any earlier run in it: back to back pixels never read a bin before its last write.
+    logic run_open;
+    logic [7:0] run_bin;
+    logic [COUNT_WIDTH-1:0] run_count;
+    logic [COUNT_WIDTH-1:0] pixel_count;
+    wire counting = armed && valid_in && !new_frame_in && (state == ACCUMULATE);
+    wire run_continues = counting && run_open && (pixel == run_bin);
+    wire flush = run_open && !run_continues;
+
+    logic [8:0] scan_addr;  // the bin read and cleared in SCAN, 256 once all are read
+    logic scan_valid;  // bin_count is scan_bin's
+    logic [7:0] scan_bin;
+    logic [COUNT_WIDTH-1:0] bin_count;
+    logic [COUNT_WIDTH-1:0] below;  // pixels in the bins scanned so far
+    logic [COUNT_WIDTH-1:0] target;
+    logic found;
+    logic [7:0] level;
+
+    xilinx_true_dual_port_read_first_1_clock_ram #(
+        .RAM_WIDTH(COUNT_WIDTH),
+        .RAM_DEPTH(256),
+        .RAM_PERFORMANCE("LOW_LATENCY")  // 1 cycle reading
+    ) histogram (
+        .clka(clk_in),
+        .addra((state == SCAN) ? scan_addr[7:0] : pixel),
+        .douta(bin_count),
+        .dina('0),
+        .wea((state == SCAN) && !scan_addr[8]),  // read first, so a scanned bin comes out and starts over at 0
+        .addrb(run_bin),
+        .dinb(bin_count + run_count),
+        .web(flush),
+        .doutb(),
+        .ena(1'b1),
+        .enb(1'b1),
+        .rsta(rst_in),
+        .rstb(rst_in),
+        .regcea(1'b1),
+        .regceb(1'b0)
+    );
+
+    always_ff @(posedge clk_in) begin
+        if (rst_in) begin
+            state <= ACCUMULATE;
+            armed <= 0;
+            whole <= 0;
+            run_open <= 0;
+            run_count <= 0;
+            pixel_count <= 0;
+            scan_valid <= 0;
+            level_out <= 0;
+            threshold_out <= INIT_THRESHOLD;
+        end else begin
+            if (counting) begin
+                run_open <= 1;
+                run_bin <= pixel;
+                run_count <= run_continues ? run_count + 1 : 1;
+                pixel_count <= pixel_count + 1;
+            end else begin
+                run_open <= 0;
+            end
+
+            case (state)
+                ACCUMULATE: begin
+                    if (new_frame_in) begin
+                        state <= SCAN;
+                        armed <= 1;
+                        whole <= armed;
+                        target <= COUNT_WIDTH'(({8'b0, pixel_count} * percentile_in) >> 8);
+                        pixel_count <= 0;
+                        scan_addr <= 0;
+                        below <= 0;
+                        found <= 0;
+                    end
+                end
+                SCAN: begin
+                    scan_addr <= scan_addr + !scan_addr[8];
+                    scan_valid <= !scan_addr[8];
+                    scan_bin <= scan_addr[7:0];
+                    if (scan_valid) begin
+                        below <= below + bin_count;
+                        if (!found && (below + bin_count > target)) begin
+                            found <= 1;
+                            level <= scan_bin;
+                        end
+                    end else if (scan_addr[8]) begin
+                        state <= ACCUMULATE;
+                        if (whole && found) begin
+                            level_out <= level;
+                            threshold_out <= (level > 8'hFF - margin_in) ? 8'hFF : level + margin_in;
+                        end
+                    end
+                end
+            endcase
+        end
+    end
+endmodule
+
+`default_nettype wire
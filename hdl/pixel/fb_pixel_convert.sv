@@ -0,0 +1,48 @@
+`timescale 1ns / 1ps  // (comment to prevent autoformatting)
+`include "pixel/rgb_to_ycrcb.sv"
+`default_nettype none
+
+// Converts an RGB565 frame buffer pixel to 8 bit RGB and YCrCb.
+// RGB comes out 1 cycle after pixel_in, YCrCb 4 cycles after (rgb_to_ycrcb has a 3 cycle latency).
+// Pixels with valid_in low read as black.
+module fb_pixel_convert (
+    input wire clk_in,
+    input wire [15:0] pixel_in,  // 5:6:5
+    input wire valid_in,
+    output logic [7:0] red_out,
+    green_out,
+    blue_out,
+    output logic [7:0] y_out,
+    cr_out,
+    cb_out
+);
+
+    //remapped frame_buffer outputs with 8 bits for r, g, b
+    always_ff @(posedge clk_in) begin
+        red_out   <= valid_in ? {pixel_in[15:11], 3'b0} : 8'b0;
+        green_out <= valid_in ? {pixel_in[10:5], 2'b0} : 8'b0;
+        blue_out  <= valid_in ? {pixel_in[4:0], 3'b0} : 8'b0;
+    end
+
+    //output of rgb to ycrcb conversion (10 bits due to module):
+    logic [9:0] y_full, cr_full, cb_full;
+    //See lecture 07 for YCrCb discussion.
+    rgb_to_ycrcb rgbtoycrcb_m (
+        .clk_in(clk_in),
+        .r_in  (red_out),
+        .g_in  (green_out),
+        .b_in  (blue_out),
+        .y_out (y_full),
+        .cr_out(cr_full),
+        .cb_out(cb_full)
+    );
+
+    //take lower 8 of full outputs.
+    // treat cr and cb as signed numbers, invert the MSB to get an unsigned equivalent ( [-128,128) maps to [0,256) )
+    assign y_out  = y_full[7:0];
+    assign cr_out = {!cr_full[7], cr_full[6:0]};
+    assign cb_out = {!cb_full[7], cb_full[6:0]};
+
+endmodule
+
+`default_nettype wire
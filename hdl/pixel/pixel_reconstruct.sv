@@ -14,7 +14,8 @@ module pixel_reconstruct #(
     output logic                    pixel_valid_out,
     output logic [HCOUNT_WIDTH-1:0] pixel_hcount_out,
     output logic [VCOUNT_WIDTH-1:0] pixel_vcount_out,
-    output logic [            15:0] pixel_data_out
+    output logic [            15:0] pixel_data_out,
+    output logic                    frame_done_out   // single cycle pulse, vsync dropped after a frame
 );
 
     // your code here! and here's a handful of logics that you may find helpful to utilize.
@@ -31,6 +32,7 @@ module pixel_reconstruct #(
     // should NOT update on every cycle of clk_in, only
     // when samples are valid.
     logic       last_sampled_hs;
+    logic       last_sampled_vs;
     logic [7:0] last_sampled_data;
 
     // flag indicating whether the last byte has been transmitted or not.
@@ -44,7 +46,9 @@ module pixel_reconstruct #(
             pixel_data_out <= 0;
             half_pixel_ready <= 0;
             last_sampled_hs <= 0;
+            last_sampled_vs <= 0;
             last_sampled_data <= 0;
+            frame_done_out <= 0;
             pclk_prev <= 0;
         end else begin
             if (camera_sample_valid) begin
@@ -73,7 +77,12 @@ module pixel_reconstruct #(
                 end
 
                 last_sampled_hs <= camera_hs_in && camera_vs_in;
-            end else pixel_valid_out <= 0;
+                last_sampled_vs <= camera_vs_in;
+                frame_done_out  <= last_sampled_vs && !camera_vs_in;
+            end else begin
+                pixel_valid_out <= 0;
+                frame_done_out  <= 0;
+            end
         end
 
         pclk_prev <= camera_pclk_in;
@@ -0,0 +1,92 @@
+`timescale 1ns / 1ps  // (comment to prevent autoformatting)
+`default_nettype none
+
+`ifndef SYMBOL_CLASSIFIER_DEFINES
+`define SYMBOL_CLASSIFIER_DEFINES
+// id_shower's {red, green, blue} for every symbol when it shows BITS_PER_STEP address bits per frame.
+// Each color lands in the middle of its symbol's Cr/Cb sector (see symbol_classifier), 48 or more away from
+// every sector edge after the camera's 5:6:5 and rgb_to_ycrcb. One bit per frame keeps red/blue.
+function automatic logic [23:0] symbol_color(input int bits_per_step, input logic [2:0] symbol);
+    case (bits_per_step)
+        1: return symbol[0] ? 24'h00_00_8F : 24'hFF_00_00;
+        2:
+        case (symbol[1:0])
+            2'd0: return 24'h20_FF_00;  // green:   Cr < 0, Cb < 0
+            2'd1: return 24'h00_8C_FF;  // azure:   Cr < 0, Cb > 0
+            2'd2: return 24'hFF_70_00;  // orange:  Cr > 0, Cb < 0
+            default: return 24'hE0_00_FF;  // magenta: Cr > 0, Cb > 0
+        endcase
+        default:
+        case (symbol)
+            3'd0: return 24'h70_FF_00;
+            3'd1: return 24'h00_FF_40;
+            3'd2: return 24'h00_48_FF;
+            3'd3: return 24'h00_D0_FF;
+            3'd4: return 24'hF0_A8_00;
+            3'd5: return 24'hFF_20_00;
+            3'd6: return 24'h8C_00_F0;
+            default: return 24'hFF_00_C0;
+        endcase
+    endcase
+endfunction
+`endif
+
+// Decodes which of 2**BITS_PER_STEP id_shower colors a pixel shows from its Cr/Cb (MSB inverted, as
+// fb_pixel_convert outputs them). The symbol is the pixel's sector of the Cr/Cb plane around gray:
+//   1 bit:  Cb > Cr
+//   2 bits: {Cr > 0, Cb > 0}, the quadrant
+//   3 bits: {Cr > 0, Cb > 0, |Cr| > |Cb|}, the octant
+// A pixel closer than margin_in to a sector edge is ambiguous (gray background included) and
+// valid_out stays low, calibration_step_fsm disables those blocks. Registered, 1 cycle latency like threshold.
+module symbol_classifier #(
+    parameter int BITS_PER_STEP = 2
+) (
+    input wire clk_in,
+    input wire rst_in,
+    input wire [7:0] cr_in,
+    input wire [7:0] cb_in,
+    input wire [7:0] margin_in,
+    output logic [BITS_PER_STEP-1:0] symbol_out,
+    output logic valid_out
+);
+
+    // undo the inverted MSB to get the signed chroma back
+    wire signed [8:0] cr = $signed({!cr_in[7], !cr_in[7], cr_in[6:0]});
+    wire signed [8:0] cb = $signed({!cb_in[7], !cb_in[7], cb_in[6:0]});
+    wire [8:0] cr_abs = cr[8] ? -cr : cr;
+    wire [8:0] cb_abs = cb[8] ? -cb : cb;
+    wire [8:0] abs_diff = (cr_abs > cb_abs) ? cr_abs - cb_abs : cb_abs - cr_abs;
+    wire signed [9:0] diff = cb - cr;
+    wire [9:0] diff_abs = diff[9] ? -diff : diff;
+
+    logic [2:0] symbol;
+    logic valid;
+    always_comb begin
+        case (BITS_PER_STEP)
+            1: begin
+                symbol = {2'b0, cb > cr};
+                valid  = diff_abs > margin_in;
+            end
+            2: begin
+                symbol = {1'b0, cr > 0, cb > 0};
+                valid  = (cr_abs > margin_in) && (cb_abs > margin_in);
+            end
+            default: begin
+                symbol = {cr > 0, cb > 0, cr_abs > cb_abs};
+                valid  = (cr_abs > margin_in) && (cb_abs > margin_in) && (abs_diff > margin_in);
+            end
+        endcase
+    end
+
+    always_ff @(posedge clk_in) begin
+        if (rst_in) begin
+            symbol_out <= 0;
+            valid_out  <= 0;
+        end else begin
+            symbol_out <= symbol[BITS_PER_STEP-1:0];
+            valid_out  <= valid;
+        end
+    end
+endmodule
+
+`default_nettype wire
@@ -1,5 +1,6 @@
 `timescale 1ns / 1ps  // (comment to prevent autoformatting)
-`include "driver/led_driver.sv"
+`include "driver/multi_strand_driver.sv"
+`include "driver/led_color_prefetch.sv"
 `include "pattern/pat_gradient.sv"
 `include "calibration/id_shower.sv"
 `include "clk/cw_hdmi_clk_wiz.v"
@@ -7,7 +8,10 @@
 `include "cam/camera_reader.sv"
 `include "pixel/channel_select.sv"
 `include "pixel/threshold.sv"
+`include "pixel/auto_threshold.sv"
+`include "pixel/symbol_classifier.sv"
 `include "driver/lab05_ssc.sv"
+`include "common/perf_counters.sv"
 `include "pixel/center_of_mass.sv"
 `include "hdmi/video_sig_gen.sv"
 `include "pixel/video_mux.sv"
@@ -19,6 +23,7 @@
 `include "calibration/calibration_step_fsm.sv"
 `include "aduli_fsm.sv"
 `include "calibration/led_color_buffer.sv"
+`include "calibration/led_pixel_map.sv"
 `include "pattern/led_out_mux.sv"
 `include "pattern/moving_pix.sv"
 `default_nettype none
@@ -26,6 +31,39 @@
 module top_level #(
     parameter int NUM_LEDS = 250,
     parameter int COLOR_WIDTH = 8,
+    // boot with a saved calibration map instead of an empty one, e.g. "../../data/calibration.mem"
+    // written by sim/model/calibration_map.py; build.tcl read_mems everything in data/
+    parameter CALIBRATION_INIT_FILE = "",
+    // address bits shown per calibration step: 1 is red/blue, 2 or 3 use symbol_classifier's colors
+    // and cut the number of steps to ceil(log2(NUM_LEDS) / BITS_PER_STEP)
+    parameter int BITS_PER_STEP = 1,
+    // end each calibration step's camera wait once the detect masks stop changing frame to frame,
+    // 0 always waits the full 5M cycles
+    parameter int ADAPTIVE_SETTLE = 1,
+    // the LEDs are split in NUM_STRANDS contiguous runs, one per strand_out pin, all driven at once:
+    // LED i is on strand_out[i / ceil(NUM_LEDS / NUM_STRANDS)]
+    parameter int NUM_STRANDS = 4,
+    // once calibrated, fetch every LED's color from the frame buffer at the centroid of its pixels
+    // (led_pixel_map) instead of waiting for the raster to stream the calibration table past it.
+    // It needs a second copy of the frame buffer (about 28 RAMB36) next to the calibration table, more than
+    // the xc7s50's 75 RAMB36 hold with the rest of the design, so it is only for larger parts
+    parameter int DIRECT_COLOR_FETCH = 0,
+    // calibration table: one LED ID per (1 << CALIBRATION_DOWNSAMPLE_SHIFT) square block of pixels,
+    // stored for every block, or with CALIBRATION_TABLE_SLOTS only for that many blocks that saw an LED
+    parameter int CALIBRATION_DOWNSAMPLE_SHIFT = 2,
+    parameter int CALIBRATION_TABLE_SLOTS = 0,
+    // frames every calibration step takes the strict majority of per block, more ride out noise and exposure
+    // hiccups, a clean step stops after CALIBRATION_VOTE_FRAMES / 2 + 2
+    parameter int CALIBRATION_VOTE_FRAMES = 1,
+    // pixels of a calibration block that have to show the same bit (block_vote); 0 takes the top left pixel
+    // alone. The camera frame is scaled up 4x, so a block only spans more than one camera pixel with
+    // CALIBRATION_DOWNSAMPLE_SHIFT above 2: then more than half of them by default, otherwise 0 (the vote
+    // would only count copies of the same camera pixel)
+    parameter int CALIBRATION_BLOCK_AGREE =
+        (CALIBRATION_DOWNSAMPLE_SHIFT > 2) ? (1 << (2 * CALIBRATION_DOWNSAMPLE_SHIFT)) / 2 + 1 : 0,
+    // lower bounds of the Cr / Cb thresholds from every frame's histogram (auto_threshold),
+    // 0 keeps them at a fixed 8'h80
+    parameter int AUTO_THRESHOLD = 1,
     localparam int CounterWidth = $clog2(NUM_LEDS)
 ) (
     input  wire         clk_100mhz,
@@ -85,7 +123,8 @@ module top_level #(
     //instantiate id shower module
     id_shower #(
         .NUM_LEDS(NUM_LEDS),
-        .LED_ADDRESS_WIDTH(CounterWidth)
+        .LED_ADDRESS_WIDTH(CounterWidth),
+        .BITS_PER_STEP(BITS_PER_STEP)
     ) id_shower_inst (
         .clk(clk_100_passthrough),
         .rst(sys_rst_led),
@@ -119,6 +158,16 @@ module top_level #(
         .data_src_in(calibration_step_fsm_m.state == IDLE)
         // .data_dst_out()
     );
+    // changes with the state going back to IDLE, so it is there with calibration_step_idle_cc
+    clock_cross #(
+        .DEPTH_DST(6)
+    ) verify_failed_cc (
+        .rst_in(sys_rst_pixel),
+        .clk_src_in(clk_pixel),
+        .clk_dst_in(clk_100_passthrough),
+        .data_src_in(calibration_step_fsm_m.mismatches != 0)
+        // .data_dst_out()
+    );
     clock_cross #(
         .DEPTH_DST(6)
     ) we_going_cc (
@@ -141,12 +190,13 @@ module top_level #(
 
     clock_cross #(
         .DEPTH_DST(6),
-        .WIDTH(2)
+        .WIDTH(4)
     ) calibration_start_first_cc (
         .rst_in(sys_rst_pixel),
         .clk_src_in(clk_100_passthrough),
         .clk_dst_in(clk_pixel),
-        .data_src_in({aduli_fsm_inst.calibration_start_out, aduli_fsm_inst.calibration_first_out})
+        .data_src_in({aduli_fsm_inst.calibration_start_out, aduli_fsm_inst.calibration_first_out,
+                      aduli_fsm_inst.verify_out, aduli_fsm_inst.repair_out})
     );
 
     logic [3:0] trans_count;
@@ -178,36 +228,52 @@ module top_level #(
     calibration_step_fsm #(
         .NUM_LEDS(NUM_LEDS),
         .LED_ADDRESS_WIDTH(CounterWidth),
+        .BITS_PER_STEP(BITS_PER_STEP),
         .WAIT_CYCLES(5_000_000),
+        .ADAPTIVE_SETTLE(ADAPTIVE_SETTLE),
         .ACTIVE_H_PIXELS(1280),
-        .ACTIVE_LINES(720)
+        .ACTIVE_LINES(720),
+        .CALIBRATION_INIT_FILE(CALIBRATION_INIT_FILE),
+        .DOWNSAMPLE_SHIFT(CALIBRATION_DOWNSAMPLE_SHIFT),
+        .TABLE_SLOTS(CALIBRATION_TABLE_SLOTS),
+        .VOTE_FRAMES(CALIBRATION_VOTE_FRAMES),
+        .BLOCK_AGREE(CALIBRATION_BLOCK_AGREE),
+        .REPAIR(1)  // btn1 with sw[13] up
     ) calibration_step_fsm_m (
         .clk_pixel(clk_pixel),
         .rst(sys_rst_pixel),
-        .start_calibration_step(calibration_start_first_cc.data_dst_out[1]),
-        .should_overwrite_latch(calibration_start_first_cc.data_dst_out[0]),
+        .start_calibration_step(calibration_start_first_cc.data_dst_out[3]),
+        .should_overwrite_latch(calibration_start_first_cc.data_dst_out[2]),
+        .verify_in(calibration_start_first_cc.data_dst_out[1]),
+        .repair_in(calibration_start_first_cc.data_dst_out[0]),
         .read_request(active_draw_hdmi_ps3),
         .hcount_in(hcount_hdmi_ps3),  // synchronized to detect / threshold outputs
         .vcount_in(vcount_hdmi_ps3),  // synchronized to detect / threshold outputs
         .new_frame_in(nf_hdmi_ps3),
         .detect_0(detect0),
         .detect_1(detect1),
+        .symbol_in(symbol),
+        .symbol_valid_in(symbol_valid),
         // .state(),
         .read_out(pixel_led_id)
     );
 
     aduli_fsm #(
         .NUM_LEDS(NUM_LEDS),
-        .LED_ADDRESS_WIDTH(CounterWidth)
+        .LED_ADDRESS_WIDTH(CounterWidth),
+        .BITS_PER_STEP(BITS_PER_STEP)
     ) aduli_fsm_inst (
         .clk_in(clk_100_passthrough),
         .rst_in(sys_rst_pixel),
-        .start_in(clean_btn1),
+        // with sw[13] up btn1 checks the map and repairs it instead of calibrating from scratch
+        .start_in(clean_btn1 && !sw[13]),
+        .recalibrate_in(clean_btn1 && sw[13]),
         // .proceed_in(clean_btn2),
         .led_display_valid_in(id_shower_inst.displayed_frame_valid),
         // .calibration_state_in(debounce_metastable_fsm_state.clean_out),
         .calibration_step_going_in(we_going_cc.data_dst_out),
         .calibration_step_ready_in(calibration_step_idle_cc.data_dst_out),
+        .verify_failed_in(verify_failed_cc.data_dst_out),
         .led_addr_bit_sel_out(address_bit_num),
         // .led_addr_bit_sel_start_out(),
         // .calibration_start_out(),
@@ -235,17 +301,22 @@ module top_level #(
         end
     end
 
+    // the camera fills one bank while the strands show the other, swapped every frame,
+    // every LED gets the average color of all its pixels
     led_color_buffer #(
         .NUM_LEDS(NUM_LEDS),
-        .LED_ADDRESS_WIDTH(CounterWidth)
+        .LED_ADDRESS_WIDTH(CounterWidth),
+        .DOUBLE_BUFFER(1),
+        .ACCUMULATE(1)
     ) led_color_buffer_instance (
         .rst(sys_rst_pixel),
         .wipe(calibration_step_fsm_m.state == IDLE),
         // calibration_step_fsm table output 
         .clk_pixel(clk_pixel),
         .led_lookup_address(pixel_led_id),
-        .camera_color({fb_red_ps2, fb_green_ps2, fb_blue_ps2}),
-        .led_color_buffer_update_enable(1'b1),
+        .camera_color(table_camera_color),
+        .led_color_buffer_update_enable(table_active_draw),  // lines up with pixel_led_id
+        .new_frame_in(nf_hdmi_ps3),
         // led driver output
         .clk_led(clk_100_passthrough),
         .next_led_request_address(next_led_request),
@@ -255,6 +326,34 @@ module top_level #(
         .color_valid(led_cbuffer_color_valid)
     );
 
+    // after calibration every LED reads its own frame buffer pixel, the calibration table is only
+    // streamed for the one frame that builds the map (and by led_color_buffer until it is built)
+    logic [COLOR_WIDTH-1:0] led_map_next_red, led_map_next_green, led_map_next_blue;
+    logic led_map_color_valid, led_map_ready;
+    led_pixel_map #(
+        .NUM_LEDS(NUM_LEDS),
+        .LED_ADDRESS_WIDTH(CounterWidth)
+    ) led_pixel_map_inst (
+        .rst(sys_rst_pixel),
+        .clk_pixel(clk_pixel),
+        .build_in(aduli_fsm_cc.data_dst_out == DISPLAY),
+        .led_id_in(pixel_led_id),
+        .hcount_in(table_hcount),
+        .vcount_in(table_vcount),
+        .valid_in(table_active_draw),  // lines up with pixel_led_id
+        .new_frame_in(nf_hdmi_ps3),
+        .clk_led(clk_100_passthrough),
+        .ready_out(led_map_ready),
+        .next_led_request_address(next_led_request),
+        .fb_addr_out(led_fb_addr),
+        .fb_pixel_in(led_fb_pixel),
+        .green_out(led_map_next_green),
+        .red_out(led_map_next_red),
+        .blue_out(led_map_next_blue),
+        .color_valid(led_map_color_valid)
+    );
+    wire use_led_map = DIRECT_COLOR_FETCH && led_map_ready;
+
     logic [COLOR_WIDTH-1:0] next_red, next_green, next_blue;
     logic color_valid;
 
@@ -285,10 +384,10 @@ module top_level #(
         .id_shower_blue_out(id_shower_next_blue),
         .id_shower_color_valid(id_shower_color_valid),
         // led_color_buffer inputs
-        .led_color_buffer_green_out(led_cbuffer_next_green),
-        .led_color_buffer_red_out(led_cbuffer_next_red),
-        .led_color_buffer_blue_out(led_cbuffer_next_blue),
-        .led_color_buffer_color_valid(led_cbuffer_color_valid),
+        .led_color_buffer_green_out(use_led_map ? led_map_next_green : led_cbuffer_next_green),
+        .led_color_buffer_red_out(use_led_map ? led_map_next_red : led_cbuffer_next_red),
+        .led_color_buffer_blue_out(use_led_map ? led_map_next_blue : led_cbuffer_next_blue),
+        .led_color_buffer_color_valid(use_led_map ? led_map_color_valid : led_cbuffer_color_valid),
         // .led_color_buffer_green_out(8'h8F),
         // .led_color_buffer_red_out(8'h8F),
         // .led_color_buffer_blue_out(8'h8F),
@@ -320,22 +419,46 @@ module top_level #(
     // );
 
 
-    // instantiate led_driver module
-    led_driver #(
+    // fetch colors ahead of the led driver, every strand_out pin drives its own run of LEDs
+    logic [NUM_STRANDS*3*COLOR_WIDTH-1:0] strand_words;
+    logic strand_words_valid, strand_words_ready, strand_flush;
+    led_color_prefetch #(
         .NUM_LEDS(NUM_LEDS),
+        .NUM_STRANDS(NUM_STRANDS),
         .COLOR_WIDTH(COLOR_WIDTH)
-    ) led_driver_inst (
+    ) led_color_prefetch_inst (
         .rst_in(sys_rst_led),
         .clk_in(clk_100_passthrough),
-        .force_reset(btn[0]),
+        .flush_in(strand_flush),
+        .next_led_request(next_led_request),
         .green_in(next_green),
         .red_in(next_red),
         .blue_in(next_blue),
         .color_valid(color_valid),
-        .strand_out(strand_out[0]),
-        .next_led_request(next_led_request)
+        .words_out(strand_words),
+        .words_valid_out(strand_words_valid),
+        .words_ready_in(strand_words_ready)
     );
 
+    multi_strand_driver #(
+        .NUM_LEDS(NUM_LEDS),
+        .NUM_STRANDS(NUM_STRANDS),
+        .COLOR_WIDTH(COLOR_WIDTH)
+    ) led_driver_inst (
+        .rst_in(sys_rst_led),
+        .clk_in(clk_100_passthrough),
+        .force_reset(btn[0]),
+        .words_in(strand_words),
+        .words_valid_in(strand_words_valid),
+        .words_ready_out(strand_words_ready),
+        .flush_out(strand_flush),
+        .strand_out(strand_out[NUM_STRANDS-1:0])
+        // .underrun_count()
+    );
+    if (NUM_STRANDS < 4) begin : g_unused_strands
+        assign strand_out[3:NUM_STRANDS] = 0;
+    end
+
 
     // shut up those RGBs
     assign rgb0 = aduli_fsm_inst.calibration_started;
@@ -398,6 +521,8 @@ module top_level #(
     localparam FB_SIZE = $clog2(FB_DEPTH);
     logic [FB_SIZE-1:0] addrb;  //used to lookup address in memory for reading from buffer
     logic good_addrb;  //used to indicate within valid frame for scaling
+    logic [FB_SIZE-1:0] led_fb_addr;  //led_pixel_map's lookup in the second frame buffer
+    logic [15:0] led_fb_pixel;
 
     //TO DO in camera part 1:
     // Scale pixel coordinates from HDMI to the frame buffer to grab the right pixel
@@ -422,10 +547,13 @@ module top_level #(
     //selected_channel could contain any of the six color channels depend on selection
 
     //threshold module (apply masking threshold):
-    logic [7:0] lower_threshold;
+    logic [7:0] red_threshold;  //lower bound of Cr
+    logic [7:0] blue_threshold;  //lower bound of Cb
     logic [7:0] upper_threshold;
     logic detect0;  //Whether or not thresholded pixel is detected as bit 0
     logic detect1;  //Whether or not thresholded pixel is detected as bit 1
+    logic [BITS_PER_STEP-1:0] symbol;  //id_shower symbol the pixel shows when BITS_PER_STEP > 1
+    logic symbol_valid;  //whether the pixel clearly shows one symbol
 
     //Center of Mass variables (tally all mask=1 pixels for a frame and calculate their center of mass)
     logic [10:0] x_com, x_com_calc;  //long term x_com and output from module, resp
@@ -434,7 +562,10 @@ module top_level #(
 
     logic [7:0] fb_red, fb_green, fb_blue;
     logic [7:0] y, cr, cb;  //ycrcb conversion of full pixel
-    camera_reader cam_m (
+    logic camera_frame;  //end of a camera frame, on clk_camera
+    camera_reader #(
+        .LED_PORT(DIRECT_COLOR_FETCH)
+    ) cam_m (
         .clk_camera(clk_camera),
         .clk_pixel(clk_pixel),
         .sys_rst_camera(sys_rst_camera),
@@ -446,6 +577,10 @@ module top_level #(
         .addrb(addrb),
         .good_addrb(good_addrb),
         .pattern_enable(sw[15]),
+        .clk_led(clk_100_passthrough),
+        .led_addr(led_fb_addr),
+        .led_pixel(led_fb_pixel),
+        .camera_frame_out(camera_frame),
         .red(fb_red),
         .green(fb_green),
         .blue(fb_blue),
@@ -476,7 +611,33 @@ module top_level #(
     // );
 
     //threshold values used to determine what value  passes:
-    assign lower_threshold = 8'h80;  // sw[15:13]
+    //the lower bounds follow the room: a little above the 3/4 quantile of each channel's last frame
+    auto_threshold #(
+        .NUM_PIXELS(1280 * 720)
+    ) at_red (
+        .clk_in(clk_pixel),
+        .rst_in(sys_rst_pixel),
+        .pixel_in(cr),
+        .valid_in(active_draw_hdmi_ps3),
+        .new_frame_in(nf_hdmi_ps3),
+        .percentile_in(8'hC0),
+        .margin_in(8'h10)
+        // .level_out()
+    );
+    auto_threshold #(
+        .NUM_PIXELS(1280 * 720)
+    ) at_blue (
+        .clk_in(clk_pixel),
+        .rst_in(sys_rst_pixel),
+        .pixel_in(cb),
+        .valid_in(active_draw_hdmi_ps3),
+        .new_frame_in(nf_hdmi_ps3),
+        .percentile_in(8'hC0),
+        .margin_in(8'h10)
+        // .level_out()
+    );
+    assign red_threshold = AUTO_THRESHOLD ? at_red.threshold_out : 8'h80;
+    assign blue_threshold = AUTO_THRESHOLD ? at_blue.threshold_out : 8'h80;
     assign upper_threshold = 8'hFF;
     wire [7:0] exposure = {sw[7], sw[7], sw[6:2], 1'b0};
     wire [4:0] sel_led = sw[12:8];
@@ -489,7 +650,7 @@ module top_level #(
         .clk_in(clk_pixel),
         .rst_in(sys_rst_pixel),
         .pixel_in(cb),
-        .lower_bound_in(lower_threshold),
+        .lower_bound_in(blue_threshold),
         .upper_bound_in(upper_threshold),
         .mask_out(detect1)  //single bit if pixel within mask.
     );
@@ -497,24 +658,131 @@ module top_level #(
         .clk_in(clk_pixel),
         .rst_in(sys_rst_pixel),
         .pixel_in(cr),
-        .lower_bound_in(lower_threshold),
+        .lower_bound_in(red_threshold),
         .upper_bound_in(upper_threshold),
         .mask_out(detect0)  //single bit if pixel within mask.
     );
 
+    //Symbol classifier: which of id_shower's multi-bit colors the pixel shows,
+    //same latency as the thresholds
+    symbol_classifier #(
+        .BITS_PER_STEP(BITS_PER_STEP)
+    ) msc (
+        .clk_in(clk_pixel),
+        .rst_in(sys_rst_pixel),
+        .cr_in(cr),
+        .cb_in(cb),
+        .margin_in(8'h10),
+        .symbol_out(symbol),
+        .valid_out(symbol_valid)
+    );
+
+
+    // ** Telemetry **
+    // every event flips a toggle in its own clock domain, perf_counters counts them on the LED clock
+    logic camera_frame_toggle, hdmi_frame_toggle, led_refresh_toggle;
+    always_ff @(posedge clk_camera) begin
+        if (sys_rst_camera) begin
+            camera_frame_toggle <= 0;
+        end else if (camera_frame) begin
+            camera_frame_toggle <= !camera_frame_toggle;
+        end
+    end
+    always_ff @(posedge clk_pixel) begin
+        if (sys_rst_pixel) begin
+            hdmi_frame_toggle <= 0;
+        end else if (nf_hdmi) begin
+            hdmi_frame_toggle <= !hdmi_frame_toggle;
+        end
+    end
+    always_ff @(posedge clk_100_passthrough) begin
+        if (sys_rst_led) begin
+            led_refresh_toggle <= 0;
+        end else if (led_driver_inst.refresh_out) begin
+            led_refresh_toggle <= !led_refresh_toggle;
+        end
+    end
+
+    // the last calibration step's figures only change when a step ends
+    logic [31:0] step_cycles_cc, settle_cycles_cc;
+    logic [7:0] settle_frames_cc, capture_frames_cc;
+    logic [15:0] mismatches_cc, slots_used_cc;
+    clock_cross #(
+        .WIDTH(32 + 32 + 8 + 8 + 16 + 16)
+    ) step_telemetry_cc (
+        .rst_in(sys_rst_led),
+        .clk_src_in(clk_pixel),
+        .clk_dst_in(clk_100_passthrough),
+        .data_src_in({
+            calibration_step_fsm_m.step_cycles,
+            32'(calibration_step_fsm_m.settle_cycles),
+            calibration_step_fsm_m.settle_frames,
+            calibration_step_fsm_m.capture_frames,
+            calibration_step_fsm_m.mismatches,
+            calibration_step_fsm_m.slots_used
+        }),
+        .data_dst_out({
+            step_cycles_cc,
+            settle_cycles_cc,
+            settle_frames_cc,
+            capture_frames_cc,
+            mismatches_cc,
+            slots_used_cc
+        })
+    );
+
+    // with automatic exposure (sw[1] down) the exposure switches are free: sw[7] up shows counter
+    // sw[5:2] of perf_counters on the seven segment display instead (perf_counters lists them)
+    wire show_telemetry = !sw[1] && sw[7];
+    logic [31:0] telemetry_value;
+    perf_counters #(
+        .CLOCK_SPEED(100_000_000)
+    ) perf_counters_m (
+        .clk_in(clk_100_passthrough),
+        .rst_in(sys_rst_led),
+        .camera_frame_in(camera_frame_toggle),
+        .hdmi_frame_in(hdmi_frame_toggle),
+        .led_refresh_in(led_refresh_toggle),
+        .led_underrun_in(led_driver_inst.underrun_count[0]),  // flips with every underrun until it saturates
+        .state_in(aduli_fsm_inst.state),
+        .step_cycles_in(step_cycles_cc),
+        .wait_cycles_in(settle_cycles_cc),
+        .wait_frames_in(settle_frames_cc),
+        .capture_frames_in(capture_frames_cc),
+        .mismatches_in(mismatches_cc),
+        .slots_used_in(slots_used_cc),
+        // .camera_rate_out(),
+        // .hdmi_rate_out(),
+        // .led_refresh_rate_out(),
+        // .led_underrun_rate_out(),
+        // .residency_out(),
+        .select_in(sw[5:2]),
+        .value_out(telemetry_value)
+    );
+    clock_cross #(
+        .WIDTH(1 + 32)
+    ) telemetry_cc (
+        .rst_in(sys_rst_pixel),
+        .clk_src_in(clk_100_passthrough),
+        .clk_dst_in(clk_pixel),
+        .data_src_in({show_telemetry, telemetry_value})
+    );
 
     logic [6:0] ss_c;
     //modified version of seven segment display for showing
     // thresholds and selected channel
     // special customized version
+    // (the upper bound is fixed, its digits show the Cb lower bound and the Cr one takes lt_in's)
     lab05_ssc mssc (
         .clk_in(clk_pixel),
         .rst_in(sys_rst_pixel),
-        .lt_in(lower_threshold),
-        .ut_in(upper_threshold),
+        .lt_in(red_threshold),
+        .ut_in(blue_threshold),
         .val3_in(exposure),
         .step_in(address_bit_num),
         .sel_led_in(sel_led[3:0]),
+        .show_value_in(telemetry_cc.data_dst_out[32]),
+        .value_in(telemetry_cc.data_dst_out[31:0]),
         .cat_out(ss_c),
         .an_out({ss0_an, ss1_an})
     );
@@ -681,6 +949,27 @@ module top_level #(
         .data_out({fb_red_ps2, fb_green_ps2, fb_blue_ps2})
     );
 
+    // what lines up with pixel_led_id: the sparse table answers 3 cycles after the full one, the video
+    // path (should_mark_pixel) is not delayed with it
+    logic [10:0] table_hcount;
+    logic [9:0] table_vcount;
+    logic table_active_draw;
+    logic [23:0] table_camera_color;
+    if (CALIBRATION_TABLE_SLOTS) begin : g_sparse_table_delay
+        synchronizer #(
+            .DEPTH(3),
+            .WIDTH(11 + 10 + 1 + 3 * 8)
+        ) sync_table (
+            .clk_in  (clk_pixel),
+            .rst_in  (sys_rst_pixel),
+            .data_in ({hcount_hdmi_ps7, vcount_hdmi_ps7, active_draw_hdmi_ps7, fb_red_ps2, fb_green_ps2, fb_blue_ps2}),
+            .data_out({table_hcount, table_vcount, table_active_draw, table_camera_color})
+        );
+    end else begin : g_table_aligned
+        assign {table_hcount, table_vcount, table_active_draw} = {hcount_hdmi_ps7, vcount_hdmi_ps7, active_draw_hdmi_ps7};
+        assign table_camera_color = {fb_red_ps2, fb_green_ps2, fb_blue_ps2};
+    end
+
     logic detect0_ps4, detect1_ps4;
     synchronizer #(
         .DEPTH(2),
@@ -828,9 +1117,9 @@ module top_level #(
     assign led[10] = calibration_step_fsm_m.should_overwrite;
     assign led[11] = aduli_fsm_inst.calibration_step_ready_in;
     assign led[12] = aduli_fsm_inst.calibration_first_out;
-    assign led[13] = calibration_start_first_cc.data_dst_out[0];
+    assign led[13] = calibration_start_first_cc.data_dst_out[2];
     assign led[14] = aduli_fsm_inst.calibration_start_out;
-    assign led[15] = calibration_start_first_cc.data_dst_out[1];
+    assign led[15] = calibration_start_first_cc.data_dst_out[3];
 endmodule  // top_level
 
 
@@ -0,0 +1,16 @@
+"""Python models and helpers shared by the cocotb testbenches in ``sim/``."""
+
+from .ws2812 import (
+    WS2812DecodeError,
+    WS2812Timing,
+    decode_edges,
+    decode_runs,
+    decode_samples,
+)
+from .strand_monitor import StrandMonitor, StrandRefresh
+from .fixtures import clock_and_reset, reset, start_clock
+from .handles import SignalCache
+from .raster import RasterDriver
+from .stream import ReadyValidDriver
+from .runner import Testbench, parameter
+from .shift_accum import ShiftAccumModel
@@ -0,0 +1,303 @@
+"""End-to-end model of the log(n) calibration, no RTL involved.
+
+Every calibration step ``id_shower`` lights each LED red (``8'hFF``) for a 0
+and blue (``8'h8F``) for a 1 in one bit of its address, MSB first. The camera
+sees the LEDs blurred, exposed and noisy in its 320x180 frame buffer.
+``top_level`` thresholds Cr into detect0 and Cb into detect1, and
+``calibration_step_fsm`` shifts one bit per table entry into
+``shift_accum_ram`` (``WRITE_OVER`` on the first step, ``DISABLE`` where the
+two detections agree). After ``LED_ADDRESS_WIDTH`` steps every table entry
+holds the address of the LED it sees or ``DISABLED_VAL``. With
+``BITS_PER_STEP`` > 1 every step shows a symbol of that many bits in
+``SYMBOL_COLORS`` and ``symbol_classifier`` decodes it, so there are only
+``ceil(LED_ADDRESS_WIDTH / BITS_PER_STEP)`` steps.
+
+:func:`calibrate` runs that on a synthetic :class:`Scene` with the bit-exact
+pixel path of :mod:`model.pixel_path` and the RAM of :mod:`model.shift_accum`
+and scores the table against the LED that really dominates every pixel.
+:func:`sweep` does it for a range of ``NUM_LEDS``; from ``sim/``:
+
+    python -m model.calibration                      # NUM_LEDS from 50 to 4096
+    python -m model.calibration -n 250 1000 --noise 6 --lower 0x90
+    python -m model.calibration --bits-per-step 2
+"""
+
+import argparse
+from dataclasses import dataclass, field
+import time
+
+import numpy as np
+
+from .pixel_path import (
+    LOWER_THRESHOLD,
+    SYMBOL_COLORS,
+    SYMBOL_MARGIN,
+    UPPER_THRESHOLD,
+    classify_symbols,
+    detect_masks,
+    ycrcb_planes,
+)
+from .shift_accum import DISABLE, WRITE, WRITE_OVER, ShiftAccumModel
+
+# camera frame buffer, top_level scales it up 4x (out_shift) for HDMI
+CAMERA_HRES, CAMERA_VRES = 320, 180
+CAMERA_SHIFT = 2
+ACTIVE_H_PIXELS, ACTIVE_LINES = 1280, 720
+# calibration_step_fsm keeps one entry per 4x4 block of the HDMI frame
+DOWNSAMPLE_SHIFT = 2
+# id_shower's colors for a 0 and a 1 bit
+ZERO_COLOR, ONE_COLOR = SYMBOL_COLORS[1]
+NUM_LEDS_SWEEP = (50, 100, 250, 500, 1000, 2000, 4096)
+
+
+def address_width(num_leds: int) -> int:
+    """``$clog2(NUM_LEDS)``, the ``LED_ADDRESS_WIDTH`` top_level uses."""
+    return max(1, (num_leds - 1).bit_length())
+
+
+def random_layout(num_leds: int, rng, margin: float = 4.0, width: int = CAMERA_HRES, height: int = CAMERA_VRES):
+    """``(x, y)`` camera pixel positions spread uniformly over the top left ``width`` x ``height`` of the frame buffer."""
+    x = rng.uniform(margin, width - 1 - margin, num_leds)
+    y = rng.uniform(margin, height - 1 - margin, num_leds)
+    return np.stack([x, y], axis=1)
+
+
+def grid_layout(num_leds: int, margin: float = 4.0):
+    """``(x, y)`` positions on the most square grid that fits ``num_leds``, row by row."""
+    aspect = (CAMERA_HRES - 2 * margin) / (CAMERA_VRES - 2 * margin)
+    cols = max(1, int(np.ceil(np.sqrt(num_leds * aspect))))
+    rows = -(-num_leds // cols)
+    x = np.linspace(margin, CAMERA_HRES - 1 - margin, cols)
+    y = np.linspace(margin, CAMERA_VRES - 1 - margin, rows)
+    grid = np.stack(np.meshgrid(x, y), axis=-1).reshape(-1, 2)
+    return grid[:num_leds]
+
+
+@dataclass
+class Scene:
+    """LEDs as the camera sees them.
+
+    ``positions`` are ``(x, y)`` in camera pixels. Every LED is a Gaussian
+    spot of ``blur`` pixels standard deviation whose center is its color
+    times ``exposure`` times its entry in ``brightness``; ``ambient`` RGB is
+    added everywhere and ``noise`` is the standard deviation of per-channel
+    sensor noise, all in 8 bit units.
+    """
+
+    positions: np.ndarray
+    blur: float = 1.0
+    exposure: float = 1.0
+    noise: float = 2.0
+    ambient: tuple = (0, 0, 0)
+    brightness: np.ndarray = None
+    seed: int = 0
+    rng: np.random.Generator = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.positions = np.asarray(self.positions, dtype=float)
+        if self.brightness is None:
+            self.brightness = np.ones(self.num_leds)
+        self.rng = np.random.default_rng(self.seed)
+
+    @property
+    def num_leds(self) -> int:
+        return len(self.positions)
+
+    def _blur_matrix(self, size: int):
+        if self.blur <= 0:
+            return np.eye(size)
+        offset = np.arange(size)[:, None] - np.arange(size)[None, :]
+        return np.exp(-0.5 * (offset / self.blur) ** 2)
+
+    def render(self, colors):
+        """RGB565 frame buffer with LED ``i`` showing ``colors[i]`` (8 bit RGB)."""
+        colors = np.asarray(colors, dtype=float) * (self.exposure * self.brightness)[:, None]
+        # splat every LED bilinearly onto the pixel grid, then blur rows and columns
+        x, y = self.positions[:, 0], self.positions[:, 1]
+        x0, y0 = np.floor(x).astype(int), np.floor(y).astype(int)
+        fx, fy = x - x0, y - y0
+        impulses = np.zeros((3, CAMERA_VRES, CAMERA_HRES))
+        for dx, dy, weight in ((0, 0, (1 - fx) * (1 - fy)), (1, 0, fx * (1 - fy)), (0, 1, (1 - fx) * fy), (1, 1, fx * fy)):
+            xs, ys = np.clip(x0 + dx, 0, CAMERA_HRES - 1), np.clip(y0 + dy, 0, CAMERA_VRES - 1)
+            for channel in range(3):
+                np.add.at(impulses[channel], (ys, xs), weight * colors[:, channel])
+        rows, cols = self._blur_matrix(CAMERA_VRES), self._blur_matrix(CAMERA_HRES)
+        frame = rows @ impulses @ cols.T
+        frame += np.asarray(self.ambient, dtype=float)[:, None, None]
+        frame += self.rng.normal(0, self.noise, frame.shape)
+        red, green, blue = np.clip(np.rint(frame), 0, 255).astype(np.int64)
+        # the camera outputs 5:6:5, keeping the top bits
+        return ((red >> 3) << 11) | ((green >> 2) << 5) | (blue >> 3)
+
+    def dominant_led(self, x, y, chunk: int = 4096):
+        """Index of the LED that lights camera pixels ``(x, y)`` the most, chunked to bound memory."""
+        x, y = np.ravel(x), np.ravel(y)
+        best = np.empty(x.size, dtype=np.int64)
+        scale = -0.5 / max(self.blur, 1e-6) ** 2
+        log_brightness = np.log(np.maximum(self.brightness, 1e-12))
+        for start in range(0, x.size, chunk):
+            dx = x[start : start + chunk, None] - self.positions[None, :, 0]
+            dy = y[start : start + chunk, None] - self.positions[None, :, 1]
+            best[start : start + chunk] = np.argmax(scale * (dx * dx + dy * dy) + log_brightness, axis=1)
+        return best
+
+
+def table_pixels(downsample_shift: int = DOWNSAMPLE_SHIFT, active_h: int = ACTIVE_H_PIXELS, active_lines: int = ACTIVE_LINES):
+    """Camera pixel ``(x, y)`` that every ``calibration_step_fsm`` table entry samples, row-major."""
+    h = np.arange(active_h >> downsample_shift) << downsample_shift
+    v = np.arange(active_lines >> downsample_shift) << downsample_shift
+    x, y = np.meshgrid(np.minimum(h >> CAMERA_SHIFT, CAMERA_HRES - 1), np.minimum(v >> CAMERA_SHIFT, CAMERA_VRES - 1))
+    return x.ravel(), y.ravel()
+
+
+@dataclass
+class CalibrationResult:
+    """The calibrated table and how it compares to the scene."""
+
+    num_leds: int
+    address_width: int
+    steps: int
+    table: np.ndarray  # every entry's final value, row-major like the RAM
+    truth: np.ndarray  # the LED that dominates every entry's pixel
+    seconds: float
+
+    @property
+    def disabled(self):
+        return self.table == (1 << self.address_width) - 1
+
+    @property
+    def assigned(self):
+        """Entries that hold an LED address, ``led_color_buffer`` writes those."""
+        return ~self.disabled & (self.table < self.num_leds)
+
+    @property
+    def correct(self):
+        return self.assigned & (self.table == self.truth)
+
+    @property
+    def entries_per_led(self):
+        """Correctly identified table entries of every LED."""
+        return np.bincount(self.table[self.correct], minlength=self.num_leds)
+
+    @property
+    def misidentified_per_led(self):
+        """Entries that claim an LED but belong to another one (or to no LED at all)."""
+        return np.bincount(self.table[self.assigned & ~self.correct], minlength=self.num_leds)
+
+    @property
+    def coverage(self) -> float:
+        """Fraction of LEDs with at least one correct entry."""
+        return float(np.mean(self.entries_per_led > 0))
+
+    @property
+    def misid_rate(self) -> float:
+        """Fraction of assigned entries that name the wrong LED."""
+        assigned = int(self.assigned.sum())
+        return float(self.misidentified_per_led.sum() / assigned) if assigned else 0.0
+
+    def summary(self) -> dict:
+        return {
+            "num_leds": self.num_leds,
+            "address_width": self.address_width,
+            "steps": self.steps,
+            "coverage": self.coverage,
+            "misid_rate": self.misid_rate,
+            "assigned": int(self.assigned.sum()),
+            "disabled": int(self.disabled.sum()),
+            # addresses at or above NUM_LEDS, led_color_buffer ignores them
+            "out_of_range": int((~self.disabled & (self.table >= self.num_leds)).sum()),
+            "seconds": self.seconds,
+        }
+
+
+def calibrate(
+    scene: Scene,
+    width: int = None,
+    lower: int = LOWER_THRESHOLD,
+    upper: int = UPPER_THRESHOLD,
+    downsample_shift: int = DOWNSAMPLE_SHIFT,
+    active_h: int = ACTIVE_H_PIXELS,
+    active_lines: int = ACTIVE_LINES,
+    bits_per_step: int = 1,
+    margin: int = SYMBOL_MARGIN,
+) -> CalibrationResult:
+    """Run every calibration step on ``scene`` and score the resulting table.
+
+    ``width`` is the LED_ADDRESS_WIDTH of the table, :func:`address_width` of the scene by default.
+    """
+    started = time.perf_counter()
+    width = width or address_width(scene.num_leds)
+    steps = -(-width // bits_per_step)
+    x, y = table_pixels(downsample_shift, active_h, active_lines)
+    ram = ShiftAccumModel(width, x.size, summand_width=bits_per_step)
+    addresses = np.arange(scene.num_leds)
+    entries = np.arange(x.size)
+    colors = np.array(SYMBOL_COLORS[bits_per_step])
+    for step in range(steps):
+        # the address is zero padded at the top to a whole number of symbols
+        symbol = (addresses >> ((steps - 1 - step) * bits_per_step)) & ((1 << bits_per_step) - 1)
+        pixels = scene.render(colors[symbol])[y, x]
+        if bits_per_step == 1:
+            detect0, detect1 = detect_masks(pixels, lower=lower, upper=upper)
+            summand, valid = detect1.astype(np.int64), detect0 != detect1
+        else:
+            _, cr, cb = ycrcb_planes(pixels)
+            summand, valid = classify_symbols(cr, cb, bits_per_step, margin)
+        request_type = np.where(valid, WRITE_OVER if step == 0 else WRITE, DISABLE)
+        # one request per entry and frame, far enough apart that none of them hazard
+        ram.apply(entries, request_type, summand)
+    truth = scene.dominant_led(x, y)
+    return CalibrationResult(scene.num_leds, width, steps, ram.memory.copy(), truth, time.perf_counter() - started)
+
+
+def sweep(num_leds=NUM_LEDS_SWEEP, layout: str = "random", seed: int = 0, **kwargs):
+    """:func:`calibrate` a fresh scene for every ``num_leds``, ``kwargs`` go to :class:`Scene` or :func:`calibrate`."""
+    calibrate_args = {
+        k: kwargs.pop(k) for k in ("lower", "upper", "downsample_shift", "bits_per_step", "margin") if k in kwargs
+    }
+    results = []
+    for n in num_leds:
+        rng = np.random.default_rng(seed)
+        positions = grid_layout(n) if layout == "grid" else random_layout(n, rng)
+        results.append(calibrate(Scene(positions, seed=seed, **kwargs), **calibrate_args))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-n", "--num-leds", type=int, nargs="+", default=NUM_LEDS_SWEEP)
+    parser.add_argument("--layout", choices=("random", "grid"), default="random")
+    parser.add_argument("--blur", type=float, default=1.0, help="LED spot standard deviation in camera pixels")
+    parser.add_argument("--exposure", type=float, default=1.0)
+    parser.add_argument("--noise", type=float, default=2.0, help="sensor noise standard deviation, 8 bit units")
+    parser.add_argument("--lower", type=lambda s: int(s, 0), default=LOWER_THRESHOLD)
+    parser.add_argument("--upper", type=lambda s: int(s, 0), default=UPPER_THRESHOLD)
+    parser.add_argument("--downsample-shift", type=int, default=DOWNSAMPLE_SHIFT)
+    parser.add_argument("--bits-per-step", type=int, choices=sorted(SYMBOL_COLORS), default=1)
+    parser.add_argument("--margin", type=lambda s: int(s, 0), default=SYMBOL_MARGIN, help="symbol_classifier margin")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(f"{'LEDs':>6} {'bits':>4} {'steps':>5} {'coverage':>9} {'mis-ID':>8} {'assigned':>9} {'disabled':>9} {'seconds':>8}")
+    for result in sweep(
+        args.num_leds,
+        layout=args.layout,
+        seed=args.seed,
+        blur=args.blur,
+        exposure=args.exposure,
+        noise=args.noise,
+        lower=args.lower,
+        upper=args.upper,
+        downsample_shift=args.downsample_shift,
+        bits_per_step=args.bits_per_step,
+        margin=args.margin,
+    ):
+        s = result.summary()
+        print(
+            f"{s['num_leds']:>6} {s['address_width']:>4} {s['steps']:>5} {s['coverage']:>9.1%} {s['misid_rate']:>8.2%} "
+            f"{s['assigned']:>9} {s['disabled']:>9} {s['seconds']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Calibration maps to boot ``top_level`` with.
+
+A calibration map is ``calibration_step_fsm``'s table: the LED address (or
+``DISABLED_VAL``) of every 4x4 block of the HDMI frame, row-major, one
+``LED_ADDRESS_WIDTH`` bit word per line. Pointing ``top_level``'s
+``CALIBRATION_INIT_FILE`` at one preloads the table, so an installation
+that has not moved displays right away instead of being calibrated after
+every power cycle; the next calibration overwrites it as usual.
+
+Maps come from a dump (``.npy``, a ``$writememh`` ``.mem``/``.hex`` file or
+a text/CSV grid of addresses) or from the calibration model. From ``sim/``:
+
+    python -m model.calibration_map table.npy -n 250 -o ../data/calibration.mem
+    python -m model.calibration_map --simulate -n 250 -o ../data/calibration.mem
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from .calibration import (
+    ACTIVE_H_PIXELS,
+    ACTIVE_LINES,
+    CAMERA_HRES,
+    CAMERA_SHIFT,
+    CAMERA_VRES,
+    DOWNSAMPLE_SHIFT,
+    Scene,
+    address_width,
+    calibrate,
+    random_layout,
+)
+from .memfile import read_memh, write_memh
+
+
+def table_shape(active_h: int = ACTIVE_H_PIXELS, active_lines: int = ACTIVE_LINES, downsample_shift: int = DOWNSAMPLE_SHIFT):
+    """``(rows, columns)`` of the table ``calibration_step_fsm`` keeps."""
+    return active_lines >> downsample_shift, active_h >> downsample_shift
+
+
+def load_map(path, shape=None):
+    """A dumped map as a 2D int64 array, flat dumps are reshaped to ``shape``."""
+    path = Path(path)
+    if path.suffix == ".npy":
+        table = np.load(path)
+    elif path.suffix in (".mem", ".hex"):
+        table = read_memh(path, depth=None if shape is None else shape[0] * shape[1])
+    else:
+        table = np.loadtxt(path, delimiter="," if path.suffix == ".csv" else None, dtype=np.int64, ndmin=2)
+    table = np.asarray(table, dtype=np.int64)
+    if shape is not None:
+        if table.size != shape[0] * shape[1]:
+            raise ValueError(f"{path} has {table.size} entries, the table has {shape[0]}x{shape[1]}")
+        table = table.reshape(shape)
+    return table
+
+
+def check_map(table, width: int):
+    """Raise if ``table`` does not fit in ``width`` bit words."""
+    if table.size and (table.min() < 0 or table.max() >= 1 << width):
+        bad = np.argwhere((table < 0) | (table >= 1 << width))[0]
+        raise ValueError(f"entry {tuple(int(i) for i in bad)} is {table[tuple(bad)]}, not a {width} bit address")
+
+
+def write_map(path, table, width: int):
+    """Write ``table`` as a ``CALIBRATION_INIT_FILE``."""
+    table = np.asarray(table, dtype=np.int64)
+    check_map(table, width)
+    write_memh(path, table, width)
+
+
+def simulate_map(
+    num_leds: int,
+    seed: int = 0,
+    active_h: int = ACTIVE_H_PIXELS,
+    active_lines: int = ACTIVE_LINES,
+    downsample_shift: int = DOWNSAMPLE_SHIFT,
+    address_width: int = None,
+    **scene,
+):
+    """The table :func:`model.calibration.calibrate` ends up with for LEDs scattered over the visible frame.
+
+    ``address_width`` is the table's LED_ADDRESS_WIDTH, ``$clog2(num_leds)`` by default; disabled blocks
+    hold its all ones value.
+    """
+    rng = np.random.default_rng(seed)
+    width = min(CAMERA_HRES, active_h >> CAMERA_SHIFT)
+    height = min(CAMERA_VRES, active_lines >> CAMERA_SHIFT)
+    positions = random_layout(num_leds, rng, margin=min(4.0, width / 4, height / 4), width=width, height=height)
+    result = calibrate(
+        Scene(positions, seed=seed, **scene),
+        width=address_width,
+        downsample_shift=downsample_shift,
+        active_h=active_h,
+        active_lines=active_lines,
+    )
+    return result.table.reshape(table_shape(active_h, active_lines, downsample_shift))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("dump", nargs="?", type=Path, help="dumped map (.npy, .mem/.hex or a text/CSV grid)")
+    parser.add_argument("--simulate", action="store_true", help="calibrate a random layout with model.calibration")
+    parser.add_argument("-n", "--num-leds", type=int, required=True)
+    parser.add_argument("-w", "--address-width", type=int, help="LED_ADDRESS_WIDTH, $clog2(NUM_LEDS) by default")
+    parser.add_argument("-o", "--output", type=Path, required=True)
+    parser.add_argument("--active-h", type=int, default=ACTIVE_H_PIXELS)
+    parser.add_argument("--active-lines", type=int, default=ACTIVE_LINES)
+    parser.add_argument("--downsample-shift", type=int, default=DOWNSAMPLE_SHIFT)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if (args.dump is None) == (not args.simulate):
+        parser.error("pass either a dump or --simulate")
+
+    width = args.address_width or address_width(args.num_leds)
+    shape = table_shape(args.active_h, args.active_lines, args.downsample_shift)
+    if args.simulate:
+        table = simulate_map(
+            args.num_leds, args.seed, args.active_h, args.active_lines, args.downsample_shift, address_width=width
+        )
+    else:
+        table = load_map(args.dump, shape)
+    write_map(args.output, table, width)
+
+    disabled = int((table == (1 << width) - 1).sum())
+    leds = np.unique(table[(table < args.num_leds) & (table != (1 << width) - 1)]).size
+    print(f"{args.output}: {shape[0]}x{shape[1]} entries, {leds} of {args.num_leds} LEDs mapped, {disabled} disabled")
+
+
+if __name__ == "__main__":
+    main()
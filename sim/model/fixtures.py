@@ -0,0 +1,24 @@
+"""Clock and reset setup shared by the testbenches."""
+
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import ClockCycles, FallingEdge
+
+
+def start_clock(clk, period_ns: float = 10):
+    """Start a free running clock on ``clk`` (100MHz by default)."""
+    return cocotb.start_soon(Clock(clk, period_ns, units="ns").start())
+
+
+async def reset(clk, rst, cycles: int = 3, active_high: bool = True):
+    """Hold ``rst`` for ``cycles`` clock cycles, releasing it on a falling edge."""
+    rst.value = int(active_high)
+    await ClockCycles(clk, cycles)
+    await FallingEdge(clk)
+    rst.value = int(not active_high)
+
+
+async def clock_and_reset(clk, rst, period_ns: float = 10, cycles: int = 3):
+    """Start ``clk`` and run a reset sequence on ``rst``."""
+    start_clock(clk, period_ns)
+    await reset(clk, rst, cycles)
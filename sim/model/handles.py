@@ -0,0 +1,34 @@
+"""Cached signal handles.
+
+Looking a signal up as ``dut.hcount_in`` goes through cocotb's hierarchy
+lookup every time, which adds up inside per-pixel loops. ``SignalCache`` does
+the lookup once per name.
+"""
+
+
+class SignalCache:
+    """Attribute access to ``dut`` signals, resolving every name only once.
+
+    >>> sig = SignalCache(dut)
+    >>> sig.hcount_in.value = 10
+    """
+
+    def __init__(self, dut):
+        object.__setattr__(self, "_dut", dut)
+        object.__setattr__(self, "_handles", {})
+
+    def __getattr__(self, name):
+        handles = self._handles
+        if name not in handles:
+            handles[name] = getattr(self._dut, name)
+        return handles[name]
+
+    def __setattr__(self, name, value):
+        raise AttributeError("assign to .value of the handle instead")
+
+    def get(self, name, default=None):
+        """Handle for ``name``, or ``default`` if the DUT has no such signal."""
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            return default
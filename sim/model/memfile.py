@@ -0,0 +1,48 @@
+"""Reading and writing ``$readmemh``/``$writememh`` files with NumPy."""
+
+import numpy as np
+
+
+def write_memh(path, values, width: int):
+    """Write ``values`` (flattened, row-major) as a ``$readmemh`` file of ``width``-bit words."""
+    values = np.asarray(values).astype(np.uint64).ravel()
+    if values.size and int(values.max()) >= 1 << width:
+        raise ValueError(f"value {int(values.max()):#x} does not fit in {width} bits")
+    digits = max(1, -(-width // 4))
+    if digits == 1:
+        # one character per word, index a lookup table instead of formatting every value
+        lines = np.array(list("0123456789abcdef"))[values]
+    else:
+        lines = np.char.zfill(np.char.mod("%x", values), digits)
+    with open(path, "w") as f:
+        f.write("\n".join(lines.tolist()))
+        f.write("\n")
+
+
+def read_memh(path, depth: int = None, fill: int = -1):
+    """Read a ``$writememh`` file into an int64 array.
+
+    Handles ``//`` comments and ``@address`` records. Words that contain x or z
+    bits, and words past the end of the file up to ``depth``, read as ``fill``.
+    """
+    words = {}
+    address = 0
+    with open(path) as f:
+        for line in f:
+            line = line.split("//", 1)[0]
+            for token in line.split():
+                if token.startswith("@"):
+                    address = int(token[1:], 16)
+                    continue
+                token = token.replace("_", "")
+                try:
+                    words[address] = int(token, 16)
+                except ValueError:  # x/z
+                    words[address] = fill
+                address += 1
+    size = depth if depth is not None else (max(words) + 1 if words else 0)
+    values = np.full(size, fill, dtype=np.int64)
+    for address, word in words.items():
+        if address < size:
+            values[address] = word
+    return values
@@ -0,0 +1,120 @@
+"""Bit-exact model of the camera pixel path.
+
+Follows a frame buffer pixel the way ``top_level`` does: RGB565 is widened to
+8 bits per channel (``fb_pixel_convert``), converted with the fixed-point
+math of ``rgb_to_ycrcb``, cut down to 8 bits with the MSB of Cr and Cb
+inverted, and thresholded (``threshold``: above ``lower``, at most
+``upper``). ``top_level`` thresholds Cr into detect0 and Cb into detect1,
+with the lower bound of each from ``auto_threshold`` (see
+:func:`auto_threshold`) unless its AUTO_THRESHOLD is 0.
+
+With more than one address bit per calibration step ``symbol_classifier``
+decodes id_shower's ``SYMBOL_COLORS`` from Cr/Cb instead, see
+:func:`classify_symbols`.
+
+Everything works on whole frames: pass arrays of any shape and get arrays of
+the same shape back.
+"""
+
+import numpy as np
+
+# top_level's threshold bounds, the lower one while auto_threshold has not counted a frame yet
+LOWER_THRESHOLD = 0x80
+UPPER_THRESHOLD = 0xFF
+
+# rgb_to_ycrcb coefficients, 10 fractional bits
+Y_R, Y_G, Y_B = 0x132, 0x259, 0x074
+CR_G, CR_B = 0x1AD, 0x053
+CB_R, CB_G = 0x0AD, 0x153
+
+
+def unpack_rgb565(pixels, valid=None):
+    """8 bit ``(red, green, blue)`` of RGB565 ``pixels``, black where ``valid`` is false."""
+    pixels = np.asarray(pixels, dtype=np.int64)
+    red = ((pixels >> 11) & 0x1F) << 3
+    green = ((pixels >> 5) & 0x3F) << 2
+    blue = (pixels & 0x1F) << 3
+    if valid is not None:
+        valid = np.asarray(valid, dtype=bool)
+        red, green, blue = (np.where(valid, channel, 0) for channel in (red, green, blue))
+    return red, green, blue
+
+
+def rgb_to_ycrcb(red, green, blue):
+    """10 bit ``(y, cr, cb)`` outputs of ``rgb_to_ycrcb``, Cr and Cb are two's complement."""
+    red, green, blue = (np.asarray(channel, dtype=np.int64) for channel in (red, green, blue))
+    y = Y_R * red + Y_G * green + Y_B * blue
+    cr = (red << 9) - CR_G * green - CR_B * blue
+    cb = (blue << 9) - CB_R * red - CB_G * green
+    # the sums are 22 bits wide and bits [19:10] come out, the same as an arithmetic shift and mask
+    return tuple((value >> 10) & 0x3FF for value in (y, cr, cb))
+
+
+def ycrcb_planes(pixels, valid=None):
+    """8 bit ``(y, cr, cb)`` of RGB565 ``pixels`` as ``fb_pixel_convert`` outputs them."""
+    y, cr, cb = rgb_to_ycrcb(*unpack_rgb565(pixels, valid))
+    # Cr and Cb are signed, inverting the MSB maps [-128, 128) to [0, 256)
+    return y & 0xFF, (cr & 0xFF) ^ 0x80, (cb & 0xFF) ^ 0x80
+
+
+def threshold(channel, lower=LOWER_THRESHOLD, upper=UPPER_THRESHOLD):
+    """``threshold``'s mask: above ``lower`` and at most ``upper``."""
+    channel = np.asarray(channel)
+    return (channel > lower) & (channel <= upper)
+
+
+# top_level's auto_threshold inputs: the 3/4 quantile of the frame, plus a margin
+AUTO_PERCENTILE = 0xC0
+AUTO_MARGIN = 0x10
+
+
+def auto_threshold(channel, percentile=AUTO_PERCENTILE, margin=AUTO_MARGIN):
+    """``auto_threshold``'s ``(level, threshold)`` for a frame of 8 bit ``channel`` values, ``None`` if it is empty.
+
+    ``level`` is the lowest value with more than ``percentile / 256`` of the pixels at or below it.
+    """
+    values = np.asarray(channel, dtype=np.int64).ravel()
+    target = (values.size * percentile) >> 8
+    below = np.cumsum(np.bincount(values, minlength=256))
+    if below[-1] <= target:
+        return None
+    level = int(np.argmax(below > target))
+    return level, min(level + margin, 0xFF)
+
+
+def detect_masks(pixels, valid=None, lower=LOWER_THRESHOLD, upper=UPPER_THRESHOLD):
+    """``(detect0, detect1)`` masks of RGB565 ``pixels``: thresholded Cr and Cb."""
+    _, cr, cb = ycrcb_planes(pixels, valid)
+    return threshold(cr, lower, upper), threshold(cb, lower, upper)
+
+
+# symbol_color in hdl/pixel/symbol_classifier.sv: id_shower's (red, green, blue) for every symbol
+SYMBOL_COLORS = {
+    1: [(0xFF, 0x00, 0x00), (0x00, 0x00, 0x8F)],
+    2: [(0x20, 0xFF, 0x00), (0x00, 0x8C, 0xFF), (0xFF, 0x70, 0x00), (0xE0, 0x00, 0xFF)],
+    3: [
+        (0x70, 0xFF, 0x00),
+        (0x00, 0xFF, 0x40),
+        (0x00, 0x48, 0xFF),
+        (0x00, 0xD0, 0xFF),
+        (0xF0, 0xA8, 0x00),
+        (0xFF, 0x20, 0x00),
+        (0x8C, 0x00, 0xF0),
+        (0xFF, 0x00, 0xC0),
+    ],
+}
+SYMBOL_MARGIN = 0x10  # top_level's margin_in
+
+
+def classify_symbols(cr, cb, bits_per_step: int, margin: int = SYMBOL_MARGIN):
+    """``symbol_classifier``'s ``(symbol, valid)`` for 8 bit ``cr`` and ``cb`` planes."""
+    cr = np.asarray(cr, dtype=np.int64) - 0x80
+    cb = np.asarray(cb, dtype=np.int64) - 0x80
+    cr_abs, cb_abs = np.abs(cr), np.abs(cb)
+    if bits_per_step == 1:
+        return (cb > cr).astype(np.int64), np.abs(cb - cr) > margin
+    symbol = ((cr > 0) << 1) | (cb > 0)
+    valid = (cr_abs > margin) & (cb_abs > margin)
+    if bits_per_step == 2:
+        return symbol.astype(np.int64), valid
+    return ((symbol << 1) | (cr_abs > cb_abs)).astype(np.int64), valid & (np.abs(cr_abs - cb_abs) > margin)
@@ -0,0 +1,145 @@
+"""Video timing stimulus from NumPy frames.
+
+``RasterDriver`` plays the role of ``video_sig_gen`` for modules that consume
+``hcount_in``/``vcount_in``/``new_frame_in`` plus per-pixel inputs such as
+``detect_0``/``detect_1``. Frames are NumPy arrays of shape
+``(active_v, active_h)``; scalars hold the input constant for the whole frame.
+
+Values change on falling edges, one pixel per cycle, with ``new_frame_in``
+pulsing on the first blanking pixel of line ``active_v`` like
+``video_sig_gen``. To keep the number of Python wakeups down the driver:
+
+* looks every handle up once,
+* writes per-pixel inputs only when their value changes,
+* with ``skip_blanking`` (the default) holds the counters through each
+  horizontal blanking period and the whole vertical blanking period with one
+  ``Timer`` instead of one await per blanking pixel (``ClockCycles`` would
+  still wake Python up on every edge). The DUT sees the same number of cycles
+  and the same ``new_frame_in`` pulse, but the counters do not advance while
+  blanked.
+"""
+
+import numpy as np
+from cocotb.triggers import FallingEdge, Timer
+
+from .handles import SignalCache
+
+
+class RasterDriver:
+    """Drive raster counters and per-pixel inputs of ``dut`` from NumPy frames."""
+
+    def __init__(
+        self,
+        dut,
+        clk,
+        active_h: int,
+        active_v: int,
+        h_porch: int,
+        v_porch: int,
+        hcount="hcount_in",
+        vcount="vcount_in",
+        new_frame="new_frame_in",
+        period_ns: float = 10,
+    ):
+        if h_porch < 1 or v_porch < 1:
+            raise ValueError("RasterDriver needs at least one blanking pixel and line")
+        self.clk = clk
+        self.period_ns = period_ns
+        self.active_h = active_h
+        self.active_v = active_v
+        self.total_h = active_h + h_porch
+        self.total_v = active_v + v_porch
+        self.signals = SignalCache(dut)
+        self.hcount = getattr(self.signals, hcount)
+        self.vcount = getattr(self.signals, vcount)
+        self.new_frame = getattr(self.signals, new_frame)
+        self._falling = FallingEdge(clk)
+
+    async def _hold(self, cycles):
+        """Wait ``cycles`` falling edges, starting on a falling edge."""
+        if cycles > 1:
+            # land a quarter period into the last cycle, well clear of both clock edges
+            await Timer((cycles - 1) * self.period_ns + self.period_ns / 4, "ns")
+        if cycles > 0:
+            await self._falling
+
+    def _planes(self, planes):
+        """Split ``planes`` into constant inputs and per-pixel rows."""
+        constant, rows = [], []
+        for name, plane in planes.items():
+            handle = getattr(self.signals, name)
+            plane = np.asarray(plane)
+            if plane.ndim == 0:
+                constant.append((handle, int(plane)))
+            elif plane.shape == (self.active_v, self.active_h):
+                rows.append((handle, plane.astype(np.int64).tolist()))
+            else:
+                raise ValueError(
+                    f"{name}: expected shape {(self.active_v, self.active_h)}, got {plane.shape}"
+                )
+        return constant, rows
+
+    async def drive_frame(self, new_frame: bool = True, skip_blanking: bool = True, **planes):
+        """Drive one frame, starting on the next falling edge.
+
+        Keyword arguments name per-pixel inputs, e.g. ``detect_1=mask``.
+        Outside the active area per-pixel inputs keep their last value. Returns
+        one cycle before the end of the last pixel, so back to back calls
+        produce back to back frames.
+        """
+        constant, rows = self._planes(planes)
+        hcount, vcount, new_frame_in = self.hcount, self.vcount, self.new_frame
+        active_h, active_v, total_h = self.active_h, self.active_v, self.total_h
+        falling = self._falling
+        last = [None] * len(rows)
+
+        await falling
+        new_frame_in.value = 0
+        for handle, value in constant:
+            handle.value = value
+
+        for v in range(active_v):
+            vcount.value = v
+            for h in range(active_h):
+                if h:
+                    await falling
+                hcount.value = h
+                for i, (handle, plane) in enumerate(rows):
+                    value = plane[v][h]
+                    if value != last[i]:
+                        handle.value = value
+                        last[i] = value
+            await falling
+            if skip_blanking:
+                hcount.value = active_h
+                await self._hold(total_h - active_h)
+            else:
+                for h in range(active_h, total_h):
+                    if h > active_h:
+                        await falling
+                    hcount.value = h
+                await falling
+
+        if skip_blanking:
+            remaining = (self.total_v - active_v) * total_h
+            vcount.value = active_v
+            hcount.value = 0
+            await self._hold(active_h)
+            hcount.value = active_h
+            new_frame_in.value = int(new_frame)
+            remaining -= active_h + 1
+            if remaining:
+                await falling
+                new_frame_in.value = 0
+                await self._hold(remaining - 1)
+            return
+
+        for v in range(active_v, self.total_v):
+            vcount.value = v
+            for h in range(total_h):
+                if h:
+                    await falling
+                hcount.value = h
+                new_frame_in.value = int(new_frame and v == active_v and h == active_h)
+            if v < self.total_v - 1:
+                await falling
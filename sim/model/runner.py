@@ -0,0 +1,250 @@
+"""Build and run testbenches with the cocotb Python runner.
+
+Every ``sim/test_*.py`` describes its DUT with a module level
+:class:`Testbench` called ``TESTBENCH``; ``is_runner()`` just runs it and
+``sim/regress.py`` finds them all to run them in parallel.
+
+Builds are cached: the build directory remembers a hash of everything that
+goes into the build (the sources and every file they `` `include ``, the
+parameters, simulator, build arguments and wave settings) and the compile
+step is skipped when nothing changed. ``REBUILD=1`` forces a build.
+
+Waveforms are off unless a testbench asks for them or ``WAVES=1`` is set.
+``WAVE_SCOPES`` (or ``Testbench.wave_scopes``) limits dumping to a comma
+separated list of instance paths below the toplevel, e.g.
+``WAVES=1 WAVE_SCOPES=accum_ram TESTCASE=test_a python sim/test_calibration_step_fsm.py``.
+
+Each simulator gets its own default build arguments (:data:`BUILD_ARGS`), so
+every testbench runs under both Icarus and Verilator (``SIM=verilator``).
+
+Test modules read their HDL parameters with :func:`parameter`, which lets a
+testbench be rebuilt with other values: ``Testbench.sweeps`` lists named
+production sized configurations, ``SWEEP=<name>`` or ``run(sweep=...)`` runs
+one and ``python sim/regress.py --sweep`` runs them all.
+"""
+
+from dataclasses import dataclass, field
+import hashlib
+import json
+import os
+from pathlib import Path
+import re
+import sys
+
+import cocotb
+from cocotb.runner import get_runner
+
+PROJ_PATH = Path(__file__).resolve().parents[2]
+HDL_PATH = PROJ_PATH / "hdl"
+SIM_PATH = PROJ_PATH / "sim"
+TIMESCALE = ("1ns", "1ps")
+
+# on top of each testbench's own build_args
+BUILD_ARGS = {
+    "icarus": ("-Wall",),
+    # Verilator is stricter than synthesis about widths and unused signals, only report those
+    "verilator": ("--timing", "-Wno-fatal", "-Wno-lint", "-Wno-style"),
+}
+# the simulator gets the parameters the DUT was built with in here, see parameter()
+PARAMETERS_ENV = "TESTBENCH_PARAMETERS"
+
+INCLUDE_RE = re.compile(r'^\s*`include\s+"([^"]+)"', re.MULTILINE)
+# what each simulator leaves in the build directory, builds for other simulators are never cached
+BUILD_ARTIFACTS = {"icarus": "sim.vvp", "verilator": "{toplevel}"}
+BUILD_HASH_FILE = "build.sha256"
+
+
+def _env_flag(name: str):
+    value = os.getenv(name)
+    return None if value is None else value not in ("", "0")
+
+
+def parameter(name: str, default):
+    """Value of the HDL parameter ``name`` the DUT was built with, ``default`` outside of a sweep.
+
+    Test modules use this for the constants they pass to ``Testbench`` so the
+    tests follow the configuration the runner actually built.
+    """
+    return json.loads(os.getenv(PARAMETERS_ENV, "{}")).get(name, default)
+
+
+def include_graph(sources, includes=(HDL_PATH,)):
+    """``sources`` plus every file they `` `include ``, transitively.
+
+    Includes are resolved against the including file's directory first and
+    then ``includes``; ones that cannot be found are left out.
+    """
+    seen = []
+    pending = [Path(source).resolve() for source in sources]
+    while pending:
+        path = pending.pop()
+        if path in seen:
+            continue
+        seen.append(path)
+        for name in INCLUDE_RE.findall(path.read_text(errors="replace")):
+            for directory in (path.parent, *includes):
+                candidate = (Path(directory) / name).resolve()
+                if candidate.is_file():
+                    pending.append(candidate)
+                    break
+    return sorted(seen)
+
+
+@dataclass
+class Testbench:
+    """One DUT configuration and the cocotb module that tests it.
+
+    ``sources`` are relative to ``hdl/``, absolute paths (simulation only
+    wrappers in ``sim/tb/``) are used as they are. ``test_module`` defaults to
+    ``test_<toplevel>``. ``sweeps`` maps a name to parameter overrides for the
+    configurations we ship, and ``clock_period_ns`` is only used to report
+    simulated cycles per second.
+    """
+
+    toplevel: str
+    sources: list
+    parameters: dict = field(default_factory=dict)
+    test_module: str = None
+    build_args: tuple = ()  # on top of BUILD_ARGS for the simulator
+    test_args: tuple = ()
+    waves: bool = False
+    wave_scopes: tuple = ()  # instance paths below the toplevel to dump, everything if empty
+    sweeps: dict = field(default_factory=dict)
+    clock_period_ns: float = 10
+
+    def __post_init__(self):
+        if self.test_module is None:
+            self.test_module = f"test_{self.toplevel}"
+
+    @property
+    def source_paths(self):
+        return [HDL_PATH / source for source in self.sources]
+
+    def sweep_parameters(self, sweep: str = None) -> dict:
+        """Parameters of the ``sweep`` configuration, the defaults if None."""
+        if sweep is None:
+            return dict(self.parameters)
+        if sweep not in self.sweeps:
+            raise ValueError(f"{self.toplevel} has no sweep {sweep!r}, only {', '.join(self.sweeps) or 'none'}")
+        return {**self.parameters, **self.sweeps[sweep]}
+
+    def build_hash(self, sim: str, parameters: dict, build_args, waves: bool, wave_scopes) -> str:
+        """Hash of everything the build output depends on."""
+        digest = hashlib.sha256()
+        config = {
+            "sim": sim,
+            "cocotb": cocotb.__version__,
+            "toplevel": self.toplevel,
+            "parameters": {name: str(value) for name, value in parameters.items()},
+            "build_args": list(build_args),
+            "timescale": TIMESCALE,
+            "waves": waves,
+            "wave_scopes": list(wave_scopes) if waves else [],
+        }
+        digest.update(json.dumps(config, sort_keys=True).encode())
+        for path in include_graph(self.source_paths):
+            digest.update(str(path).encode())
+            digest.update(path.read_bytes())
+        return digest.hexdigest()
+
+    def _scoped_wave_args(self, sim: str, build_dir: Path, wave_scopes):
+        """Build and run arguments that limit dumping to ``wave_scopes``."""
+        if sim == "icarus":
+            # replaces cocotb's dump module, which always dumps the whole toplevel
+            dump = build_dir / "wave_dump.v"
+            dumpvars = "".join(f"    $dumpvars(0, {self.toplevel}.{scope});\n" for scope in wave_scopes)
+            dump.write_text(
+                "module wave_dump();\ninitial begin\n"
+                f'    $dumpfile("{(build_dir / self.toplevel).as_posix()}.fst");\n'
+                f"{dumpvars}end\nendmodule\n"
+            )
+            return ["-s", "wave_dump", str(dump)], ["-fst"]
+        if sim == "verilator":
+            config = build_dir / "wave_scopes.vlt"
+            tracing_on = "".join(
+                f'tracing_on -scope "{self.toplevel}.{scope}*"\n' for scope in wave_scopes
+            )
+            config.write_text(f'`verilator_config\ntracing_off -scope "*"\n{tracing_on}')
+            return [str(config)], []
+        raise ValueError(f"wave scopes are not supported for {sim}")
+
+    def run(
+        self,
+        sim: str = None,
+        build_dir="sim_build",
+        log_dir=None,
+        waves: bool = None,
+        testcase=None,
+        sweep: str = None,
+    ):
+        """Build (if needed) and run the tests, returns the path of the JUnit results file.
+
+        ``sim`` defaults to ``$SIM`` (icarus if unset), ``waves`` to ``$WAVES``
+        and then the testbench's own setting, ``testcase`` to ``$TESTCASE``
+        (all tests) and ``sweep`` to ``$SWEEP`` (the default parameters).
+        Builds and test artifacts go to ``build_dir``; with
+        ``log_dir`` the compiler and simulator output go to ``build.log`` and
+        ``test.log`` in there instead of the console.
+        """
+        sim = sim or os.getenv("SIM", "icarus")
+        parameters = self.sweep_parameters(sweep or os.getenv("SWEEP") or None)
+        if waves is None:
+            waves = _env_flag("WAVES")
+        if waves is None:
+            waves = self.waves
+        wave_scopes = tuple(filter(None, os.getenv("WAVE_SCOPES", "").split(","))) or self.wave_scopes
+        build_dir = Path(build_dir).resolve()
+        build_dir.mkdir(parents=True, exist_ok=True)
+        # the simulator inherits sys.path, this makes ``import model`` work in the tests
+        if str(SIM_PATH) not in sys.path:
+            sys.path.append(str(SIM_PATH))
+
+        build_args, plusargs = [*BUILD_ARGS.get(sim, ()), *self.build_args], []
+        scoped = bool(waves and wave_scopes)
+        if scoped:
+            scope_build_args, plusargs = self._scoped_wave_args(sim, build_dir, wave_scopes)
+            build_args += scope_build_args
+        # cocotb's icarus dump module would dump everything on top of the scopes
+        cocotb_waves = waves and not (scoped and sim == "icarus")
+
+        runner = get_runner(sim)
+        build_hash = self.build_hash(sim, parameters, build_args, waves, wave_scopes)
+        hash_file = build_dir / BUILD_HASH_FILE
+        artifact = BUILD_ARTIFACTS.get(sim)
+        cached = (
+            not _env_flag("REBUILD")
+            and artifact is not None
+            and (build_dir / artifact.format(toplevel=self.toplevel)).is_file()
+            and hash_file.is_file()
+            and hash_file.read_text() == build_hash
+        )
+        if cached:
+            print(f"INFO: {self.toplevel} is up to date in {build_dir}, not rebuilding")
+        else:
+            hash_file.unlink(missing_ok=True)
+            runner.build(
+                sources=self.source_paths,
+                hdl_toplevel=self.toplevel,
+                includes=[HDL_PATH],
+                always=True,
+                build_args=build_args,
+                parameters=parameters,
+                timescale=TIMESCALE,
+                waves=cocotb_waves,
+                build_dir=build_dir,
+                log_file=Path(log_dir) / "build.log" if log_dir else None,
+            )
+            hash_file.write_text(build_hash)
+
+        return runner.test(
+            hdl_toplevel=self.toplevel,
+            hdl_toplevel_lang="verilog",
+            test_module=self.test_module,
+            testcase=testcase or os.getenv("TESTCASE") or None,
+            test_args=list(self.test_args),
+            plusargs=plusargs,
+            extra_env={PARAMETERS_ENV: json.dumps(parameters, default=str)},
+            waves=cocotb_waves,
+            build_dir=build_dir,
+            log_file=Path(log_dir) / "test.log" if log_dir else None,
+        )
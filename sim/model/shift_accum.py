@@ -0,0 +1,95 @@
+"""Reference model of ``hdl/mem/shift_accum_ram.sv``.
+
+Every write request reads its address, shifts the ``SUMMAND_WIDTH`` bit
+summand in at the bottom (``WRITE``), replaces the value with it (``WRITE_OVER``) or locks the address
+to ``DISABLED_VAL`` (``DISABLE``); a locked address stays locked until it is
+written over. The read goes through a 2 cycle RAM and the write is issued
+when the result comes out, the writes still in flight are forwarded, so a
+request sees the writes of every older request, even back-to-back ones to the
+same address. ``HAZARD_CYCLES`` is how much older a write has to be to be seen.
+
+The model applies a whole batch of transactions at once: every transaction
+is matched to the write it reads with a sorted search, and the values are
+resolved one write per address at a time.
+"""
+
+import numpy as np
+
+READ, WRITE, WRITE_OVER, DISABLE = range(4)
+LATENCY = 2  # cycles from a request to its read_out/sum_out
+# writes to the address a request reads are forwarded until they are in the RAM
+HAZARD_CYCLES = 1
+
+
+class ShiftAccumModel:
+    """RAM contents of a ``shift_accum_ram`` with ``WIDTH`` bit words, ``DEPTH`` addresses and ``SUMMAND_WIDTH`` bit summands.
+
+    :meth:`apply` consumes batches of requests; the RAM is carried over from
+    one batch to the next, which assumes the DUT was idle for at least
+    ``HAZARD_CYCLES`` cycles in between.
+    """
+
+    def __init__(self, width: int, depth: int, memory=None, summand_width: int = 1):
+        self.width = width
+        self.depth = depth
+        self.summand_width = summand_width
+        self.disabled = (1 << width) - 1
+        self.memory = np.zeros(depth, dtype=np.int64) if memory is None else np.array(memory, dtype=np.int64)
+
+    def _sum(self, read, request_type, summand):
+        """``sum_out`` for requests that read ``read``."""
+        shifted = ((read << self.summand_width) | summand) & self.disabled
+        locked = (request_type == DISABLE) | (read == self.disabled)
+        return np.where(request_type == WRITE_OVER, summand, np.where(locked, self.disabled, shifted))
+
+    def apply(self, addr, request_type, summand, cycle=None):
+        """Apply a batch of requests, returns their ``(read_out, sum_out)``.
+
+        ``cycle`` is the clock cycle of every request, strictly increasing; by
+        default they are back-to-back. ``sum_out`` is what the DUT outputs for
+        every request, reads included, even though only writes store it.
+        """
+        addr = np.asarray(addr, dtype=np.int64)
+        request_type = np.asarray(request_type, dtype=np.int64)
+        summand = np.asarray(summand, dtype=np.int64) & ((1 << self.summand_width) - 1)
+        count = addr.size
+        cycle = np.arange(count, dtype=np.int64) if cycle is None else np.asarray(cycle, dtype=np.int64)
+        if np.any(np.diff(cycle) <= 0):
+            raise ValueError("request cycles have to be strictly increasing")
+        if count and (addr.min() < 0 or addr.max() >= self.depth):
+            raise ValueError(f"addresses have to be below DEPTH={self.depth}")
+
+        # the writes ordered by address and then cycle, keyed so one search finds the last write to
+        # the same address that is old enough to be visible
+        writes = np.flatnonzero(request_type != READ)
+        if writes.size == 0:
+            read_out = self.memory[addr]
+            return read_out, self._sum(read_out, request_type, summand)
+        span = int(cycle[-1]) + HAZARD_CYCLES + 1
+        writes = writes[np.lexsort((cycle[writes], addr[writes]))]
+        waddr = addr[writes]
+        found = np.searchsorted(waddr * span + cycle[writes], addr * span + cycle - HAZARD_CYCLES, side="right") - 1
+        found = np.maximum(found, 0)
+        # index into writes, -1 reads the RAM as it was before the batch
+        source = np.where(waddr[found] == addr, found, -1)
+        source[cycle[writes[found]] > cycle - HAZARD_CYCLES] = -1
+
+        # resolve the written values by rank within each address, a write only reads earlier ranks
+        group_start = np.flatnonzero(np.concatenate(([True], waddr[1:] != waddr[:-1])))
+        group_end = np.append(group_start[1:], writes.size)
+        rank = np.arange(writes.size) - np.repeat(group_start, group_end - group_start)
+        order = np.argsort(rank, kind="stable")
+        bounds = np.searchsorted(rank[order], np.arange(rank.max() + 2))
+        write_source = source[writes]
+        write_values = np.zeros(writes.size, dtype=np.int64)
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            level = order[start:stop]
+            src = write_source[level]
+            read = np.where(src >= 0, write_values[src], self.memory[waddr[level]])
+            i = writes[level]
+            write_values[level] = self._sum(read, request_type[i], summand[i])
+
+        read_out = np.where(source >= 0, write_values[source], self.memory[addr])
+        # the last write to every address is what stays in the RAM
+        self.memory[waddr[group_end - 1]] = write_values[group_end - 1]
+        return read_out, self._sum(read_out, request_type, summand)
@@ -0,0 +1,144 @@
+"""Edge-driven WS2812B strand monitor for cocotb.
+
+Instead of sampling ``strand_out`` every clock, the monitor only wakes up on
+edges of the line (plus one timer per LED word to spot resets), timestamps
+them with ``get_sim_time`` and decodes bits on the fly. It models a
+daisy-chained strand: after every reset LED 0 keeps the first 24 bits, LED 1
+the next 24 and so on, and every latched refresh is published to a queue as a
+snapshot of the whole strand.
+
+Several strands driven from one vector (``strand_out[3:0]``) each get their own
+monitor on the whole vector with ``bit`` set; edges of the other strands are
+skipped.
+"""
+
+from dataclasses import dataclass
+
+import math
+
+import cocotb
+import numpy as np
+from cocotb.queue import Queue
+from cocotb.triggers import Edge, First, Timer
+from cocotb.utils import get_sim_time
+
+from .ws2812 import BITS_PER_LED, WS2812DecodeError, WS2812Timing
+
+
+@dataclass
+class StrandRefresh:
+    """One latched refresh of the strand."""
+
+    colors: np.ndarray  # (num_leds, 3) uint8 in wire order (G, R, B)
+    leds_written: int  # LEDs that received a new color in this refresh
+    leds_forwarded: int  # words that went past the end of the strand
+    start_ns: float  # first rising edge of the refresh
+    end_ns: float  # falling edge of the last bit
+    latch_ns: float  # when the reset was recognized
+
+
+class StrandMonitor:
+    """Decode a WS2812B strand from edges of ``signal``.
+
+    Latched refreshes are put on :attr:`refreshes`; :attr:`colors` always holds
+    what the strand is currently displaying.
+    """
+
+    def __init__(
+        self, signal, num_leds: int, clock_speed: int = 100_000_000, timing: WS2812Timing = None, bit: int = None
+    ):
+        self.signal = signal
+        self.bit = bit
+        self.num_leds = num_leds
+        self.timing = timing or WS2812Timing.from_clock_speed(clock_speed)
+        self.colors = np.zeros((num_leds, 3), dtype=np.uint8)
+        self.refreshes = Queue()
+        self.reset_gaps_ns = []  # low time before each refresh after the first one
+        self._task = None
+
+    def start(self):
+        self._task = cocotb.start_soon(self._run())
+        return self
+
+    def stop(self):
+        if self._task is not None:
+            self._task.kill()
+            self._task = None
+
+    def _level(self):
+        if self.bit is None:
+            return bool(self.signal.value)
+        return self.signal.value.binstr[-1 - self.bit] == "1"  # binstr, the other strands may still be X
+
+    def _classify_high(self, high_ns):
+        if self.timing.within(high_ns, self.timing.t1h):
+            return 1
+        if self.timing.within(high_ns, self.timing.t0h):
+            return 0
+        raise WS2812DecodeError(f"high for {high_ns:.0f}ns matches neither T0H nor T1H")
+
+    def _check_low(self, bit, low_ns):
+        nominal = self.timing.t1l if bit else self.timing.t0l
+        if not self.timing.within(low_ns, nominal):
+            raise WS2812DecodeError(f"low for {low_ns:.0f}ns is neither T{bit}L nor a reset")
+
+    async def _run(self):
+        edge = Edge(self.signal)
+        res_min = self.timing.res_min
+
+        pending = self.colors.copy()
+        word, word_bits, leds, forwarded = 0, 0, 0, 0
+        bit = None  # last bit, waiting for its low period to be checked
+        rise_ns = fall_ns = frame_start_ns = last_end_ns = None
+        level = False
+
+        def latch(now):
+            nonlocal pending, word, word_bits, leds, forwarded, bit, frame_start_ns, last_end_ns
+            if word_bits:
+                raise WS2812DecodeError(f"reset after {word_bits} bits of LED {leds}")
+            self.colors = pending.copy()
+            self.refreshes.put_nowait(
+                StrandRefresh(self.colors.copy(), min(leds, self.num_leds), forwarded, frame_start_ns, fall_ns, now)
+            )
+            last_end_ns = fall_ns
+            leds, forwarded, bit, frame_start_ns = 0, 0, None, None
+
+        while True:
+            # a reset can only legally follow a whole LED word, so only then race a timer against the next edge
+            if bit is not None and word_bits == 0:
+                # other strands' edges can wake us up in between, only wait out what is left of the reset
+                remaining = math.ceil(fall_ns + res_min - get_sim_time("ns"))
+                waited = await First(edge, Timer(remaining, "ns")) if remaining > 0 else None
+                if waited is not edge:
+                    latch(get_sim_time("ns"))
+                    continue
+            else:
+                await edge
+            now = get_sim_time("ns")
+            if self._level() == level:
+                continue
+            level = not level
+
+            if level:  # rising edge: previous bit is over, new one starts
+                if bit is not None:
+                    if now - fall_ns >= res_min:
+                        latch(now)
+                    else:
+                        self._check_low(bit, now - fall_ns)
+                if frame_start_ns is None:
+                    frame_start_ns = now
+                    if last_end_ns is not None:
+                        self.reset_gaps_ns.append(now - last_end_ns)
+                rise_ns = now
+            elif rise_ns is not None:  # falling edge: high time gives the bit value
+                bit = self._classify_high(now - rise_ns)
+                fall_ns = now
+                word = (word << 1) | bit
+                word_bits += 1
+                if word_bits == BITS_PER_LED:
+                    if leds < self.num_leds:
+                        pending[leds] = ((word >> 16) & 0xFF, (word >> 8) & 0xFF, word & 0xFF)
+                    else:
+                        forwarded += 1
+                    leds += 1
+                    word, word_bits = 0, 0
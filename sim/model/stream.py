@@ -0,0 +1,85 @@
+"""Bulk valid/ready stimulus.
+
+``ReadyValidDriver`` pushes whole NumPy columns into a bundle of input
+signals qualified by a valid strobe, one transaction per accepted cycle. Like
+the rest of the testbenches it drives on falling edges; if a ``ready`` signal
+is given it is sampled on the rising edge and the transaction is held until
+it is accepted.
+"""
+
+import numpy as np
+from cocotb.triggers import FallingEdge, RisingEdge
+
+from .handles import SignalCache
+
+
+class ReadyValidDriver:
+    """Drive ``fields`` of ``dut`` with a ``valid`` (and optional ``ready``) handshake.
+
+    >>> drv = ReadyValidDriver(dut, dut.clk_in, "request_valid_in", ["addr_in", "request_type_in"])
+    >>> await drv.send(addr_in=addrs, request_type_in=types)
+    """
+
+    def __init__(self, dut, clk, valid: str, fields, ready: str = None):
+        self.clk = clk
+        self.signals = SignalCache(dut)
+        self.valid = getattr(self.signals, valid)
+        self.fields = {name: getattr(self.signals, name) for name in fields}
+        self.ready = getattr(self.signals, ready) if ready else None
+        self._falling = FallingEdge(clk)
+        self._rising = RisingEdge(clk)
+
+    async def send(self, strobe=None, **columns) -> int:
+        """Send one transaction per element of the ``columns``.
+
+        Every field has to be given, as an array or a constant. ``strobe`` is
+        an optional boolean array with one entry per cycle: cycles where it is
+        false drive ``valid`` low and consume no data, which is how to insert
+        bubbles. Returns the number of cycles it took; ``valid`` is low again
+        when it returns.
+        """
+        missing = self.fields.keys() - columns.keys()
+        if missing:
+            raise ValueError(f"no values for {sorted(missing)}")
+        lengths = {len(c) for c in columns.values() if np.ndim(c)}
+        if len(lengths) > 1:
+            raise ValueError(f"columns have different lengths {sorted(lengths)}")
+        count = lengths.pop() if lengths else 1
+        if strobe is None:
+            strobe = np.ones(count, dtype=bool)
+        strobe = np.asarray(strobe, dtype=bool)
+        if strobe.sum() != count:
+            raise ValueError(f"strobe has {strobe.sum()} valid cycles for {count} transactions")
+
+        # constants are only written with the first transaction, as nothing changes after that
+        handles = [self.fields[name] for name in columns]
+        values = [
+            np.asarray(c).astype(np.int64).tolist() if np.ndim(c) else [int(c)] * count
+            for c in columns.values()
+        ]
+        last = [None] * len(handles)
+
+        valid, ready, falling, rising = self.valid, self.ready, self._falling, self._rising
+        cycles, i, valid_now = 0, 0, None
+        for enabled in strobe.tolist():
+            await falling
+            cycles += 1
+            if enabled != valid_now:
+                valid.value = int(enabled)
+                valid_now = enabled
+            if not enabled:
+                continue
+            for j, handle in enumerate(handles):
+                value = values[j][i]
+                if value != last[j]:
+                    handle.value = value
+                    last[j] = value
+            i += 1
+            if ready is not None:
+                await rising
+                while not ready.value:
+                    await rising
+                    cycles += 1
+        await falling
+        valid.value = 0
+        return cycles
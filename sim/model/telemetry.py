@@ -0,0 +1,41 @@
+"""Reading ``hdl/common/perf_counters.sv`` from cocotb.
+
+``TELEMETRY`` names what ``perf_counters``' ``select_in`` picks for
+``value_out``, in order; top_level shows the same list on the seven segment
+display. :func:`read_telemetry` reads all of them at once straight from the
+instance, e.g. ``read_telemetry(dut.perf_counters_m)`` in a top_level
+simulation, without going through ``select_in``.
+"""
+
+# name: (signal, residency state or None)
+_SIGNALS = {
+    "camera_fps": ("camera_rate_out", None),
+    "hdmi_fps": ("hdmi_rate_out", None),
+    "led_refreshes": ("led_refresh_rate_out", None),
+    "led_underruns": ("led_underrun_rate_out", None),
+    "show_id_cycles": ("residency_out", 1),
+    "run_step_cycles": ("residency_out", 2),
+    "step_cycles": ("step_cycles_in", None),
+    "camera_wait_cycles": ("wait_cycles_in", None),
+    "camera_wait_frames": ("wait_frames_in", None),
+    "capture_frames": ("capture_frames_in", None),
+    "mismatches": ("mismatches_in", None),
+    "slots_used": ("slots_used_in", None),
+}
+TELEMETRY = tuple(_SIGNALS)
+RESIDENCY_WIDTH = 32
+
+
+def residency(handle):
+    """Cycles the ``perf_counters`` instance ``handle`` saw its ``state_in`` in every state, by state."""
+    packed = handle.residency_out.value.integer
+    return [(packed >> (RESIDENCY_WIDTH * state)) & ((1 << RESIDENCY_WIDTH) - 1) for state in range(4)]
+
+
+def read_telemetry(handle):
+    """Every ``TELEMETRY`` value of the ``perf_counters`` instance ``handle``, by name."""
+    states = residency(handle)
+    values = {}
+    for name, (signal, state) in _SIGNALS.items():
+        values[name] = states[state] if state is not None else getattr(handle, signal).value.integer
+    return values
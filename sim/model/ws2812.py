@@ -0,0 +1,214 @@
+"""WS2812B waveform decoding.
+
+Decodes the single-wire WS2812B protocol produced by ``hdl/driver/led_driver.sv``
+back into per-LED colors. Everything is done on run-length encoded NumPy arrays,
+so decoding is linear in the number of samples (or edges) instead of slicing
+Python lists bit by bit.
+
+Colors are returned in wire order, the same order ``led_driver`` shifts them
+out: ``[..., 0]`` is green, ``[..., 1]`` is red and ``[..., 2]`` is blue.
+"""
+
+from dataclasses import dataclass
+import math
+
+import numpy as np
+
+BITS_PER_LED = 24
+GREEN, RED, BLUE = 0, 1, 2
+
+
+class WS2812DecodeError(ValueError):
+    """Raised when a waveform does not follow the WS2812B timing rules."""
+
+
+def _cycles(duration_ns: float, clock_speed: int) -> int:
+    # SystemVerilog rounds real -> int conversions to the nearest integer
+    return int(math.floor(duration_ns / 1e9 * clock_speed + 0.5))
+
+
+@dataclass(frozen=True)
+class WS2812Timing:
+    """Nominal pulse widths (ns) and the tolerance applied when decoding."""
+
+    t0h: float = 400.0
+    t1h: float = 800.0
+    t0l: float = 850.0
+    t1l: float = 450.0
+    res: float = 55_000.0
+    tolerance: float = 150.0  # +-150ns per the datasheet
+    res_min: float = 50_000.0  # anything low for at least this long latches
+
+    @classmethod
+    def from_clock_speed(cls, clock_speed: int = 100_000_000, tolerance: float = 150.0):
+        """Timing actually produced by ``led_driver`` at ``CLOCK_SPEED``.
+
+        The driver quantizes every period to whole clock cycles, so the nominal
+        widths here are quantized the same way.
+        """
+        period = 1e9 / clock_speed
+        nominal = cls()
+        return cls(
+            t0h=_cycles(nominal.t0h, clock_speed) * period,
+            t1h=_cycles(nominal.t1h, clock_speed) * period,
+            t0l=_cycles(nominal.t0l, clock_speed) * period,
+            t1l=_cycles(nominal.t1l, clock_speed) * period,
+            res=_cycles(nominal.res, clock_speed) * period,
+            tolerance=tolerance,
+            res_min=nominal.res_min,
+        )
+
+    def within(self, duration, nominal):
+        return np.abs(duration - nominal) <= self.tolerance
+
+
+def run_lengths(samples):
+    """Run-length encode a 1D array of logic samples.
+
+    Returns ``(levels, lengths)``: the level of each run and how many samples
+    it lasted.
+    """
+    samples = np.asarray(samples).astype(bool).ravel()
+    if samples.size == 0:
+        return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(samples[1:] != samples[:-1]) + 1
+    starts = np.concatenate(([0], starts))
+    lengths = np.diff(np.concatenate((starts, [samples.size])))
+    return samples[starts], lengths
+
+
+def decode_samples(
+    samples,
+    num_leds: int,
+    clock_speed: int = 100_000_000,
+    sample_period_ns: float = None,
+    timing: WS2812Timing = None,
+    latch_at_end: bool = False,
+):
+    """Decode a sampled ``strand_out`` waveform.
+
+    ``samples`` holds one logic value per sample, taken every
+    ``sample_period_ns`` (one ``led_driver`` clock by default).
+
+    Returns an ``(N_frames, num_leds, 3)`` uint8 array with the colors latched
+    by every reset (see :func:`decode_runs`).
+    """
+    if sample_period_ns is None:
+        sample_period_ns = 1e9 / clock_speed
+    if timing is None:
+        timing = WS2812Timing.from_clock_speed(clock_speed)
+    levels, lengths = run_lengths(samples)
+    return decode_runs(levels, lengths * sample_period_ns, num_leds, timing, latch_at_end)
+
+
+def decode_edges(
+    edge_times_ns,
+    edge_levels,
+    num_leds: int,
+    end_time_ns: float = None,
+    clock_speed: int = 100_000_000,
+    timing: WS2812Timing = None,
+    latch_at_end: bool = False,
+):
+    """Decode a waveform given as edge timestamps.
+
+    ``edge_levels[i]`` is the level of the line right after the edge at
+    ``edge_times_ns[i]``. The last run is only known to last until
+    ``end_time_ns``; without it the last run is dropped.
+    """
+    if timing is None:
+        timing = WS2812Timing.from_clock_speed(clock_speed)
+    times = np.asarray(edge_times_ns, dtype=np.float64).ravel()
+    levels = np.asarray(edge_levels).astype(bool).ravel()
+    if end_time_ns is not None:
+        times = np.concatenate((times, [end_time_ns]))
+    else:
+        levels = levels[:-1]
+    return decode_runs(levels, np.diff(times), num_leds, timing, latch_at_end)
+
+
+def decode_bits(levels, durations, timing: WS2812Timing):
+    """Classify high/low run pairs into bits.
+
+    Returns ``(bits, latch)`` where ``latch[i]`` marks that bit ``i`` was
+    followed by a reset. A trailing bit whose low period runs off the end of
+    the capture is kept, with ``latch=False``.
+    """
+    levels = np.asarray(levels).astype(bool)
+    durations = np.asarray(durations, dtype=np.float64)
+
+    # bits always start on a rising edge, skip whatever came before the first one
+    first_high = np.argmax(levels) if levels.any() else levels.size
+    levels, durations = levels[first_high:], durations[first_high:]
+    if durations.size % 2:  # capture ended while high, the last bit is incomplete
+        levels, durations = levels[:-1], durations[:-1]
+    highs, lows = durations[0::2], durations[1::2]
+
+    is_zero = timing.within(highs, timing.t0h)
+    is_one = timing.within(highs, timing.t1h)
+    bad_high = ~(is_zero | is_one)
+    if bad_high.any():
+        i = int(np.flatnonzero(bad_high)[0])
+        raise WS2812DecodeError(f"bit {i}: high for {highs[i]:.0f}ns matches neither T0H nor T1H")
+    bits = is_one
+
+    latch = lows >= timing.res_min
+    low_ok = np.where(bits, timing.within(lows, timing.t1l), timing.within(lows, timing.t0l))
+    bad_low = ~(low_ok | latch)
+    # the last low period may just have been cut short by the end of the capture
+    if bad_low.size and bad_low[-1]:
+        bad_low[-1] = False
+    if bad_low.any():
+        i = int(np.flatnonzero(bad_low)[0])
+        raise WS2812DecodeError(
+            f"bit {i}: low for {lows[i]:.0f}ns is neither T{int(bits[i])}L nor a reset"
+        )
+    return bits, latch
+
+
+def decode_runs(levels, durations, num_leds: int, timing: WS2812Timing, latch_at_end: bool = False):
+    """Decode run-length encoded ``strand_out`` activity into latched frames.
+
+    Every reset latches one frame. Like a real daisy-chained strand, the first
+    24 bits after a reset go to LED 0, the next 24 to LED 1 and so on; bits past
+    the end of the strand are forwarded off the end and LEDs that receive
+    nothing keep their previous color (black before the first frame).
+
+    Bits after the last reset are only latched if ``latch_at_end`` is set.
+    Returns an ``(N_frames, num_leds, 3)`` uint8 array.
+    """
+    bits, latch = decode_bits(levels, durations, timing)
+    if latch_at_end and bits.size and not latch[-1]:
+        latch = latch.copy()
+        latch[-1] = True
+
+    # drop bits that were never latched
+    num_latched = int(np.flatnonzero(latch)[-1]) + 1 if latch.any() else 0
+    bits, latch = bits[:num_latched], latch[:num_latched]
+    num_frames = int(latch.sum())
+    frames = np.zeros((num_frames, num_leds, 3), dtype=np.uint8)
+    if num_frames == 0:
+        return frames
+
+    frame_of_bit = np.concatenate(([0], np.cumsum(latch)[:-1]))
+    frame_start = np.concatenate(([0], np.flatnonzero(latch)[:-1] + 1))
+    frame_bits = np.diff(np.concatenate((frame_start, [bits.size])))
+    partial = frame_bits % BITS_PER_LED != 0
+    if partial.any():
+        f = int(np.flatnonzero(partial)[0])
+        raise WS2812DecodeError(f"frame {f}: {frame_bits[f]} bits is not a whole number of LEDs")
+
+    position = np.arange(bits.size) - frame_start[frame_of_bit]
+    on_strand = position < num_leds * BITS_PER_LED
+    words = np.packbits(bits[on_strand].reshape(-1, 3, 8), axis=-1)[..., 0]
+    word_frame = frame_of_bit[on_strand][::BITS_PER_LED]
+    word_led = position[on_strand][::BITS_PER_LED] // BITS_PER_LED
+
+    # LEDs that did not receive a new color hold the previous one
+    latched_in = np.full((num_frames + 1, num_leds), 0, dtype=np.int64)
+    latched_in[word_frame + 1, word_led] = word_frame + 1
+    latched_in = np.maximum.accumulate(latched_in, axis=0)[1:]
+    history = np.zeros((num_frames + 1, num_leds, 3), dtype=np.uint8)
+    history[word_frame + 1, word_led] = words
+    frames[:] = history[latched_in, np.arange(num_leds)]
+    return frames
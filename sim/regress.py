@@ -0,0 +1,209 @@
+"""Run every testbench in ``sim/`` in parallel.
+
+Every ``test_*.py`` that defines a ``TESTBENCH`` is built and run in its own
+process and build directory. Results from all of them are merged into one
+JUnit file and a JSON summary with the wall time of every test, and the
+aggregate throughput is printed at the end.
+
+With ``--sweep`` every testbench is instead run in each of its production
+sized ``sweeps`` configurations (under Verilator unless ``--sim`` or ``$SIM``
+says otherwise) and the simulated clock cycles per second are recorded.
+
+    python sim/regress.py                  # everything, one job per core
+    python sim/regress.py -j 4 -k shift    # testbenches matching "shift"
+    SIM=verilator python sim/regress.py
+    python sim/regress.py --sweep          # production configurations
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+import importlib
+import json
+import os
+from pathlib import Path
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+SIM_PATH = Path(__file__).resolve().parent
+if str(SIM_PATH) not in sys.path:
+    sys.path.insert(0, str(SIM_PATH))
+
+
+def discover(pattern: str = None):
+    """Names of the test modules that define a ``TESTBENCH``, optionally filtered by ``pattern``."""
+    names = []
+    for path in sorted(SIM_PATH.glob("test_*.py")):
+        if pattern and not re.search(pattern, path.stem):
+            continue
+        if hasattr(importlib.import_module(path.stem), "TESTBENCH"):
+            names.append(path.stem)
+    return names
+
+
+def parse_results(results_xml: Path):
+    """Test cases of a cocotb JUnit file as dicts."""
+    cases = []
+    for case in ET.parse(results_xml).iter("testcase"):
+        failure = case.find("failure")
+        status = "failed" if failure is not None else "skipped" if case.find("skipped") is not None else "passed"
+        cases.append(
+            {
+                "name": case.get("name"),
+                "classname": case.get("classname"),
+                "status": status,
+                "wall_s": float(case.get("time", 0)),
+                "sim_time_ns": float(case.get("sim_time_ns", 0)),
+                "message": failure.get("message") if failure is not None else None,
+            }
+        )
+    return cases
+
+
+def run_one(name: str, sim: str, out_dir: Path, sweep: str = None):
+    """Build and run the testbench in ``name`` in its own build directory (runs in a worker)."""
+    testbench = importlib.import_module(name).TESTBENCH
+    build_dir = out_dir / (name if sweep is None else f"{name}.{sweep}")
+    build_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    error, cases = None, []
+    try:
+        # the runner echoes every command it runs, keep that with the other logs
+        with open(build_dir / "runner.log", "w") as log, redirect_stdout(log):
+            results_xml = testbench.run(sim=sim, build_dir=build_dir, log_dir=build_dir, sweep=sweep)
+        cases = parse_results(results_xml)
+    except (Exception, SystemExit) as e:  # the runner exits on compile errors and simulator crashes
+        error = f"{type(e).__name__}: {e}"
+    test_wall_s = sum(case["wall_s"] for case in cases)
+    sim_cycles = sum(case["sim_time_ns"] for case in cases) / testbench.clock_period_ns
+    return {
+        "testbench": name,
+        "sweep": sweep,
+        "toplevel": testbench.toplevel,
+        "parameters": {k: str(v) for k, v in testbench.sweep_parameters(sweep).items()},
+        "sim": sim,
+        "build_dir": str(build_dir),
+        "wall_s": time.perf_counter() - start,
+        "sim_cycles": sim_cycles,
+        # only the time spent in the tests, not building
+        "sim_cycles_per_s": sim_cycles / test_wall_s if test_wall_s else 0.0,
+        "error": error,
+        "tests": cases,
+    }
+
+
+def label(result):
+    return result["testbench"] if result["sweep"] is None else f"{result['testbench']}[{result['sweep']}]"
+
+
+def write_junit(results, path: Path):
+    """Merge the results into one JUnit file, one test suite per testbench."""
+    root = ET.Element("testsuites", name="regression")
+    for result in results:
+        suite = ET.SubElement(
+            root,
+            "testsuite",
+            name=label(result),
+            tests=str(len(result["tests"])),
+            time=f"{result['wall_s']:.3f}",
+        )
+        if result["error"]:
+            case = ET.SubElement(suite, "testcase", name="build", classname=label(result))
+            ET.SubElement(case, "error", message=result["error"])
+        for test in result["tests"]:
+            case = ET.SubElement(
+                suite,
+                "testcase",
+                name=test["name"],
+                classname=test["classname"],
+                time=f"{test['wall_s']:.3f}",
+                sim_time_ns=f"{test['sim_time_ns']:.0f}",
+            )
+            if test["status"] == "failed":
+                ET.SubElement(case, "failure", message=test["message"] or "")
+            elif test["status"] == "skipped":
+                ET.SubElement(case, "skipped")
+    ET.indent(root)
+    ET.ElementTree(root).write(path, encoding="unicode", xml_declaration=True)
+
+
+def summarize(results, elapsed_s: float):
+    tests = [test for result in results for test in result["tests"]]
+    busy_s = sum(result["wall_s"] for result in results)
+    sim_time_ns = sum(test["sim_time_ns"] for test in tests)
+    return {
+        "testbenches": len(results),
+        "errors": sum(bool(result["error"]) for result in results),
+        "tests": len(tests),
+        "failed": sum(test["status"] == "failed" for test in tests),
+        "elapsed_s": elapsed_s,
+        "busy_s": busy_s,  # sum of the testbench wall times, what a serial run would take
+        "speedup": busy_s / elapsed_s if elapsed_s else 0.0,
+        "tests_per_minute": 60 * len(tests) / elapsed_s if elapsed_s else 0.0,
+        "sim_ns_per_s": sim_time_ns / elapsed_s if elapsed_s else 0.0,
+        "sim_cycles_per_s": sum(result["sim_cycles"] for result in results) / elapsed_s if elapsed_s else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="parallel testbenches")
+    parser.add_argument("-k", dest="pattern", help="only run testbenches whose module name matches this regex")
+    parser.add_argument("--sim", default=os.getenv("SIM"), help="simulator (default: $SIM, or icarus, verilator with --sweep)")
+    parser.add_argument("--sweep", action="store_true", help="run the production sized sweep configurations instead")
+    parser.add_argument("--out", type=Path, default=Path("sim_build") / "regress", help="output directory")
+    args = parser.parse_args(argv)
+
+    names = discover(args.pattern)
+    if args.sweep:
+        sim = args.sim or "verilator"
+        jobs = [
+            (name, sweep) for name in names for sweep in importlib.import_module(name).TESTBENCH.sweeps
+        ]
+    else:
+        sim = args.sim or "icarus"
+        jobs = [(name, None) for name in names]
+    if not jobs:
+        parser.error("no testbenches found")
+    out_dir = args.out.resolve()
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"Running {len(jobs)} testbenches with {sim}, {args.jobs} at a time")
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(run_one, name, sim, out_dir, sweep) for name, sweep in jobs]
+        for job in as_completed(futures):
+            result = job.result()
+            results.append(result)
+            failed = sum(test["status"] == "failed" for test in result["tests"])
+            status = "ERROR" if result["error"] else "FAIL" if failed else "PASS"
+            print(
+                f"{status:5} {label(result):48} {len(result['tests']):3} tests "
+                f"{failed:3} failed {result['wall_s']:8.1f}s {result['sim_cycles_per_s'] / 1e3:9.1f}k cycles/s"
+            )
+            if result["error"]:
+                print(f"      {result['error']} (see {result['build_dir']})")
+    elapsed_s = time.perf_counter() - start
+
+    results.sort(key=label)
+    summary = summarize(results, elapsed_s)
+    write_junit(results, out_dir / "results.xml")
+    with open(out_dir / "results.json", "w") as f:
+        json.dump({"summary": summary, "testbenches": results}, f, indent=2)
+
+    print(
+        f"{summary['tests']} tests in {summary['testbenches']} testbenches, "
+        f"{summary['failed']} failed, {summary['errors']} errors\n"
+        f"{elapsed_s:.1f}s elapsed, {summary['busy_s']:.1f}s serial ({summary['speedup']:.1f}x), "
+        f"{summary['tests_per_minute']:.1f} tests/min, {summary['sim_ns_per_s'] / 1e6:.2f} ms simulated/s, "
+        f"{summary['sim_cycles_per_s'] / 1e3:.1f}k cycles/s\n"
+        f"Results in {out_dir / 'results.xml'} and {out_dir / 'results.json'}"
+    )
+    return 1 if summary["failed"] or summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+`timescale 1ns / 1ps
+`include "hdmi/video_sig_gen.sv"
+`include "calibration/calibration_step_fsm.sv"
+`default_nettype none
+
+// Simulation only wrapper around calibration_step_fsm.
+// The pixel clock and video_sig_gen's raster are generated here, detect_0/detect_1 come either from a
+// per-frame mask file ({MASK_PREFIX}{mask_index}.mem, one hex digit per active
+// pixel: {detect_1, detect_0}, loaded on mask_load) or from the detect_*_in
+// registers, so a testbench only has to wake up on new_frame.
+// Raising readback for a frame reads the ID of every block back through
+// the read port and writes the whole table to TABLE_FILE when the frame ends.
+module calibration_step_fsm_tb #(
+    parameter real CLK_PERIOD_NS = 10,
+    parameter int NUM_LEDS = 50,
+    parameter int LED_ADDRESS_WIDTH = $clog2(NUM_LEDS),
+    parameter int WAIT_CYCLES = 5_000_000,
+    parameter int ADAPTIVE_SETTLE = 0,
+    parameter int SETTLE_FRAMES = 2,
+    parameter int DOWNSAMPLE_SHIFT = 2,
+    parameter int TABLE_SLOTS = 0,
+    parameter int VOTE_FRAMES = 1,
+    parameter int BLOCK_AGREE = 0,
+    parameter int REPAIR = 1,
+    parameter int ACTIVE_H_PIXELS = 1280,
+    parameter int H_FRONT_PORCH = 110,
+    parameter int H_SYNC_WIDTH = 40,
+    parameter int H_BACK_PORCH = 220,
+    parameter int ACTIVE_LINES = 720,
+    parameter int V_FRONT_PORCH = 5,
+    parameter int V_SYNC_WIDTH = 5,
+    parameter int V_BACK_PORCH = 20,
+    parameter MASK_PREFIX = "mask_",
+    parameter TABLE_FILE = "id_table.mem",
+    localparam int NUM_PIXELS = ACTIVE_H_PIXELS * ACTIVE_LINES,
+    localparam int NUM_BLOCKS = (ACTIVE_H_PIXELS >> DOWNSAMPLE_SHIFT) * (ACTIVE_LINES >> DOWNSAMPLE_SHIFT),
+    localparam int READ_LATENCY = TABLE_SLOTS ? 5 : 2  // calibration_step_fsm's table read latency
+) (
+    output logic clk_pixel,
+    input wire rst,
+    input wire start_calibration_step,
+    input wire should_overwrite_latch,
+    input wire verify_in,
+    input wire repair_in,
+
+    // Detect inputs
+    input wire mask_enable,  // 1: detects from the loaded mask, 0: from detect_*_in
+    input wire mask_load,
+    input wire [7:0] mask_index,
+    input wire detect_0_in,
+    input wire detect_1_in,
+
+    // Table read back
+    input wire readback,
+    output logic readback_done,
+
+    output logic new_frame,
+    output logic [31:0] frame_count,
+    output calibration_step_state_t state,
+    output logic should_overwrite,
+    output logic [$clog2(WAIT_CYCLES)-1:0] settle_cycles,
+    output logic [7:0] settle_frames,
+    output logic [15:0] slots_used,
+    output logic [15:0] mismatches,
+    output logic [7:0] capture_frames,
+    output logic [31:0] step_cycles
+);
+
+    // a cocotb Clock would wake Python up on every edge
+    initial clk_pixel = 0;
+    always #(CLK_PERIOD_NS / 2) clk_pixel = !clk_pixel;
+
+    logic [10:0] hcount;
+    logic [9:0] vcount;
+    logic active_draw;
+
+    video_sig_gen #(
+        .ACTIVE_H_PIXELS(ACTIVE_H_PIXELS),
+        .H_FRONT_PORCH(H_FRONT_PORCH),
+        .H_SYNC_WIDTH(H_SYNC_WIDTH),
+        .H_BACK_PORCH(H_BACK_PORCH),
+        .ACTIVE_LINES(ACTIVE_LINES),
+        .V_FRONT_PORCH(V_FRONT_PORCH),
+        .V_SYNC_WIDTH(V_SYNC_WIDTH),
+        .V_BACK_PORCH(V_BACK_PORCH)
+    ) video_sig_gen_m (
+        .pixel_clk_in(clk_pixel),
+        .rst_in(rst),
+        .hcount_out(hcount),
+        .vcount_out(vcount),
+        .hs_out(),
+        .vs_out(),
+        .ad_out(active_draw),
+        .nf_out(new_frame),
+        .fc_out()
+    );
+
+    // Detect masks
+    logic [1:0] masks[NUM_PIXELS];
+    always_ff @(posedge clk_pixel) begin
+        if (mask_load) begin
+            $readmemh($sformatf("%s%0d.mem", MASK_PREFIX, mask_index), masks);
+        end
+    end
+
+    wire [1:0] mask_pixel = active_draw ? masks[vcount*ACTIVE_H_PIXELS+hcount] : 2'b00;
+    wire detect_0 = mask_enable ? mask_pixel[0] : detect_0_in;
+    wire detect_1 = mask_enable ? mask_pixel[1] : detect_1_in;
+
+    // Read back
+    logic reading;
+    logic [LED_ADDRESS_WIDTH-1:0] read_out;
+    logic [LED_ADDRESS_WIDTH-1:0] id_table[NUM_BLOCKS];
+    logic [$clog2(NUM_BLOCKS)-1:0] block_pipe[READ_LATENCY];
+    logic block_valid_pipe[READ_LATENCY];
+    wire top_left = ((hcount % (1 << DOWNSAMPLE_SHIFT)) == 0) && ((vcount % (1 << DOWNSAMPLE_SHIFT)) == 0);
+
+    always_ff @(posedge clk_pixel) begin
+        readback_done <= 0;
+        if (rst) begin
+            reading <= 0;
+            frame_count <= 0;
+            for (int i = 0; i < READ_LATENCY; i++) begin
+                block_valid_pipe[i] <= 0;
+            end
+        end else begin
+            if (new_frame) begin
+                frame_count <= frame_count + 1;
+                reading <= readback;
+                if (reading) begin
+                    $writememh(TABLE_FILE, id_table);
+                    readback_done <= 1;
+                end
+            end
+
+            block_pipe[0] <= (hcount >> DOWNSAMPLE_SHIFT) + (ACTIVE_H_PIXELS >> DOWNSAMPLE_SHIFT) * (vcount >> DOWNSAMPLE_SHIFT);
+            block_valid_pipe[0] <= reading && active_draw && top_left;
+            for (int i = 1; i < READ_LATENCY; i++) begin
+                block_pipe[i] <= block_pipe[i-1];
+                block_valid_pipe[i] <= block_valid_pipe[i-1];
+            end
+            if (block_valid_pipe[READ_LATENCY-1]) begin
+                id_table[block_pipe[READ_LATENCY-1]] <= read_out;
+            end
+        end
+    end
+
+    calibration_step_fsm #(
+        .NUM_LEDS(NUM_LEDS),
+        .LED_ADDRESS_WIDTH(LED_ADDRESS_WIDTH),
+        .WAIT_CYCLES(WAIT_CYCLES),
+        .ADAPTIVE_SETTLE(ADAPTIVE_SETTLE),
+        .SETTLE_FRAMES(SETTLE_FRAMES),
+        .ACTIVE_H_PIXELS(ACTIVE_H_PIXELS),
+        .ACTIVE_LINES(ACTIVE_LINES),
+        .DOWNSAMPLE_SHIFT(DOWNSAMPLE_SHIFT),
+        .TABLE_SLOTS(TABLE_SLOTS),
+        .VOTE_FRAMES(VOTE_FRAMES),
+        .BLOCK_AGREE(BLOCK_AGREE),
+        .REPAIR(REPAIR)
+    ) calibration_step_fsm_m (
+        .clk_pixel(clk_pixel),
+        .rst(rst),
+        .start_calibration_step(start_calibration_step),
+        .read_request(reading && active_draw),
+        .should_overwrite_latch(should_overwrite_latch),
+        .verify_in(verify_in),
+        .repair_in(repair_in),
+        .should_overwrite(should_overwrite),
+        .hcount_in(hcount),
+        .vcount_in(vcount),
+        .new_frame_in(new_frame),
+        .detect_0(detect_0),
+        .detect_1(detect_1),
+        .state(state),
+        .read_out(read_out),
+        .wait_counter(),
+        .settle_cycles(settle_cycles),
+        .settle_frames(settle_frames),
+        .slots_used(slots_used),
+        .mismatches(mismatches),
+        .capture_frames(capture_frames),
+        .step_cycles(step_cycles)
+    );
+
+endmodule
+`default_nettype wire
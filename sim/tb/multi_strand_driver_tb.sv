@@ -0,0 +1,68 @@
+`timescale 1ns / 1ps
+`include "driver/led_color_prefetch.sv"
+`include "driver/multi_strand_driver.sv"
+`default_nettype none
+
+// Simulation only wrapper: led_color_prefetch feeding multi_strand_driver, wired like top_level.
+// The testbench plays the color source on next_led_request / {green,red,blue}_in / color_valid.
+module multi_strand_driver_tb #(
+    parameter int NUM_LEDS = 10,
+    parameter int NUM_STRANDS = 4,
+    parameter int COLOR_WIDTH = 8,
+    parameter int DEPTH = 4,
+    localparam int CounterWidth = $clog2(NUM_LEDS)
+) (
+    input wire clk_in,
+    input wire rst_in,
+    input wire force_reset,
+    output logic [CounterWidth-1:0] next_led_request,
+    input wire [COLOR_WIDTH-1:0] green_in,
+    input wire [COLOR_WIDTH-1:0] red_in,
+    input wire [COLOR_WIDTH-1:0] blue_in,
+    input wire color_valid,
+    output logic [NUM_STRANDS-1:0] strand_out,
+    output logic [15:0] underrun_count
+);
+
+    logic [NUM_STRANDS*3*COLOR_WIDTH-1:0] words;
+    logic words_valid, words_ready, flush;
+
+    led_color_prefetch #(
+        .NUM_LEDS(NUM_LEDS),
+        .NUM_STRANDS(NUM_STRANDS),
+        .COLOR_WIDTH(COLOR_WIDTH),
+        .DEPTH(DEPTH)
+    ) prefetch (
+        .rst_in(rst_in),
+        .clk_in(clk_in),
+        .flush_in(flush),
+        .next_led_request(next_led_request),
+        .request_valid(),
+        .green_in(green_in),
+        .red_in(red_in),
+        .blue_in(blue_in),
+        .color_valid(color_valid),
+        .words_out(words),
+        .words_valid_out(words_valid),
+        .words_ready_in(words_ready)
+    );
+
+    multi_strand_driver #(
+        .NUM_LEDS(NUM_LEDS),
+        .NUM_STRANDS(NUM_STRANDS),
+        .COLOR_WIDTH(COLOR_WIDTH)
+    ) driver (
+        .rst_in(rst_in),
+        .clk_in(clk_in),
+        .force_reset(force_reset),
+        .words_in(words),
+        .words_valid_in(words_valid),
+        .words_ready_out(words_ready),
+        .flush_out(flush),
+        .strand_out(strand_out),
+        .underrun_count(underrun_count)
+    );
+
+endmodule
+
+`default_nettype wire
@@ -0,0 +1,123 @@
+`timescale 1ns / 1ps
+`include "pixel/fb_pixel_convert.sv"
+`include "pixel/threshold.sv"
+`include "common/synchronizer.sv"
+`default_nettype none
+
+// Simulation only wrapper around the camera pixel path: fb_pixel_convert and
+// the two thresholds, wired the way top_level does (Cr -> detect0, Cb -> detect1).
+// On start it loads num_pixels words {valid, rgb565} from PIXEL_FILE, one per
+// cycle, and captures every pixel's {red, green, blue, y, cr, cb, detect1,
+// detect0} once it is through. The whole frame is written to RESULT_FILE
+// before done is pulsed, so a testbench only wakes up once per frame.
+module pixel_path_tb #(
+    parameter real CLK_PERIOD_NS = 10,
+    parameter int MAX_PIXELS = 1280 * 720,
+    parameter PIXEL_FILE = "pixels.mem",
+    parameter RESULT_FILE = "results.mem",
+    localparam int RGB_LATENCY = 1,
+    localparam int YCRCB_LATENCY = 4,
+    localparam int LATENCY = YCRCB_LATENCY + 1  // threshold registers its mask
+) (
+    output logic clk_in,
+    input wire rst_in,
+    input wire start,
+    input wire [31:0] num_pixels,
+    input wire [7:0] lower_bound,
+    input wire [7:0] upper_bound,
+    output logic done
+);
+
+    // a cocotb Clock would wake Python up on every edge
+    initial clk_in = 0;
+    always #(CLK_PERIOD_NS / 2) clk_in = !clk_in;
+
+    logic [16:0] pixels[MAX_PIXELS];
+    logic [49:0] results[MAX_PIXELS];
+    logic running;
+    logic [31:0] cycle;
+
+    wire [16:0] pixel = (running && cycle < num_pixels) ? pixels[cycle] : '0;
+
+    logic [7:0] red, green, blue;
+    logic [7:0] y, cr, cb;
+    logic detect0, detect1;
+
+    fb_pixel_convert fb_pixel_convert_m (
+        .clk_in(clk_in),
+        .pixel_in(pixel[15:0]),
+        .valid_in(pixel[16]),
+        .red_out(red),
+        .green_out(green),
+        .blue_out(blue),
+        .y_out(y),
+        .cr_out(cr),
+        .cb_out(cb)
+    );
+
+    threshold mt_blue (
+        .clk_in(clk_in),
+        .rst_in(rst_in),
+        .pixel_in(cb),
+        .lower_bound_in(lower_bound),
+        .upper_bound_in(upper_bound),
+        .mask_out(detect1)
+    );
+    threshold mt_red (
+        .clk_in(clk_in),
+        .rst_in(rst_in),
+        .pixel_in(cr),
+        .lower_bound_in(lower_bound),
+        .upper_bound_in(upper_bound),
+        .mask_out(detect0)
+    );
+
+    // line everything up with the masks
+    logic [7:0] red_d, green_d, blue_d;
+    logic [7:0] y_d, cr_d, cb_d;
+    synchronizer #(
+        .DEPTH(LATENCY - RGB_LATENCY),
+        .WIDTH(3 * 8)
+    ) rgb_delay (
+        .clk_in  (clk_in),
+        .rst_in  (rst_in),
+        .data_in ({red, green, blue}),
+        .data_out({red_d, green_d, blue_d})
+    );
+    synchronizer #(
+        .DEPTH(LATENCY - YCRCB_LATENCY),
+        .WIDTH(3 * 8)
+    ) ycrcb_delay (
+        .clk_in  (clk_in),
+        .rst_in  (rst_in),
+        .data_in ({y, cr, cb}),
+        .data_out({y_d, cr_d, cb_d})
+    );
+
+    always_ff @(posedge clk_in) begin
+        done <= 0;
+        if (rst_in) begin
+            running <= 0;
+            cycle <= 0;
+        end else if (!running) begin
+            if (start) begin
+                $readmemh(PIXEL_FILE, pixels, 0, num_pixels - 1);
+                running <= 1;
+                cycle <= 0;
+            end
+        end else begin
+            cycle <= cycle + 1;
+            if (cycle >= LATENCY) begin
+                results[cycle-LATENCY] <= {red_d, green_d, blue_d, y_d, cr_d, cb_d, detect1, detect0};
+            end
+            // one more cycle so the last pixel is in before the file is written
+            if (cycle == num_pixels + LATENCY) begin
+                $writememh(RESULT_FILE, results, 0, num_pixels - 1);
+                running <= 0;
+                done <= 1;
+            end
+        end
+    end
+
+endmodule
+`default_nettype wire
@@ -0,0 +1,97 @@
+`timescale 1ns / 1ps
+`include "mem/shift_accum_ram.sv"
+`default_nettype none
+
+// Simulation only wrapper around shift_accum_ram for long random runs.
+// On start it loads num_cycles request words from REQUEST_FILE, one per cycle:
+// {valid, request_type[1:0], summand[SUMMAND_WIDTH-1:0], addr}, and plays them back-to-back.
+// Every request's outputs {result_valid, request_type, summand, addr,
+// read_out, sum_out} are captured LATENCY cycles later and the whole batch is
+// written to RESULT_FILE before done is pulsed, so a testbench only wakes up
+// once per batch.
+module shift_accum_ram_tb #(
+    parameter real CLK_PERIOD_NS = 10,
+    parameter int WIDTH = 10,
+    parameter int DEPTH = 32,
+    parameter int SUMMAND_WIDTH = 1,
+    parameter int MAX_CYCLES = 1 << 20,
+    parameter REQUEST_FILE = "requests.mem",
+    parameter RESULT_FILE = "results.mem",
+    localparam int ADDR_WIDTH = $clog2(DEPTH),
+    localparam int REQUEST_WIDTH = 1 + 2 + SUMMAND_WIDTH + ADDR_WIDTH,
+    localparam int RESULT_WIDTH = 1 + 2 + SUMMAND_WIDTH + ADDR_WIDTH + 2 * WIDTH,
+    localparam int LATENCY = 2  // shift_accum_ram's synchronizers and read latency
+) (
+    output logic clk_in,
+    input wire rst_in,
+    input wire start,
+    input wire [31:0] num_cycles,
+    output logic done
+);
+
+    // a cocotb Clock would wake Python up on every edge
+    initial clk_in = 0;
+    always #(CLK_PERIOD_NS / 2) clk_in = !clk_in;
+
+    logic [REQUEST_WIDTH-1:0] requests[MAX_CYCLES];
+    logic [RESULT_WIDTH-1:0] results[MAX_CYCLES];
+    logic running;
+    logic [31:0] cycle;
+
+    wire [REQUEST_WIDTH-1:0] request = (running && cycle < num_cycles) ? requests[cycle] : '0;
+
+    logic [WIDTH-1:0] read_out;
+    logic [SUMMAND_WIDTH-1:0] summand_out;
+    logic [WIDTH-1:0] sum_out;
+    logic [ADDR_WIDTH-1:0] addr_out;
+    accum_request_t request_type_out;
+    logic result_valid_out;
+
+    shift_accum_ram #(
+        .WIDTH(WIDTH),
+        .DEPTH(DEPTH),
+        .SUMMAND_WIDTH(SUMMAND_WIDTH)
+    ) shift_accum_ram_m (
+        .clk_in(clk_in),
+        .rst_in(rst_in),
+        .addr_in(request[ADDR_WIDTH-1:0]),
+        .summand_in(request[ADDR_WIDTH+:SUMMAND_WIDTH]),
+        .request_type_in(accum_request_t'(request[ADDR_WIDTH+SUMMAND_WIDTH+:2])),
+        .request_valid_in(request[REQUEST_WIDTH-1]),
+        .read_out(read_out),
+        .summand_out(summand_out),
+        .sum_out(sum_out),
+        .addr_out(addr_out),
+        .request_type_out(request_type_out),
+        .result_valid_out(result_valid_out)
+    );
+
+    always_ff @(posedge clk_in) begin
+        done <= 0;
+        if (rst_in) begin
+            running <= 0;
+            cycle <= 0;
+        end else if (!running) begin
+            if (start) begin
+                $readmemh(REQUEST_FILE, requests, 0, num_cycles - 1);
+                running <= 1;
+                cycle <= 0;
+            end
+        end else begin
+            cycle <= cycle + 1;
+            if (cycle >= LATENCY) begin
+                results[cycle-LATENCY] <= {
+                    result_valid_out, request_type_out, summand_out, addr_out, read_out, sum_out
+                };
+            end
+            // one more cycle so the last result is in before the file is written
+            if (cycle == num_cycles + LATENCY) begin
+                $writememh(RESULT_FILE, results, 0, num_cycles - 1);
+                running <= 0;
+                done <= 1;
+            end
+        end
+    end
+
+endmodule
+`default_nettype wire
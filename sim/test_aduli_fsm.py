@@ -1,35 +1,36 @@
-import os
-import sys
 import math
-from pathlib import Path
-import typing
-from collections import deque
 
 import cocotb
-from cocotb.clock import Clock
-from cocotb.runner import get_runner
 from cocotb.triggers import ClockCycles, FallingEdge, RisingEdge
 
-NUM_LEDS = 50
+from model.fixtures import reset, start_clock
+from model.runner import Testbench, parameter
+
+NUM_LEDS = parameter("NUM_LEDS", 50)
+BITS_PER_STEP = parameter("BITS_PER_STEP", 1)
+LED_ADDRESS_WIDTH = math.ceil(math.log2(NUM_LEDS))
+NUM_STEPS = -(-LED_ADDRESS_WIDTH // BITS_PER_STEP)
 
 
 @cocotb.test()
 async def test_a(dut):
     """Test for driving first pixel a correct color"""
     dut._log.info("Starting...")
-    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
+    start_clock(dut.clk_in)
 
     await ClockCycles(dut.clk_in, 2)  # check the pre-reset behavior
 
     dut.start_in.value = 0
+    dut.recalibrate_in.value = 0
+    dut.verify_failed_in.value = 0
     dut.led_display_valid_in.value = 0
-    dut.calibration_state_in.value = 0
+    dut.proceed_in.value = 0
+    # calibration_step_fsm sits in IDLE until it is started
+    dut.calibration_step_going_in.value = 0
+    dut.calibration_step_ready_in.value = 1
 
     # Reset
-    dut.rst_in.value = 1
-    await ClockCycles(dut.clk_in, 1)
-    await FallingEdge(dut.clk_in)
-    dut.rst_in.value = 0
+    await reset(dut.clk_in, dut.rst_in, cycles=1)
 
     await ClockCycles(dut.clk_in, 2)
 
@@ -38,7 +39,7 @@ async def test_a(dut):
     dut.start_in.value = 0
     await FallingEdge(dut.clk_in)
 
-    for sel_bit in range(math.ceil(math.log2(NUM_LEDS))):
+    for sel_bit in range(NUM_STEPS):
         assert dut.led_addr_bit_sel_start_out.value == 1, "Selected bit should be valid"
         for i in range(10):
             assert dut.state.value == 1, "Should be in LED display calibration state"
@@ -59,7 +60,9 @@ async def test_a(dut):
 
         await ClockCycles(dut.clk_in, 10)  # pretend it took forever to respond
 
-        dut.calibration_state_in.value = 1  # anything but 0
+        # the calibration step is running
+        dut.calibration_step_going_in.value = 1
+        dut.calibration_step_ready_in.value = 0
 
         for i in range(10):
             assert dut.state.value == 2, "Should be in calib display state"
@@ -70,43 +73,84 @@ async def test_a(dut):
             ), "Should be done starting calibration"
             assert dut.calibration_first_out.value == 0, "First should be low"
 
-        dut.calibration_state_in.value = 0  # we're back at IDLE
+        # we're back at IDLE
+        dut.calibration_step_going_in.value = 0
+        dut.calibration_step_ready_in.value = 1
         await ClockCycles(dut.clk_in, 1)
         await FallingEdge(dut.clk_in)
 
     assert dut.state.value == 0, "Should be back in IDLE state"
 
 
+async def run_step(dut, failed=False):
+    """id_shower shows the step, calibration_step_fsm runs it, ``failed`` is its verify_failed_in"""
+    dut.led_display_valid_in.value = 1
+    await ClockCycles(dut.clk_in, 1)
+    dut.led_display_valid_in.value = 0
+    await ClockCycles(dut.clk_in, 5)
+    dut.calibration_step_going_in.value = 1
+    dut.calibration_step_ready_in.value = 0
+    await ClockCycles(dut.clk_in, 5)
+    dut.calibration_step_going_in.value = 0
+    dut.calibration_step_ready_in.value = 1
+    dut.verify_failed_in.value = int(failed)
+    await ClockCycles(dut.clk_in, 1)
+    await FallingEdge(dut.clk_in)
+    dut.verify_failed_in.value = 0
+
+
+@cocotb.test()
+async def test_recalibrate(dut):
+    """Two verification steps, and a repair pass over the remaining steps only if one of them failed"""
+    start_clock(dut.clk_in)
+    for name in ("start_in", "recalibrate_in", "verify_failed_in", "led_display_valid_in", "proceed_in",
+                 "calibration_step_going_in"):
+        getattr(dut, name).value = 0
+    dut.calibration_step_ready_in.value = 1
+    await reset(dut.clk_in, dut.rst_in, cycles=1)
+
+    for failed_step in (None, 1):
+        await FallingEdge(dut.clk_in)
+        dut.recalibrate_in.value = 1
+        await FallingEdge(dut.clk_in)
+        dut.recalibrate_in.value = 0
+
+        for step in range(2):
+            assert dut.state.value == 1, "Should be showing a verification pattern"
+            assert dut.verify_out.value == 1 and dut.repair_out.value == 0
+            assert dut.led_addr_bit_sel_out.value == step, "Should be showing the next pattern"
+            assert dut.calibration_first_out.value == (step == 0), "First should clear the old flags"
+            await run_step(dut, failed=step == failed_step)
+
+        if failed_step is None:
+            assert dut.state.value == 0, "A clean verification goes straight back to displaying"
+            continue
+        for step in range(2, NUM_STEPS):
+            assert dut.state.value == 1, "Should be repairing"
+            assert dut.verify_out.value == 0 and dut.repair_out.value == 1
+            assert dut.led_addr_bit_sel_out.value == step, "Should be selecting correct bit"
+            assert dut.calibration_first_out.value == 0, "The verification steps already started over"
+            await run_step(dut)
+        assert dut.state.value == 0, "Should be back in IDLE state"
+
+
+TESTBENCH = Testbench(
+    toplevel="aduli_fsm",
+    sources=["aduli_fsm.sv"],
+    parameters={
+        "NUM_LEDS": NUM_LEDS,
+        "BITS_PER_STEP": BITS_PER_STEP,
+    },
+    sweeps={
+        "leds_1024": {"NUM_LEDS": 1024},
+        "symbols": {"NUM_LEDS": 1024, "BITS_PER_STEP": 3},
+    },
+)
+
+
 def is_runner():
     """Moving pixel tester"""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    sim = os.getenv("SIM", "icarus")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "aduli_fsm.sv"]
-    build_test_args = ["-Wall"]
-    parameters = {
-        "NUM_LEDS": NUM_LEDS,
-    }
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="aduli_fsm",
-        includes=[proj_path / "hdl"],
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale=("1ns", "1ps"),
-        waves=True,
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="aduli_fsm",
-        test_module="test_aduli_fsm",
-        test_args=run_test_args,
-        waves=True,
-    )
+    TESTBENCH.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,116 @@
+import cocotb
+from cocotb.triggers import ClockCycles, FallingEdge
+import numpy as np
+
+from model.fixtures import clock_and_reset
+from model.handles import SignalCache
+from model.pixel_path import AUTO_MARGIN, AUTO_PERCENTILE, auto_threshold
+from model.runner import Testbench, parameter
+
+ACTIVE_H = 48
+ACTIVE_V = 12
+H_BLANK = 4
+NUM_PIXELS = parameter("NUM_PIXELS", ACTIVE_H * ACTIVE_V)
+INIT_THRESHOLD = 0x80
+SCAN_CYCLES = 258
+
+
+async def setup(dut):
+    dut._log.info("Starting...")
+    for name in ("pixel_in", "valid_in", "new_frame_in"):
+        getattr(dut, name).value = 0
+    dut.percentile_in.value = AUTO_PERCENTILE
+    dut.margin_in.value = AUTO_MARGIN
+    await clock_and_reset(dut.clk_in, dut.rst_in)
+    return SignalCache(dut)
+
+
+def random_frame(rng, background, spread, lit):
+    """A gray ``background`` with a ``lit`` share of bright pixels, in runs like the upscaled camera frame"""
+    runs = []
+    while sum(len(run) for run in runs) < ACTIVE_H * ACTIVE_V:
+        value = 0xE0 if rng.random() < lit else background + rng.integers(-spread, spread + 1)
+        runs.append(np.full(rng.integers(1, 7), value))
+    return np.clip(np.concatenate(runs)[: ACTIVE_H * ACTIVE_V], 0, 0xFF).reshape(ACTIVE_V, ACTIVE_H)
+
+
+async def play_frame(sig, frame, valid=None):
+    """Stream ``frame`` line by line, valid_in a cycle behind pixel_in, then pulse new_frame_in and wait out the scan"""
+    falling = FallingEdge(sig.clk_in)
+    if valid is None:
+        valid = np.ones_like(frame, dtype=bool)
+    stream = []
+    for line, line_valid in zip(frame, valid):
+        stream += list(zip(line, line_valid)) + [(0xFF, False)] * H_BLANK
+    previous = False
+    for pixel, pixel_valid in stream:
+        sig.pixel_in.value = int(pixel)
+        sig.valid_in.value = int(previous)
+        previous = pixel_valid
+        await falling
+    sig.valid_in.value = 0
+    await ClockCycles(sig.clk_in, 3)
+    await falling
+    sig.new_frame_in.value = 1
+    await falling
+    sig.new_frame_in.value = 0
+    await ClockCycles(sig.clk_in, SCAN_CYCLES + 2)
+    await falling
+    return sig.level_out.value.integer, sig.threshold_out.value.integer
+
+
+@cocotb.test()
+async def test_threshold(dut):
+    """Every whole frame's quantile plus the margin, clamped at 0xFF"""
+    sig = await setup(dut)
+    rng = np.random.default_rng(1)
+    # the frame running at reset isn't counted
+    frame = random_frame(rng, 0x90, 4, 0.1)
+    assert await play_frame(sig, frame) == (0, INIT_THRESHOLD)
+
+    settings = [(AUTO_PERCENTILE, AUTO_MARGIN), (0x80, 0x00), (0xF8, 0x30), (0x00, 0xFF), (0xFF, 0x08)]
+    for frame_num, (percentile, margin) in enumerate(settings):
+        sig.percentile_in.value = percentile
+        sig.margin_in.value = margin
+        frame = random_frame(rng, int(rng.integers(0x70, 0xA0)), int(rng.integers(0, 12)), 0.05)
+        result = await play_frame(sig, frame)
+        assert result == auto_threshold(frame, percentile, margin), f"frame {frame_num}: {result}"
+
+
+@cocotb.test()
+async def test_masked(dut):
+    """Only valid pixels count, the histogram starts over every frame and an empty frame keeps the threshold"""
+    sig = await setup(dut)
+    rng = np.random.default_rng(2)
+    await play_frame(sig, random_frame(rng, 0x80, 0, 0))
+
+    for frame_num in range(3):
+        frame = random_frame(rng, int(rng.integers(0x60, 0xB0)), 8, 0.2)
+        valid = rng.random(frame.shape) < 0.7
+        result = await play_frame(sig, frame, valid)
+        assert result == auto_threshold(frame[valid]), f"frame {frame_num}: {result}"
+
+    empty = await play_frame(sig, frame, np.zeros_like(frame, dtype=bool))
+    assert empty == result
+
+
+TESTBENCH = Testbench(
+    toplevel="auto_threshold",
+    sources=["pixel/auto_threshold.sv"],
+    parameters={
+        "NUM_PIXELS": NUM_PIXELS,
+    },
+    sweeps={
+        # top_level's frame, a count width the test frames don't fill
+        "hdmi_frame": {"NUM_PIXELS": 1280 * 720},
+    },
+)
+
+
+def is_runner():
+    """Frame quantile threshold"""
+    TESTBENCH.run()
+
+
+if __name__ == "__main__":
+    is_runner()
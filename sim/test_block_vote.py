@@ -0,0 +1,117 @@
+import cocotb
+from cocotb.triggers import FallingEdge, ReadOnly
+import numpy as np
+
+from model.fixtures import clock_and_reset
+from model.handles import SignalCache
+from model.runner import Testbench, parameter
+
+SHIFT = parameter("SHIFT", 2)
+SYMBOL_WIDTH = parameter("SYMBOL_WIDTH", 1)
+AGREE = parameter("AGREE", 9)
+ACTIVE_H = parameter("ACTIVE_H_PIXELS", 32)
+ACTIVE_V = 16
+H_BLANK = 3
+BLOCK = 1 << SHIFT
+BLOCKS = (ACTIVE_V // BLOCK, ACTIVE_H // BLOCK)
+
+
+async def setup(dut):
+    dut._log.info("Starting...")
+    for name in ("hcount_in", "vcount_in", "active_in", "symbol_in", "valid_in"):
+        getattr(dut, name).value = 0
+    await clock_and_reset(dut.clk_in, dut.rst_in)
+    return SignalCache(dut)
+
+
+def upscale(blocks):
+    return np.repeat(np.repeat(blocks, BLOCK, axis=0), BLOCK, axis=1)
+
+
+def random_frame(rng):
+    """Every block shows its own symbol in a random number of pixels, other symbols or nothing in the rest"""
+    symbols = upscale(rng.integers(0, 1 << SYMBOL_WIDTH, size=BLOCKS))
+    agree = upscale(rng.integers(0, BLOCK * BLOCK + 1, size=BLOCKS))
+    # pixel rank within its block, in random order
+    rank = rng.random((ACTIVE_V, ACTIVE_H)).reshape(BLOCKS[0], BLOCK, BLOCKS[1], BLOCK).transpose(0, 2, 1, 3)
+    rank = rank.reshape(*BLOCKS, -1).argsort(axis=-1).argsort(axis=-1)
+    rank = rank.reshape(BLOCKS[0], BLOCKS[1], BLOCK, BLOCK).transpose(0, 2, 1, 3).reshape(ACTIVE_V, ACTIVE_H)
+    other = rng.integers(0, 1 << SYMBOL_WIDTH, size=(ACTIVE_V, ACTIVE_H))
+    symbols = np.where(rank < agree, symbols, other)
+    valid = (rank < agree) | (rng.random((ACTIVE_V, ACTIVE_H)) < 0.5)
+    return symbols, valid
+
+
+def expected_votes(symbols, valid):
+    """The winning symbol of every block (the lowest on a tie) and whether AGREE pixels show it"""
+    counts = np.zeros((*BLOCKS, 1 << SYMBOL_WIDTH), dtype=np.int64)
+    for s in range(1 << SYMBOL_WIDTH):
+        hits = ((symbols == s) & valid).reshape(BLOCKS[0], BLOCK, BLOCKS[1], BLOCK)
+        counts[..., s] = hits.sum(axis=(1, 3))
+    return counts.argmax(axis=-1), counts.max(axis=-1) >= AGREE
+
+
+async def play_frame(sig, symbols, valid):
+    """Stream a frame, returns ``(symbol, valid)`` of every pixel with done_out high, by block"""
+    falling = FallingEdge(sig.clk_in)
+    votes = {}
+    for v in range(ACTIVE_V):
+        for h in range(ACTIVE_H):
+            await falling
+            sig.vcount_in.value = v
+            sig.hcount_in.value = h
+            sig.active_in.value = 1
+            sig.symbol_in.value = int(symbols[v, h])
+            sig.valid_in.value = int(valid[v, h])
+            await ReadOnly()
+            if sig.done_out.value:
+                votes[(v >> SHIFT, h >> SHIFT)] = (sig.symbol_out.value.integer, sig.valid_out.value.integer)
+            assert sig.done_out.value == ((v % BLOCK == BLOCK - 1) and (h % BLOCK == BLOCK - 1)), f"done_out at {h}, {v}"
+        await falling
+        sig.active_in.value = 0
+        for h in range(ACTIVE_H, ACTIVE_H + H_BLANK):
+            sig.hcount_in.value = h
+            await falling
+    return votes
+
+
+@cocotb.test()
+async def test_votes(dut):
+    """Every block's last pixel has the symbol most of its pixels show, valid once AGREE of them do"""
+    sig = await setup(dut)
+    rng = np.random.default_rng(1)
+    for frame in range(3):
+        symbols, valid = random_frame(rng)
+        winner, agreed = expected_votes(symbols, valid)
+        votes = await play_frame(sig, symbols, valid)
+        assert len(votes) == BLOCKS[0] * BLOCKS[1]
+        for block, (symbol, ok) in votes.items():
+            assert ok == agreed[block], f"frame {frame}, block {block}: valid_out {ok}"
+            assert symbol == winner[block], f"frame {frame}, block {block}: symbol {symbol} instead of {winner[block]}"
+
+
+TESTBENCH = Testbench(
+    toplevel="block_vote",
+    sources=["calibration/block_vote.sv"],
+    parameters={
+        "SHIFT": SHIFT,
+        "SYMBOL_WIDTH": SYMBOL_WIDTH,
+        "AGREE": AGREE,
+        "ACTIVE_H_PIXELS": ACTIVE_H,
+    },
+    sweeps={
+        "symbols": {"SYMBOL_WIDTH": 3, "AGREE": 6},
+        "blocks_8": {"SHIFT": 3, "AGREE": 33},
+        # a block per pixel, the vote is the pixel
+        "pixels": {"SHIFT": 0, "AGREE": 1},
+    },
+)
+
+
+def is_runner():
+    """Block majority vote"""
+    TESTBENCH.run()
+
+
+if __name__ == "__main__":
+    is_runner()
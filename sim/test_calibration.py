@@ -0,0 +1,9 @@
+from model.calibration import Scene, calibrate, grid_layout
+
+
+def test_grid():
+    """Every LED of a seeded 100 LED grid gets table entries, and almost none of them name the wrong LED"""
+    result = calibrate(Scene(grid_layout(100), seed=0))
+    assert result.steps == 7
+    assert result.coverage >= 0.98, f"only {result.coverage:.1%} of the LEDs were found"
+    assert result.misid_rate <= 0.05, f"{result.misid_rate:.1%} of the assigned entries name the wrong LED"
@@ -1,258 +1,229 @@
-import os
-import sys
-from pathlib import Path
-import typing
-from collections import deque
-
 import cocotb
-from cocotb.clock import Clock
-from cocotb.runner import get_runner
-from cocotb.triggers import ClockCycles, FallingEdge, RisingEdge
+import numpy as np
+from cocotb.triggers import ClockCycles, FallingEdge
+
+from model.fixtures import reset, start_clock
+from model.handles import SignalCache
+from model.calibration_map import load_map, simulate_map
+from model.raster import RasterDriver
+from model.runner import SIM_PATH, Testbench, parameter
 
-NUM_LEDS = 50
+NUM_LEDS = parameter("NUM_LEDS", 50)
 NUM_FRAMES = 10
-ACTIVE_H = 128
-ACTIVE_V = 72
+ACTIVE_H = parameter("ACTIVE_H_PIXELS", 128)
+ACTIVE_V = parameter("ACTIVE_LINES", 72)
 H_PORCH = 6
 V_PORCH = 6
-WAIT_CYCLES = 10
-LED_ADDRESS_WIDTH = 4
-
-
-@cocotb.test()
-async def test_a(dut):
-    """Test for driving first pixel a correct color"""
+WAIT_CYCLES = parameter("WAIT_CYCLES", 10)
+LED_ADDRESS_WIDTH = parameter("LED_ADDRESS_WIDTH", 4)
+BITS_PER_STEP = parameter("BITS_PER_STEP", 1)
+DOWNSAMPLE_SHIFT = parameter("DOWNSAMPLE_SHIFT", 2)
+TABLE_SLOTS = parameter("TABLE_SLOTS", 0)
+BLOCK = 1 << DOWNSAMPLE_SHIFT
+READ_LATENCY = 5 if TABLE_SLOTS else 2
+NUM_STEPS = -(-LED_ADDRESS_WIDTH // BITS_PER_STEP)
+# the tests that drive detect_0/detect_1 by hand only apply to one bit per step, they are skipped otherwise
+MULTI_BIT = BITS_PER_STEP != 1
+# python -m model.calibration_map --simulate -n 16 -w 4 --active-h 128 --active-lines 72 -o tb/calibration_map.mem
+CALIBRATION_MAP = SIM_PATH / "tb" / "calibration_map.mem"
+
+
+INPUTS = (
+    "start_calibration_step",
+    "read_request",
+    "should_overwrite_latch",
+    "verify_in",  # full calibration steps
+    "repair_in",
+    "hcount_in",
+    "vcount_in",
+    "new_frame_in",
+    "detect_0",
+    "detect_1",
+    "symbol_in",
+    "symbol_valid_in",
+)
+
+
+async def setup(dut):
     dut._log.info("Starting...")
-    cocotb.start_soon(Clock(dut.clk_pixel, 10, units="ns").start())
+    # every test starts from the same inputs, whichever ran before it
+    for name in INPUTS:
+        getattr(dut, name).value = 0
+    start_clock(dut.clk_pixel)
 
     await ClockCycles(dut.clk_pixel, 2)  # check the pre-reset behavior
 
-    # Reset
-    dut.rst.value = 1
-    await ClockCycles(dut.clk_pixel, 3)
-    await FallingEdge(dut.clk_pixel)
-    dut.rst.value = 0
-    dut.read_request.value = 0
-
-
-    for detect_1 in [1, 0, 1, 1]:
-        dut.start_calibration_step.value = 1
-        await ClockCycles(dut.clk_pixel, WAIT_CYCLES + 1)
-        dut.start_calibration_step.value = 0
-        dut.new_frame_in.value = 1
-        await ClockCycles(dut.clk_pixel, 1)
-        for start_v, start_h in [(0, 0)]:
-            for v in range(start_v, ACTIVE_V + V_PORCH):
-                for h in range(start_h, ACTIVE_H + H_PORCH):
-                    await FallingEdge(dut.clk_pixel)
-                    # active draw
-                    dut.detect_1.value = detect_1
-                    dut.hcount_in.value = h
-                    dut.vcount_in.value = v
-                    dut.new_frame_in.value = 0
-
-                    if v == ACTIVE_V and h == ACTIVE_H:
-                        dut.new_frame_in.value = 1
-
-    rec_frame_buf = []
-    dut._log.info("GOING TO REAd")
+    await reset(dut.clk_pixel, dut.rst)
+    return RasterDriver(dut, dut.clk_pixel, ACTIVE_H, ACTIVE_V, H_PORCH, V_PORCH)
 
-    await ClockCycles(dut.clk_pixel, 3)
-    for v in range(ACTIVE_V):
-        for h in range(ACTIVE_H):
-            if v % 4 == 0 and h % 4 == 0:
-                dut.read_request.value = 1
-                dut.hcount_in.value = h
-                dut.vcount_in.value = v
-                await ClockCycles(dut.clk_pixel, 3)
-                await FallingEdge(dut.clk_pixel)
-                assert (
-                    dut.read_out.value == 0b1011
-                ), f"Read out should be 0b1011, but got {dut.read_out.value}"
 
+async def calibration_step(dut, raster, overwrite=False, **planes):
+    """Kick off a calibration step and feed it one frame once it waits for one."""
+    dut.start_calibration_step.value = 1
+    dut.should_overwrite_latch.value = int(overwrite)
+    await ClockCycles(dut.clk_pixel, WAIT_CYCLES + 1)
+    dut.start_calibration_step.value = 0
+    dut.should_overwrite_latch.value = 0
+    dut.new_frame_in.value = 1
+    await ClockCycles(dut.clk_pixel, 1)
+    await raster.drive_frame(**planes)
 
-@cocotb.test()
-async def test_b(dut):
+
+async def read_table(dut):
+    """Read back the ID stored for the top left pixel of every block."""
+    sig = SignalCache(dut)
+    table = np.zeros((ACTIVE_V // BLOCK, ACTIVE_H // BLOCK), dtype=np.int64)
+    await ClockCycles(dut.clk_pixel, 3)
+    sig.read_request.value = 1
+    for v in range(0, ACTIVE_V, BLOCK):
+        for h in range(0, ACTIVE_H, BLOCK):
+            sig.hcount_in.value = h
+            sig.vcount_in.value = v
+            await ClockCycles(dut.clk_pixel, READ_LATENCY + 1)
+            await FallingEdge(dut.clk_pixel)
+            table[v // BLOCK, h // BLOCK] = sig.read_out.value.integer
+    return table
+
+
+def assert_table(table, expected):
+    """``expected`` is one ID for every block or a whole table of them."""
+    expected = np.broadcast_to(expected, table.shape)
+    wrong = np.argwhere(table != expected)
+    if wrong.size:
+        block = tuple(int(i) for i in wrong[0])
+        raise AssertionError(
+            f"{len(wrong)} blocks read the wrong ID, "
+            f"first is block {block} with {table[block]:#06b} instead of {expected[block]:#06b}"
+        )
+
+
+@cocotb.test(skip=MULTI_BIT or bool(TABLE_SLOTS) or DOWNSAMPLE_SHIFT != 2)
+async def test_preload(dut):
+    """The table boots with CALIBRATION_INIT_FILE and the next calibration replaces it"""
+    raster = await setup(dut)
+
+    expected = load_map(CALIBRATION_MAP, (ACTIVE_V // 4, ACTIVE_H // 4))
+    assert_table(await read_table(dut), expected)
+
+    # overwriting also clears the disabled blocks, and leaves the table as the other tests expect it
+    for step in range(LED_ADDRESS_WIDTH):
+        await calibration_step(dut, raster, overwrite=step == 0, detect_0=1, detect_1=0)
+    assert_table(await read_table(dut), 0)
+
+
+@cocotb.test(skip=MULTI_BIT)
+async def test_a(dut):
     """Test for driving first pixel a correct color"""
-    dut._log.info("Starting...")
-    cocotb.start_soon(Clock(dut.clk_pixel, 10, units="ns").start())
+    raster = await setup(dut)
 
-    await ClockCycles(dut.clk_pixel, 2)  # check the pre-reset behavior
+    for i, detect_1 in enumerate([1, 0, 1, 1]):
+        # detect_0 has to disagree with detect_1, otherwise the block is a conflict and gets disabled
+        # (overwriting the first step hands the blocks their slots with TABLE_SLOTS)
+        await calibration_step(dut, raster, overwrite=i == 0, detect_0=1 - detect_1, detect_1=detect_1)
 
-    # Reset
-    dut.rst.value = 1
-    await ClockCycles(dut.clk_pixel, 3)
-    await FallingEdge(dut.clk_pixel)
-    dut.rst.value = 0
-    dut.read_request.value = 0
-
-    for detect_1 in [1, 0, 1, 1]:
-        dut.start_calibration_step.value = 1
-        await ClockCycles(dut.clk_pixel, 2)
-        # dut.increment_id.value = 0
-        await ClockCycles(dut.clk_pixel, 2)
-        dut.new_frame_in.value = 1
-        await ClockCycles(dut.clk_pixel, 1)
-        for start_v, start_h in [(0, 0)]:
-            for v in range(start_v, ACTIVE_V + V_PORCH):
-                for h in range(start_h, ACTIVE_H + H_PORCH):
-                    await FallingEdge(dut.clk_pixel)
-                    # active draw
-                    dut.detect_1.value = detect_1
-                    dut.hcount_in.value = h
-                    dut.vcount_in.value = v
-                    dut.new_frame_in.value = 0
-            dut.new_frame_in.value = 1
-            await ClockCycles(dut.clk_pixel, 1)
-            dut.new_frame_in.value = 0
-            await ClockCycles(dut.clk_pixel, 1)
+    dut._log.info("GOING TO REAd")
+    assert_table(await read_table(dut), 0b1011)
 
-@cocotb.test()
+
+@cocotb.test(skip=MULTI_BIT)
 async def test_c(dut):
     """Test for overwriting"""
-    dut._log.info("Starting...")
-    cocotb.start_soon(Clock(dut.clk_pixel, 10, units="ns").start())
-
-    await ClockCycles(dut.clk_pixel, 2)  # check the pre-reset behavior
-
-    # Reset
-    dut.rst.value = 1
-    await ClockCycles(dut.clk_pixel, 3)
-    await FallingEdge(dut.clk_pixel)
-    dut.rst.value = 0
-    dut.read_request.value = 0
-    dut.should_overwrite_latch.value = 0
+    raster = await setup(dut)
 
     for i, detect_1 in enumerate([1, 1, 1, 1]):
-        dut.start_calibration_step.value = 1
-        if i == 2:
-            dut.should_overwrite_latch.value = 1
-        await ClockCycles(dut.clk_pixel, WAIT_CYCLES + 1)
-        dut.start_calibration_step.value = 0
-        dut.new_frame_in.value = 1
-        dut.should_overwrite_latch.value = 0
-        await ClockCycles(dut.clk_pixel, 1)
-        for start_v, start_h in [(0, 0)]:
-            for v in range(start_v, ACTIVE_V + V_PORCH):
-                for h in range(start_h, ACTIVE_H + H_PORCH):
-                    await FallingEdge(dut.clk_pixel)
-                    # active draw
-                    dut.detect_1.value = detect_1
-                    dut.hcount_in.value = h
-                    dut.vcount_in.value = v
-                    dut.new_frame_in.value = 0
-
-                    if v == ACTIVE_V and h == ACTIVE_H:
-                        dut.new_frame_in.value = 1
-
-    rec_frame_buf = []
+        await calibration_step(dut, raster, overwrite=i == 2, detect_0=1 - detect_1, detect_1=detect_1)
+
     dut._log.info("GOING TO REAd")
+    assert_table(await read_table(dut), 0b0011)
 
-    await ClockCycles(dut.clk_pixel, 3)
-    for v in range(ACTIVE_V):
-        for h in range(ACTIVE_H):
-            if v % 4 == 0 and h % 4 == 0:
-                dut.read_request.value = 1
-                dut.hcount_in.value = h
-                dut.vcount_in.value = v
-                await ClockCycles(dut.clk_pixel, 3)
-                await FallingEdge(dut.clk_pixel)
-                assert (
-                    dut.read_out.value == 0b0011
-                ), f"Read out should be 0b0011, but got {dut.read_out.value}"
-            
-@cocotb.test()
+
+@cocotb.test(skip=MULTI_BIT)
 async def test_d(dut):
     """Test for overlapping detect1 detect 2"""
-    dut._log.info("Starting...")
-    cocotb.start_soon(Clock(dut.clk_pixel, 10, units="ns").start())
+    raster = await setup(dut)
 
-    await ClockCycles(dut.clk_pixel, 2)  # check the pre-reset behavior
+    for i, detect_1 in enumerate([0, 0, 1, 0]):
+        # detect_0 overlapping detect_1 in step 2 is a conflict, which disables every block
+        await calibration_step(dut, raster, detect_0=int(i == 2), detect_1=detect_1)
 
-    # Reset
-    dut.rst.value = 1
-    await ClockCycles(dut.clk_pixel, 3)
-    await FallingEdge(dut.clk_pixel)
-    dut.rst.value = 0
-    dut.read_request.value = 0
-    dut.detect_0.value = 0
-    dut.should_overwrite_latch.value = 0
+    dut._log.info("GOING TO REAd")
+    assert_table(await read_table(dut), 2**LED_ADDRESS_WIDTH - 1)  # DISABLED_VAL
+
+
+@cocotb.test(skip=MULTI_BIT or NUM_LEDS >= 2**LED_ADDRESS_WIDTH)
+async def test_simulated_map(dut):
+    """A simulated map for this table disables blocks with the value the table disables them with"""
+    raster = await setup(dut)
+    for step in range(LED_ADDRESS_WIDTH):
+        await calibration_step(dut, raster, overwrite=step == 0, detect_0=1, detect_1=1)
+    disabled = np.unique(await read_table(dut))
+    assert disabled.size == 1, f"conflicts left {disabled.tolist()} in the table"
+
+    table = simulate_map(
+        NUM_LEDS,
+        active_h=ACTIVE_H,
+        active_lines=ACTIVE_V,
+        downsample_shift=DOWNSAMPLE_SHIFT,
+        address_width=LED_ADDRESS_WIDTH,
+    )
+    assert (table == disabled[0]).any(), f"no block of the map holds the disabled value {disabled[0]:#x}"
+    stray = table[(table >= NUM_LEDS) & (table != disabled[0])]
+    assert stray.size == 0, f"{stray.size} blocks hold {np.unique(stray).tolist()}, neither an LED nor disabled"
 
-    for i, detect_1 in enumerate([0, 0, 1, 0]):
-        dut.start_calibration_step.value = 1
-        if i == 2:
-            dut.detect_0.value = 1
+
+@cocotb.test()
+async def test_mask(dut):
+    """Every block stores the bits (or symbols) of its own detect masks"""
+    raster = await setup(dut)
+    rng = np.random.default_rng(2)
+    blocks = rng.integers(0, 1 << BITS_PER_STEP, size=(NUM_STEPS, ACTIVE_V // BLOCK, ACTIVE_H // BLOCK))
+    # only the top left pixel of every block is sampled, fill the rest with noise
+    masks = rng.integers(0, 1 << BITS_PER_STEP, size=(NUM_STEPS, ACTIVE_V, ACTIVE_H))
+    masks[:, ::BLOCK, ::BLOCK] = blocks
+
+    # the table still holds the previous tests' IDs, so the first step has to overwrite them
+    for step, mask in enumerate(masks):
+        if BITS_PER_STEP == 1:
+            planes = {"detect_0": 1 - mask, "detect_1": mask}
         else:
-            dut.detect_0.value = 0
-        await ClockCycles(dut.clk_pixel, WAIT_CYCLES + 1)
-        dut.start_calibration_step.value = 0
-        dut.new_frame_in.value = 1
-        dut.should_overwrite_latch.value = 0
-        await ClockCycles(dut.clk_pixel, 1)
-        for start_v, start_h in [(0, 0)]:
-            for v in range(start_v, ACTIVE_V + V_PORCH):
-                for h in range(start_h, ACTIVE_H + H_PORCH):
-                    await FallingEdge(dut.clk_pixel)
-                    # active draw
-                    dut.detect_1.value = detect_1
-                    dut.hcount_in.value = h
-                    dut.vcount_in.value = v
-                    dut.new_frame_in.value = 0
-
-                    if v == ACTIVE_V and h == ACTIVE_H:
-                        dut.new_frame_in.value = 1
-
-    rec_frame_buf = []
-    dut._log.info("GOING TO REAd")
+            planes = {"symbol_in": mask, "symbol_valid_in": 1}
+        await calibration_step(dut, raster, overwrite=step == 0, **planes)
 
-    await ClockCycles(dut.clk_pixel, 3)
-    for v in range(ACTIVE_V):
-        for h in range(ACTIVE_H):
-            if v % 4 == 0 and h % 4 == 0:
-                dut.read_request.value = 1
-                dut.hcount_in.value = h
-                dut.vcount_in.value = v
-                await ClockCycles(dut.clk_pixel, 3)
-                await FallingEdge(dut.clk_pixel)
-                assert (
-                    dut.read_out.value == 0b1111
-                ), f"Read out should be 0b1111, but got {dut.read_out.value}"
+    expected = np.zeros(blocks.shape[1:], dtype=np.int64)
+    for symbols in blocks:
+        expected = ((expected << BITS_PER_STEP) | symbols) & ((1 << LED_ADDRESS_WIDTH) - 1)
+    table = await read_table(dut)
+    assert (table == expected).all(), f"{(table != expected).sum()} blocks read back the wrong ID"
 
 
-def is_runner():
-    """Moving pixel tester"""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    sim = os.getenv("SIM", "icarus")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "calibration" / "calibration_step_fsm.sv"]
-    build_test_args = ["-Wall"]
-    parameters = {
+TESTBENCH = Testbench(
+    toplevel="calibration_step_fsm",
+    sources=["calibration/calibration_step_fsm.sv"],
+    parameters={
         "NUM_LEDS": NUM_LEDS,
         "ACTIVE_H_PIXELS": ACTIVE_H,
         "ACTIVE_LINES": ACTIVE_V,
         "WAIT_CYCLES": WAIT_CYCLES,
-        "LED_ADDRESS_WIDTH": LED_ADDRESS_WIDTH
-    }
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="calibration_step_fsm",
-        includes=[proj_path / "hdl"],
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale=("1ns", "1ps"),
-        waves=True,
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="calibration_step_fsm",
-        test_module="test_calibration_step_fsm",
-        test_args=run_test_args,
-        waves=True,
-    )
+        "LED_ADDRESS_WIDTH": LED_ADDRESS_WIDTH,
+        "CALIBRATION_INIT_FILE": f'"{CALIBRATION_MAP}"',
+        "BITS_PER_STEP": BITS_PER_STEP,
+        "DOWNSAMPLE_SHIFT": DOWNSAMPLE_SHIFT,
+        "TABLE_SLOTS": TABLE_SLOTS,
+    },
+    # the raster comes from Python here, full resolution runs are in test_calibration_step_fsm_tb
+    sweeps={
+        "leds_1024": {"NUM_LEDS": 1024, "LED_ADDRESS_WIDTH": 11},
+        "symbols": {"NUM_LEDS": 1024, "LED_ADDRESS_WIDTH": 11, "BITS_PER_STEP": 3},
+        "downsample_3": {"DOWNSAMPLE_SHIFT": 3},
+        # a slot for every block
+        "sparse": {"TABLE_SLOTS": (128 // 4) * (72 // 4)},
+    },
+)
+
+
+def is_runner():
+    """Moving pixel tester"""
+    TESTBENCH.run()
 
 
 if __name__ == "__main__":
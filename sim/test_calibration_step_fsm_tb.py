@@ -0,0 +1,474 @@
+import cocotb
+from cocotb.triggers import FallingEdge, RisingEdge
+import numpy as np
+
+from model.fixtures import reset
+from model.memfile import read_memh, write_memh
+from model.runner import SIM_PATH, Testbench, parameter
+
+# full 720p raster, with the real downsample_shift and BRAM depth
+NUM_LEDS = parameter("NUM_LEDS", 50)
+LED_ADDRESS_WIDTH = parameter("LED_ADDRESS_WIDTH", 6)
+ACTIVE_H = parameter("ACTIVE_H_PIXELS", 1280)
+ACTIVE_V = parameter("ACTIVE_LINES", 720)
+WAIT_CYCLES = parameter("WAIT_CYCLES", 100_000)  # top_level waits 5M cycles, a few frames, for the LEDs to settle
+ADAPTIVE_SETTLE = parameter("ADAPTIVE_SETTLE", 0)
+SETTLE_FRAMES = 2
+DOWNSAMPLE_SHIFT = parameter("DOWNSAMPLE_SHIFT", 2)
+TABLE_SLOTS = parameter("TABLE_SLOTS", 0)
+VOTE_FRAMES = parameter("VOTE_FRAMES", 1)
+BLOCK_AGREE = parameter("BLOCK_AGREE", 0)
+REPAIR = parameter("REPAIR", 1)
+BLOCK = 1 << DOWNSAMPLE_SHIFT
+BLOCKS = (ACTIVE_V // BLOCK, ACTIVE_H // BLOCK)
+DISABLED = 2**LED_ADDRESS_WIDTH - 1
+IDLE = 0
+CAPTURE_FRAME = 3
+
+
+async def setup(dut):
+    dut._log.info("Starting...")
+    # the wrapper generates clk_pixel itself
+    for name in ("start_calibration_step", "should_overwrite_latch", "verify_in", "repair_in", "mask_enable",
+                 "mask_load", "mask_index", "detect_0_in", "detect_1_in", "readback"):
+        getattr(dut, name).value = 0
+    await reset(dut.clk_pixel, dut.rst)
+
+
+def write_mask(index, detect_1, detect_0=None):
+    """Write the detect mask file the wrapper loads for ``mask_index == index``"""
+    detect_1 = np.asarray(detect_1, dtype=np.uint8)
+    detect_0 = 1 - detect_1 if detect_0 is None else np.asarray(detect_0, dtype=np.uint8)
+    write_memh(f"mask_{index}.mem", (detect_1 << 1) | detect_0, 2)
+
+
+async def next_frame(dut):
+    await RisingEdge(dut.new_frame)
+    await FallingEdge(dut.clk_pixel)
+
+
+async def calibration_step(dut, mask_index=None, overwrite=False, verify=False, repair=False):
+    """Run one calibration step, returns once the FSM is back in IDLE.
+
+    With ``mask_index`` the detects come from that mask file, otherwise from
+    the detect_*_in registers. ``verify`` and ``repair`` pick the kind of step.
+    """
+    await FallingEdge(dut.clk_pixel)
+    dut.mask_enable.value = int(mask_index is not None)
+    if mask_index is not None:
+        dut.mask_index.value = mask_index
+        dut.mask_load.value = 1
+    dut.start_calibration_step.value = 1
+    dut.should_overwrite_latch.value = int(overwrite)
+    dut.verify_in.value = int(verify)
+    dut.repair_in.value = int(repair)
+    await FallingEdge(dut.clk_pixel)
+    dut.mask_load.value = 0
+    dut.start_calibration_step.value = 0
+    dut.should_overwrite_latch.value = 0
+    dut.verify_in.value = 0
+    dut.repair_in.value = 0
+
+    frames = 0
+    while True:
+        await next_frame(dut)
+        frames += 1
+        if dut.state.value == IDLE:
+            return frames
+
+
+async def read_table(dut):
+    """Read the ID of every block back in one frame"""
+    dut.readback.value = 1
+    await RisingEdge(dut.readback_done)
+    dut.readback.value = 0
+    return read_memh("id_table.mem", depth=BLOCKS[0] * BLOCKS[1]).reshape(BLOCKS)
+
+
+@cocotb.test()
+async def test_registers(dut):
+    """Whole-frame detects from the register interface"""
+    await setup(dut)
+
+    for step, detect_1 in enumerate([1, 0, 1, 1]):
+        dut.detect_0_in.value = 1 - detect_1
+        dut.detect_1_in.value = detect_1
+        frames = await calibration_step(dut, overwrite=step == 0)
+        dut._log.info(f"Step {step} took {frames} frames")
+
+        if not ADAPTIVE_SETTLE:
+            assert dut.settle_cycles.value == WAIT_CYCLES, f"waited {dut.settle_cycles.value.integer} cycles"
+
+    table = await read_table(dut)
+    assert (table == 0b1011).all(), f"{(table != 0b1011).sum()} blocks do not read 0b1011"
+
+
+@cocotb.test(skip=bool(BLOCK_AGREE))
+async def test_masks(dut):
+    """Every block stores its own ID, shown as one mask file per step"""
+    await setup(dut)
+    rng = np.random.default_rng(4)
+    # the all ones ID is the disabled value
+    ids = rng.integers(0, 2**LED_ADDRESS_WIDTH - 1, size=BLOCKS)
+
+    for step in range(LED_ADDRESS_WIDTH):
+        bits = (ids >> (LED_ADDRESS_WIDTH - 1 - step)) & 1
+        # only the top left pixel of a block is sampled, fill the rest with noise
+        mask = rng.integers(0, 2, size=(ACTIVE_V, ACTIVE_H))
+        mask[::BLOCK, ::BLOCK] = bits
+        write_mask(step, mask)
+        await calibration_step(dut, mask_index=step, overwrite=step == 0)
+
+    table = await read_table(dut)
+    wrong = np.argwhere(table != ids)
+    assert wrong.size == 0, (
+        f"{len(wrong)} blocks read back the wrong ID, first is block {tuple(wrong[0])}: "
+        f"{table[tuple(wrong[0])]} instead of {ids[tuple(wrong[0])]}"
+    )
+
+
+async def settle_step(dut, old, new):
+    """Run an overwriting step whose camera shows the ``old`` masks for the partial frame and one more,
+    then catches up on the ``new`` ones, and check the wait ended SETTLE_FRAMES frames after that.
+
+    Both are ``(detect_1, detect_0)`` pairs, returns the table.
+    """
+    write_mask(0, *old)
+    write_mask(1, *new)
+
+    await FallingEdge(dut.clk_pixel)
+    dut.mask_enable.value = 1
+    dut.mask_index.value = 0
+    dut.mask_load.value = 1
+    dut.start_calibration_step.value = 1
+    dut.should_overwrite_latch.value = 1
+    await FallingEdge(dut.clk_pixel)
+    dut.mask_load.value = 0
+    dut.start_calibration_step.value = 0
+    dut.should_overwrite_latch.value = 0
+
+    # the partial frame and one more of the old pattern, then the camera catches up
+    await next_frame(dut)
+    await next_frame(dut)
+    dut.mask_index.value = 1
+    dut.mask_load.value = 1
+    await FallingEdge(dut.clk_pixel)
+    dut.mask_load.value = 0
+    while dut.state.value != IDLE:
+        await next_frame(dut)
+
+    frame_cycles = (ACTIVE_H + 110 + 40 + 220) * (ACTIVE_V + 5 + 5 + 20)
+    frames = dut.settle_frames.value.integer
+    cycles = dut.settle_cycles.value.integer
+    dut._log.info(f"Settled after {frames} frames, {cycles} cycles")
+    # reference on the old pattern, one changed frame, then SETTLE_FRAMES the same
+    assert frames == 2 + SETTLE_FRAMES, f"settled after {frames} frames"
+    assert cycles < (frames + 1) * frame_cycles < WAIT_CYCLES, f"waited {cycles} cycles"
+    # then up to a frame for the next one to start and the captured frames
+    step = dut.step_cycles.value.integer
+    captured = dut.capture_frames.value.integer
+    captured_cycles = captured * frame_cycles
+    assert cycles + captured_cycles <= step <= cycles + captured_cycles + frame_cycles + 2, f"step took {step} cycles"
+
+    return await read_table(dut)
+
+
+@cocotb.test(skip=not ADAPTIVE_SETTLE)
+async def test_settle(dut):
+    """The camera wait ends SETTLE_FRAMES frames after the detects stop changing, long before WAIT_CYCLES"""
+    await setup(dut)
+    rng = np.random.default_rng(5)
+    final = rng.integers(0, 2, size=(ACTIVE_V, ACTIVE_H))
+    blank = np.zeros((ACTIVE_V, ACTIVE_H), dtype=np.uint8)  # still the last pattern
+    table = await settle_step(dut, (blank, None), (final, None))
+
+    wrong = np.argwhere(table != final[::BLOCK, ::BLOCK])
+    assert wrong.size == 0, f"{len(wrong)} blocks did not capture the settled mask, first is block {tuple(wrong[0])}"
+
+
+@cocotb.test(skip=not ADAPTIVE_SETTLE)
+async def test_settle_next_bit(dut):
+    """The wait does not end on the previous address bit of the same LEDs, the counts of which barely differ"""
+    await setup(dut)
+    rng = np.random.default_rng(6)
+    # LEDs in a third of the blocks, on a dark background
+    lit = rng.random(BLOCKS) < 1 / 3
+    ids = rng.integers(0, DISABLED, size=BLOCKS)
+
+    def bit_masks(step):
+        bits = (ids >> (LED_ADDRESS_WIDTH - 1 - step)) & 1
+        detect_1 = np.kron(lit & (bits == 1), np.ones((BLOCK, BLOCK), dtype=np.uint8))
+        detect_0 = np.kron(lit & (bits == 0), np.ones((BLOCK, BLOCK), dtype=np.uint8))
+        return detect_1, detect_0
+
+    table = await settle_step(dut, bit_masks(1), bit_masks(2))
+
+    bits = (ids >> (LED_ADDRESS_WIDTH - 3)) & 1
+    expected = np.where(lit, bits, DISABLED)
+    wrong = np.argwhere(table != expected)
+    assert wrong.size == 0, (
+        f"{len(wrong)} blocks did not capture the settled bit, first is block {tuple(wrong[0])}: "
+        f"{table[tuple(wrong[0])]} instead of {expected[tuple(wrong[0])]}"
+    )
+
+
+@cocotb.test(skip=not TABLE_SLOTS)
+async def test_sparse(dut):
+    """Only blocks that see an LED in the overwriting step get a slot, the rest read disabled"""
+    await setup(dut)
+    rng = np.random.default_rng(6)
+    lit = rng.random(BLOCKS) < 0.05
+    ids = np.where(lit, rng.integers(0, DISABLED, size=BLOCKS), DISABLED)
+
+    for step in range(LED_ADDRESS_WIDTH):
+        bits = (ids >> (LED_ADDRESS_WIDTH - 1 - step)) & 1
+        # blocks without an LED show neither color
+        detect_1 = np.repeat(np.repeat(bits * lit, BLOCK, axis=0), BLOCK, axis=1)
+        detect_0 = np.repeat(np.repeat((1 - bits) * lit, BLOCK, axis=0), BLOCK, axis=1)
+        write_mask(step, detect_1, detect_0)
+        await calibration_step(dut, mask_index=step, overwrite=step == 0)
+
+    assert dut.slots_used.value == lit.sum(), f"{dut.slots_used.value.integer} slots for {lit.sum()} lit blocks"
+    table = await read_table(dut)
+    wrong = np.argwhere(table != ids)
+    assert wrong.size == 0, (
+        f"{len(wrong)} blocks read back the wrong ID, first is block {tuple(wrong[0])}: "
+        f"{table[tuple(wrong[0])]} instead of {ids[tuple(wrong[0])]}"
+    )
+
+
+def upscale(blocks):
+    """Every block's value on all of its pixels"""
+    return np.repeat(np.repeat(blocks, BLOCK, axis=0), BLOCK, axis=1)
+
+
+async def show_ids(dut, ids, steps, **kwargs):
+    """Calibration steps showing the address bits of ``ids``, ``DISABLED`` blocks see no LED"""
+    lit = ids != DISABLED
+    for step in steps:
+        bits = (ids >> (LED_ADDRESS_WIDTH - 1 - step)) & 1
+        write_mask(step, upscale(bits * lit), upscale((1 - bits) * lit))
+        await calibration_step(dut, mask_index=step, overwrite=step == 0, **kwargs)
+
+
+@cocotb.test(skip=not REPAIR)
+async def test_repair(dut):
+    """Verification flags the blocks whose LED changed and starts them over, the repair finishes only those"""
+    await setup(dut)
+    rng = np.random.default_rng(7)
+    ids = rng.integers(0, DISABLED, size=BLOCKS)
+    await show_ids(dut, ids, range(LED_ADDRESS_WIDTH))
+
+    # a bumped strand: a few blocks see another LED, a few none at all
+    moved = rng.random(BLOCKS) < 0.03
+    new_ids = np.where(moved, rng.integers(0, DISABLED, size=BLOCKS), ids)
+    new_ids[rng.random(BLOCKS) < 0.01] = DISABLED
+    lit = new_ids != DISABLED
+    flagged = np.zeros(BLOCKS, dtype=bool)
+    for step in range(2):
+        await show_ids(dut, new_ids, [step], verify=True)
+        bit = LED_ADDRESS_WIDTH - 1 - step
+        wrong = (lit != (ids != DISABLED)) | (lit & (((new_ids ^ ids) >> bit) & 1 == 1))
+        # the second step does not count the blocks the first one flagged again
+        wrong &= ~flagged
+        assert dut.mismatches.value == wrong.sum(), f"step {step}: {dut.mismatches.value.integer} mismatches, expected {wrong.sum()}"
+        flagged |= wrong
+    # with one bit per step both verified bits match on about a quarter of the moved blocks
+    assert flagged.sum() > 0.6 * (new_ids != ids).sum(), "most changed blocks should be flagged"
+
+    # the flagged blocks hold the first two address bits of their new LED
+    table = await read_table(dut)
+    expected = np.where(flagged, np.where(lit, new_ids >> (LED_ADDRESS_WIDTH - 2), DISABLED), ids)
+    assert (table == expected).all(), f"{(table != expected).sum()} blocks wrong after verifying"
+
+    # the unflagged blocks see noise in the repair steps and must keep their IDs
+    shown = np.where(flagged, new_ids, rng.integers(0, DISABLED, size=BLOCKS))
+    await show_ids(dut, shown, range(2, LED_ADDRESS_WIDTH), repair=True)
+    table = await read_table(dut)
+    expected = np.where(flagged, new_ids, ids)
+    wrong = np.argwhere(table != expected)
+    assert wrong.size == 0, (
+        f"{len(wrong)} blocks read back the wrong ID, first is block {tuple(wrong[0])}: "
+        f"{table[tuple(wrong[0])]} instead of {expected[tuple(wrong[0])]}"
+    )
+
+
+def vote_counts(samples):
+    """How many of ``samples[frame]`` are dark (-1), 0 and 1, for every block"""
+    return np.stack([(samples == value).sum(axis=0) for value in (-1, 0, 1)])
+
+
+def strict_majority(samples):
+    """Every block's value in more than half of ``samples[frame]``, -1 (disabled) without one or for dark"""
+    counts = vote_counts(samples)
+    return np.where(2 * counts.max(axis=0) > len(samples), counts.argmax(axis=0) - 1, -1)
+
+
+def step_frames(samples):
+    """Frames a step over all of ``samples`` captures: it tallies until no block's strict majority can change
+    whatever the frames left show, then captures the committing frame"""
+    total = len(samples)
+    for tallies in range(1, total - 1):
+        top = vote_counts(samples[:tallies]).max(axis=0)
+        won = 2 * top > total
+        lost = 2 * (top + total - tallies) <= total
+        if (won | lost).all():
+            return tallies + 1
+    return total
+
+
+async def voting_step(dut, samples, overwrite=False):
+    """Run a calibration step that shows ``samples[j]`` (a bit per block, -1 for dark) in its j-th captured frame"""
+    for frame, sample in enumerate(samples):
+        write_mask(frame, upscale(sample == 1), upscale(sample == 0))
+    await FallingEdge(dut.clk_pixel)
+    dut.mask_enable.value = 1
+    dut.mask_index.value = 0
+    dut.mask_load.value = 1
+    dut.start_calibration_step.value = 1
+    dut.should_overwrite_latch.value = int(overwrite)
+    await FallingEdge(dut.clk_pixel)
+    dut.mask_load.value = 0
+    dut.start_calibration_step.value = 0
+    dut.should_overwrite_latch.value = 0
+
+    captured = 0
+    while True:
+        await next_frame(dut)
+        if dut.state.value == IDLE:
+            return captured
+        if dut.state.value == CAPTURE_FRAME:
+            # new_frame comes at the start of the blanking, the mask is in before the frame
+            dut.mask_index.value = captured
+            dut.mask_load.value = 1
+            await FallingEdge(dut.clk_pixel)
+            dut.mask_load.value = 0
+            captured += 1
+
+
+@cocotb.test(skip=VOTE_FRAMES == 1)
+async def test_votes(dut):
+    """Every bit is the strict majority over the step's frames, blocks without one are disabled and steps stop
+    once every block is decided"""
+    await setup(dut)
+    rng = np.random.default_rng(8)
+    ids = rng.integers(0, DISABLED, size=BLOCKS)
+    # blocks that show the wrong bit or nothing in some frames, a few that are dark more often than not
+    noisy = rng.random(BLOCKS) < 0.1
+    flaky = rng.random(BLOCKS) < 0.02
+    # dark, 0, 1 in turn: no majority; 1 in the first frames, 0 in the (more) rest: a late majority
+    no_majority = ~noisy & ~flaky & (rng.random(BLOCKS) < 0.01)
+    late_majority = ~noisy & ~flaky & ~no_majority & (rng.random(BLOCKS) < 0.01)
+    cycling = (np.arange(VOTE_FRAMES) % 3 - 1)[:, None, None]
+    late = np.where(np.arange(VOTE_FRAMES) < (VOTE_FRAMES - 1) // 2, 1, 0)[:, None, None]
+    expected = np.zeros_like(ids)
+
+    for step in range(LED_ADDRESS_WIDTH):
+        bits = (ids >> (LED_ADDRESS_WIDTH - 1 - step)) & 1
+        samples = np.repeat(bits[None], VOTE_FRAMES, axis=0)
+        # every other step is clean and has to stop as soon as every block has a majority
+        if step % 2:
+            flips = noisy & (rng.random((VOTE_FRAMES, *BLOCKS)) < 0.3)
+            samples = np.where(flips, np.where(rng.random(flips.shape) < 0.5, -1, 1 - samples), samples)
+            samples = np.where(flaky & (rng.random(samples.shape) < 0.8), -1, samples)
+            samples = np.where(no_majority, cycling, np.where(late_majority, late, samples))
+        voted = strict_majority(samples)
+        frames = step_frames(samples)
+        captured = await voting_step(dut, samples, overwrite=step == 0)
+        assert captured == frames == dut.capture_frames.value, f"step {step} took {captured} frames, expected {frames}"
+        if step % 2 == 0:
+            # a majority after VOTE_FRAMES // 2 + 1 tallying frames, then the committing frame
+            assert frames == min(VOTE_FRAMES // 2 + 2, VOTE_FRAMES), f"clean step {step} took {frames} frames"
+        elif VOTE_FRAMES >= 3:
+            assert frames == VOTE_FRAMES, f"step {step} with a late majority stopped after {frames} frames"
+            assert (voted[no_majority] == -1).all() and (voted[late_majority] == 0).all()
+
+        # the shift of shift_accum_ram, disabled blocks stay disabled
+        shifted = ((expected << 1) | np.maximum(voted, 0)) & DISABLED
+        expected = np.where((voted < 0) | (expected == DISABLED), DISABLED, shifted if step else voted)
+
+    table = await read_table(dut)
+    wrong = np.argwhere(table != expected)
+    assert wrong.size == 0, (
+        f"{len(wrong)} blocks read back the wrong ID, first is block {tuple(wrong[0])}: "
+        f"{table[tuple(wrong[0])]} instead of {expected[tuple(wrong[0])]}"
+    )
+    clean = ~noisy & ~flaky & ~no_majority & ~late_majority
+    assert (table[clean] == ids[clean]).all(), "blocks without noise should read their ID"
+    assert (table[no_majority] == DISABLED).all(), "blocks without a majority should be disabled"
+
+
+def block_noise(rng, wrong):
+    """Pixel mask with ``wrong[block]`` random pixels of every block set"""
+    rank = rng.random((*BLOCKS, BLOCK * BLOCK)).argsort(axis=-1).argsort(axis=-1)
+    noise = rank < wrong[..., None]
+    return noise.reshape(*BLOCKS, BLOCK, BLOCK).transpose(0, 2, 1, 3).reshape(ACTIVE_V, ACTIVE_H)
+
+
+@cocotb.test(skip=not BLOCK_AGREE)
+async def test_block_vote(dut):
+    """Blocks take the bit most of their pixels show, and are disabled when too few agree"""
+    await setup(dut)
+    rng = np.random.default_rng(9)
+    ids = rng.integers(0, DISABLED, size=BLOCKS)
+    # the rest of a good block shows the other bit, a bad one has one agreeing pixel too few and nothing else
+    bad = rng.random(BLOCKS) < 0.05
+
+    for step in range(LED_ADDRESS_WIDTH):
+        bits = upscale((ids >> (LED_ADDRESS_WIDTH - 1 - step)) & 1)
+        flipped = block_noise(rng, np.where(bad, 0, BLOCK * BLOCK - BLOCK_AGREE))
+        dark = block_noise(rng, np.where(bad, BLOCK * BLOCK - BLOCK_AGREE + 1, 0))
+        shown = np.where(flipped, 1 - bits, bits)
+        write_mask(step, shown & ~dark, (1 - shown) & ~dark)
+        await calibration_step(dut, mask_index=step, overwrite=step == 0)
+
+    table = await read_table(dut)
+    expected = np.where(bad, DISABLED, ids)
+    wrong = np.argwhere(table != expected)
+    assert wrong.size == 0, (
+        f"{len(wrong)} blocks read back the wrong ID, first is block {tuple(wrong[0])}: "
+        f"{table[tuple(wrong[0])]} instead of {expected[tuple(wrong[0])]}"
+    )
+
+
+TESTBENCH = Testbench(
+    toplevel="calibration_step_fsm_tb",
+    sources=[SIM_PATH / "tb" / "calibration_step_fsm_tb.sv"],
+    parameters={
+        "NUM_LEDS": NUM_LEDS,
+        "LED_ADDRESS_WIDTH": LED_ADDRESS_WIDTH,
+        "ACTIVE_H_PIXELS": ACTIVE_H,
+        "ACTIVE_LINES": ACTIVE_V,
+        "WAIT_CYCLES": WAIT_CYCLES,
+        "ADAPTIVE_SETTLE": ADAPTIVE_SETTLE,
+        "SETTLE_FRAMES": SETTLE_FRAMES,
+        "DOWNSAMPLE_SHIFT": DOWNSAMPLE_SHIFT,
+        "TABLE_SLOTS": TABLE_SLOTS,
+        "VOTE_FRAMES": VOTE_FRAMES,
+        "BLOCK_AGREE": BLOCK_AGREE,
+        "REPAIR": REPAIR,
+    },
+    sweeps={
+        # 1024 LED IDs plus the disabled value need 11 bits
+        "production": {"NUM_LEDS": 1024, "LED_ADDRESS_WIDTH": 11, "WAIT_CYCLES": 5_000_000},
+        # WAIT_CYCLES only as the upper bound, 16 frames
+        "adaptive": {"WAIT_CYCLES": 20_000_000, "ADAPTIVE_SETTLE": 1},
+        # 8x8 blocks, a quarter of the table
+        "downsample_3": {"DOWNSAMPLE_SHIFT": 3},
+        # enough slots for every block, the tests that light them all still pass
+        "sparse": {"NUM_LEDS": 1024, "LED_ADDRESS_WIDTH": 11, "TABLE_SLOTS": 320 * 180},
+        # 5 frames per step
+        "votes": {"VOTE_FRAMES": 5},
+        # every pixel of a 4x4 block votes, 9 have to agree
+        "block_vote": {"BLOCK_AGREE": 9},
+    },
+)
+
+
+def is_runner():
+    """Calibration step FSM at full resolution"""
+    TESTBENCH.run()
+
+
+if __name__ == "__main__":
+    is_runner()
@@ -1,30 +1,28 @@
-import os
-import sys
-from pathlib import Path
-import typing
-from collections import deque
+import math
 
 import cocotb
-from cocotb.clock import Clock
-from cocotb.runner import get_runner
 from cocotb.triggers import ClockCycles, FallingEdge, RisingEdge
 
-NUM_LEDS = 50
+from model.fixtures import reset, start_clock
+from model.pixel_path import SYMBOL_COLORS
+from model.runner import Testbench, parameter
+
+NUM_LEDS = parameter("NUM_LEDS", 50)
+BITS_PER_STEP = parameter("BITS_PER_STEP", 1)
+LED_ADDRESS_WIDTH = math.ceil(math.log2(NUM_LEDS))
+NUM_STEPS = -(-LED_ADDRESS_WIDTH // BITS_PER_STEP)
 NUM_FRAMES = 10
 
 @cocotb.test()
 async def test_a(dut):
     """Test for driving first pixel a correct color"""
     dut._log.info("Starting...")
-    cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
+    start_clock(dut.clk)
 
     await ClockCycles(dut.clk, 2)  # check the pre-reset behavior
 
     # Reset
-    dut.rst.value = 1
-    await ClockCycles(dut.clk, 3)
-    await FallingEdge(dut.clk)
-    dut.rst.value = 0
+    await reset(dut.clk, dut.rst)
     dut.update_address_bit_num.value = 0
     dut.address_bit_num_req.value = 0
 
@@ -45,50 +43,30 @@ async def test_a(dut):
             await ClockCycles(dut.clk, 10)
             dut._log.info(f"Pixel# {pix}, GreenOut: {hex(dut.green_out.value)}, RedOut: {hex(dut.red_out.value)}, BlueOut: {hex(dut.blue_out.value)}, ColorValid: {dut.color_valid.value}, DisplayedFrameValid: {dut.displayed_frame_valid.value}")
             if frame > 7:
-                #these frames should be showing bit 1, if bit 1 = 0 then red only if bit 1 = 1 then blue only
-                pix_bin_rep = bin(pix)[2:]
-                while len(pix_bin_rep) < 6:
-                    pix_bin_rep = "0" + pix_bin_rep
-                # pix_bin_rep = pix_bin_rep[::-1]
-                print("ALAKJFL:KJL" , pix_bin_rep)
-                if pix_bin_rep[1] == "0":
-                    assert dut.red_out.value == 0xFF, "RedOut should be 1 when bit 1 is 0"
-                    assert dut.blue_out.value == 0x00, "BlueOut should be 0 when bit 1 is 0"
-                else:
-                    assert dut.red_out.value == 0x00, "RedOut should be 0 when bit 1 is 1"
-                    assert dut.blue_out.value == 0xFF, "BlueOut should be 1 when bit 1 is 1"
+                #these frames should be showing step 1 (counting from the msb): with one bit per step red only
+                #for a 0 and blue only for a 1, otherwise the symbol's color
+                symbol = (pix >> ((NUM_STEPS - 2) * BITS_PER_STEP)) & ((1 << BITS_PER_STEP) - 1)
+                color = (int(dut.red_out.value), int(dut.green_out.value), int(dut.blue_out.value))
+                assert color == SYMBOL_COLORS[BITS_PER_STEP][symbol], f"Pixel {pix} should show symbol {symbol}, not {color}"
                 assert dut.displayed_frame_valid.value == 1, "DisplayedFrameValid should be 1 after 8 frames"
 
+TESTBENCH = Testbench(
+    toplevel="id_shower",
+    sources=["calibration/id_shower.sv"],
+    parameters={
+        "NUM_LEDS": NUM_LEDS,
+        "BITS_PER_STEP": BITS_PER_STEP,
+    },
+    sweeps={
+        "leds_1024": {"NUM_LEDS": 1024},
+        "symbols": {"NUM_LEDS": 1024, "BITS_PER_STEP": 3},
+    },
+)
+
+
 def is_runner():
     """Moving pixel tester"""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    sim = os.getenv("SIM", "icarus")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "calibration" / "id_shower.sv"]
-    build_test_args = ["-Wall"]
-    parameters = {
-        "NUM_LEDS": NUM_LEDS,
-    }
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="id_shower",
-        includes=[proj_path / "hdl"],
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale=("1ns", "1ps"),
-        waves=True,
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="id_shower",
-        test_module="test_id_shower",
-        test_args=run_test_args,
-        waves=True,
-    )
+    TESTBENCH.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,128 @@
+import cocotb
+from cocotb.triggers import FallingEdge, ReadOnly, RisingEdge
+import numpy as np
+
+from model.fixtures import clock_and_reset
+from model.runner import Testbench, parameter
+from model.stream import ReadyValidDriver
+
+NUM_LEDS = parameter("NUM_LEDS", 20)
+LED_ADDRESS_WIDTH = parameter("LED_ADDRESS_WIDTH", 5)
+
+
+async def setup(dut):
+    dut._log.info("Starting...")
+    dut.valid_in.value = 0
+    dut.new_frame_in.value = 0
+    await clock_and_reset(dut.clk_in, dut.rst_in)
+    return ReadyValidDriver(dut, dut.clk_in, "valid_in", ["led_id_in", "color_in"])
+
+
+def pack(rgb):
+    rgb = np.asarray(rgb, dtype=np.int64)
+    return (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+
+
+def expected_colors(ids, rgb):
+    """Rounded average color of every LED that got pixels"""
+    expected = {}
+    for led in np.unique(ids):
+        pixels = rgb[ids == led].astype(np.int64)
+        count = len(pixels)
+        expected[int(led)] = int(pack((pixels.sum(axis=0) + count // 2) // count))
+    return expected
+
+
+def runs(ids):
+    return int(np.count_nonzero(np.diff(ids))) + 1
+
+
+async def collect(dut, colors):
+    while True:
+        await RisingEdge(dut.valid_out)
+        await ReadOnly()
+        led = dut.led_id_out.value.integer
+        assert led not in colors, f"LED {led} written twice"
+        colors[led] = dut.color_out.value.integer
+
+
+async def end_frame(dut):
+    """Pulse new_frame_in and return the ``{led: color}`` written before frame_done_out"""
+    colors = {}
+    collector = cocotb.start_soon(collect(dut, colors))
+    await FallingEdge(dut.clk_in)
+    dut.new_frame_in.value = 1
+    await FallingEdge(dut.clk_in)
+    dut.new_frame_in.value = 0
+    await RisingEdge(dut.frame_done_out)
+    await FallingEdge(dut.clk_in)
+    collector.kill()
+    return colors
+
+
+async def play_frame(dut, drv, ids, rgb, strobe=None):
+    await drv.send(strobe=strobe, led_id_in=ids, color_in=pack(rgb))
+    colors = await end_frame(dut)
+    expected = expected_colors(ids, rgb)
+    assert colors.keys() == expected.keys(), f"wrote LEDs {sorted(colors)}, expected {sorted(expected)}"
+    for led, color in expected.items():
+        assert colors[led] == color, f"LED {led} is {colors[led]:06x}, expected {color:06x}"
+    assert dut.rmw_count_out.value == runs(ids), f"{dut.rmw_count_out.value.integer} writes for {runs(ids)} runs"
+
+
+@cocotb.test()
+async def test_average(dut):
+    """Runs of random length and bubbles, every LED gets the rounded average of its pixels"""
+    drv = await setup(dut)
+    rng = np.random.default_rng(1)
+    for frame in range(2):
+        # some LEDs get no pixels at all
+        run_ids = rng.integers(0, NUM_LEDS - 3, size=60)
+        ids = np.repeat(run_ids, rng.integers(1, 9, size=run_ids.size))
+        rgb = rng.integers(0, 256, size=(ids.size, 3))
+        strobe = np.ones(ids.size + 40, dtype=bool)
+        strobe[rng.choice(strobe.size, 40, replace=False)] = False
+        await play_frame(dut, drv, ids, rgb, strobe)
+
+
+@cocotb.test()
+async def test_alternating(dut):
+    """Two LEDs taking turns every pixel, the closest a RAM entry gets to being written back to back"""
+    drv = await setup(dut)
+    rng = np.random.default_rng(2)
+    ids = np.tile([3, 7], 50)
+    rgb = rng.integers(0, 256, size=(ids.size, 3))
+    await play_frame(dut, drv, ids, rgb)
+    # the sums start over every frame
+    await play_frame(dut, drv, ids[:10], rgb[:10])
+
+
+@cocotb.test()
+async def test_saturated(dut):
+    """Full scale colors over a long run average to themselves"""
+    drv = await setup(dut)
+    ids = np.full(1000, NUM_LEDS - 1)
+    rgb = np.tile([255, 0, 128], (ids.size, 1))
+    await play_frame(dut, drv, ids, rgb)
+
+
+TESTBENCH = Testbench(
+    toplevel="led_color_accumulator",
+    sources=["calibration/led_color_accumulator.sv"],
+    parameters={
+        "NUM_LEDS": NUM_LEDS,
+        "LED_ADDRESS_WIDTH": LED_ADDRESS_WIDTH,
+    },
+    sweeps={
+        "top_level": {"NUM_LEDS": 250, "LED_ADDRESS_WIDTH": 8},
+    },
+)
+
+
+def is_runner():
+    """Per LED color accumulator"""
+    TESTBENCH.run()
+
+
+if __name__ == "__main__":
+    is_runner()
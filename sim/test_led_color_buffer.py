@@ -1,32 +1,72 @@
-import os
-import sys
-from pathlib import Path
-import typing
-from collections import deque
-
 import cocotb
-from cocotb.clock import Clock
-from cocotb.runner import get_runner
 from cocotb.triggers import ClockCycles, FallingEdge, RisingEdge
+import numpy as np
+
+from model.fixtures import reset, start_clock
+from model.runner import Testbench, parameter
+
+NUM_LEDS = parameter("NUM_LEDS", 90)
+LED_ADDRESS_WIDTH = parameter("LED_ADDRESS_WIDTH", 10)
+FBUF_COLOR_WIDTH = parameter("FBUF_COLOR_WIDTH", 24)
+DOUBLE_BUFFER = parameter("DOUBLE_BUFFER", 0)
+ACCUMULATE = parameter("ACCUMULATE", 0)
+
+
+async def setup(dut):
+    dut._log.info("Starting...")
+    start_clock(dut.clk_pixel, 14)
+    start_clock(dut.clk_led)
+    dut.wipe.value = 0
+    dut.new_frame_in.value = 0
+    dut.led_color_buffer_update_enable.value = 0
+    dut.next_led_request_address.value = NUM_LEDS - 1
+    await reset(dut.clk_pixel, dut.rst)
+
+
+async def write_pixels(dut, addresses, colors):
+    """One camera pixel of ``colors[i]`` mapped to LED ``addresses[i]`` per cycle"""
+    for addr, color in zip(addresses, colors):
+        dut.camera_color.value = int(color)
+        dut.led_lookup_address.value = int(addr)
+        dut.led_color_buffer_update_enable.value = 1
+        await ClockCycles(dut.clk_pixel, 1)
+    dut.led_color_buffer_update_enable.value = 0
+
 
-NUM_LEDS = 90
-LED_ADDRESS_WIDTH = 10
-CAMERA_COLOR_WIDTH = 16
+async def write_colors(dut, colors):
+    """Write ``colors[i]`` to LED ``i`` from the camera side"""
+    await write_pixels(dut, range(len(colors)), colors)
 
-@cocotb.test()
+
+async def pulse(dut, signal):
+    signal.value = 1
+    await ClockCycles(dut.clk_pixel, 1)
+    signal.value = 0
+    # let it cross into clk_led
+    await ClockCycles(dut.clk_pixel, 4)
+
+
+async def read_colors(dut, start=0):
+    """Read every LED from the LED side, from ``start`` on (a driver starts a refresh at LED 0)"""
+    colors = []
+    for i in range(start, NUM_LEDS):
+        dut.next_led_request_address.value = i
+        await ClockCycles(dut.clk_led, 5)
+        colors.append(dut.data_out.value.integer)
+    return colors
+
+
+@cocotb.test(skip=bool(DOUBLE_BUFFER))
 async def test_a(dut):
     """Test for driving first pixel a correct color"""
     dut._log.info("Starting...")
-    cocotb.start_soon(Clock(dut.clk_pixel, 14, units="ns").start())
-    cocotb.start_soon(Clock(dut.clk_led, 10, units="ns").start())
+    start_clock(dut.clk_pixel, 14)
+    start_clock(dut.clk_led)
 
     await ClockCycles(dut.clk_pixel, 2)  # check the pre-reset behavior
 
     # Reset
-    dut.rst.value = 1
-    await ClockCycles(dut.clk_pixel, 3)
-    await FallingEdge(dut.clk_pixel)
-    dut.rst.value = 0
+    await reset(dut.clk_pixel, dut.rst)
 
     # Writing to all pixels
     for i in range(NUM_LEDS):
@@ -43,7 +83,7 @@ async def test_a(dut):
         await ClockCycles(dut.clk_pixel, 1)
 
     # Updating selected pixels, also test for out of bounds address
-    addresses = [50,  0,  1, 99, 80, 95, 26,  3, 90, 26]
+    addresses = [50,  0,  1, NUM_LEDS + 9, 80, NUM_LEDS + 5, 26,  3, NUM_LEDS, 26]
     colors    = [37, 37, 37, 37, 37, 99, 37, 37, 37, 37]
     for addr, color in zip(addresses, colors):
         dut.camera_color.value = color
@@ -63,38 +103,134 @@ async def test_a(dut):
 
     
 
-def is_runner():
-    """Moving pixel tester"""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    sim = os.getenv("SIM", "icarus")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "calibration" / "led_color_buffer.sv"]
-    build_test_args = ["-Wall"]
-    parameters = {
+@cocotb.test(skip=bool(DOUBLE_BUFFER))
+async def test_wipe(dut):
+    """A wipe blacks out every LED at once"""
+    await setup(dut)
+    await write_colors(dut, range(1, NUM_LEDS + 1))
+    assert await read_colors(dut) == list(range(1, NUM_LEDS + 1))
+
+    dut.wipe.value = 1
+    await ClockCycles(dut.clk_pixel, 3)
+    assert not dut.wiping.value, "a wipe should take a single cycle"
+    assert await read_colors(dut) == [0] * NUM_LEDS
+
+    # held high it only wipes once
+    await write_colors(dut, [0x123] * NUM_LEDS)
+    dut.wipe.value = 0
+    assert await read_colors(dut) == [0x123] * NUM_LEDS
+
+
+@cocotb.test(skip=not DOUBLE_BUFFER or bool(ACCUMULATE))
+async def test_double_buffer(dut):
+    """The LED side only sees whole frames, and not before it asks for LED 0 after new_frame"""
+    await setup(dut)
+    frame_a = list(range(1, NUM_LEDS + 1))
+    frame_b = list(range(0x100, 0x100 + NUM_LEDS))
+
+    await write_colors(dut, frame_a)
+    assert await read_colors(dut) == [0] * NUM_LEDS, "the back buffer is showing"
+    await pulse(dut, dut.new_frame_in)
+    assert await read_colors(dut) == frame_a
+
+    # written while frame_a is showing
+    await write_colors(dut, frame_b)
+    assert await read_colors(dut) == frame_a, "writes tore the front buffer"
+    await pulse(dut, dut.new_frame_in)
+    assert await read_colors(dut, start=1) == frame_a[1:], "swapped in the middle of a refresh"
+    assert await read_colors(dut) == frame_b
+
+    # the LED side is still on frame_b's bank after this swap, writes wait for it to move on
+    dut.next_led_request_address.value = NUM_LEDS - 1
+    await pulse(dut, dut.new_frame_in)
+    await write_colors(dut, [0x555] * NUM_LEDS)
+    assert await read_colors(dut) == frame_a
+    await pulse(dut, dut.new_frame_in)
+    assert await read_colors(dut) == frame_b, "the LED side's bank was written"
+
+    # a wipe clears the back bank now and the front one once the LED side leaves it
+    await pulse(dut, dut.wipe)
+    assert await read_colors(dut) == frame_b
+    await pulse(dut, dut.new_frame_in)
+    assert await read_colors(dut) == [0] * NUM_LEDS
+    await pulse(dut, dut.new_frame_in)
+    assert await read_colors(dut) == [0] * NUM_LEDS
+    assert not dut.wiping.value
+
+
+def pack(rgb):
+    rgb = np.asarray(rgb, dtype=np.int64)
+    return (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+
+
+def dim(channel):
+    """The 4 bit LED output of an accumulated channel, rounded"""
+    return 0xF if channel >= 0xF8 else (channel + 8) >> 4
+
+
+async def walk_done(dut):
+    await RisingEdge(dut.frame_end)
+    await FallingEdge(dut.clk_pixel)
+
+
+@cocotb.test(skip=not (ACCUMULATE and DOUBLE_BUFFER))
+async def test_accumulate(dut):
+    """Every LED gets the rounded average of its pixels, the front bank only changes once the walk is done"""
+    await setup(dut)
+    rng = np.random.default_rng(5)
+    shown = [0] * NUM_LEDS
+    for frame in range(2):
+        # 1 to 4 pixels per LED, in no particular order
+        ids = rng.permutation(np.repeat(np.arange(NUM_LEDS), 1 + np.arange(NUM_LEDS) % 4))
+        rgb = rng.integers(0, 256, size=(ids.size, 3))
+        counts = np.bincount(ids, minlength=NUM_LEDS)[:, None]
+        sums = np.stack([np.bincount(ids, weights=rgb[:, c], minlength=NUM_LEDS) for c in range(3)], axis=1)
+        average = (sums.astype(np.int64) + counts // 2) // counts
+        await write_pixels(dut, ids, pack(rgb))
+
+        front = dut.front.value.integer
+        walk = cocotb.start_soon(walk_done(dut))
+        await pulse(dut, dut.new_frame_in)
+        assert await read_colors(dut) == shown, f"frame {frame}: the front bank changed during the walk"
+        assert not walk.done(), "the walk should outlast a refresh"
+        assert dut.front.value == front, f"frame {frame}: swapped before the walk was done"
+        await walk
+        await ClockCycles(dut.clk_pixel, 4)
+        assert dut.front.value != front, f"frame {frame}: no swap after the walk"
+
+        shown = [int(color) for color in pack(average)]
+        for led in range(NUM_LEDS):
+            dut.next_led_request_address.value = led
+            await ClockCycles(dut.clk_led, 5)
+            assert dut.data_out.value == shown[led], f"frame {frame}, LED {led}: {dut.data_out.value.integer:06x}, expected {shown[led]:06x}"
+            red, green, blue = (dim(channel) for channel in average[led])
+            outputs = tuple(out.value.integer for out in (dut.red_out, dut.green_out, dut.blue_out))
+            assert outputs == (red, green, blue), f"frame {frame}, LED {led}: dimmed to {outputs}, expected {(red, green, blue)}"
+
+
+TESTBENCH = Testbench(
+    toplevel="led_color_buffer",
+    sources=["calibration/led_color_buffer.sv"],
+    parameters={
         "NUM_LEDS": NUM_LEDS,
         "LED_ADDRESS_WIDTH": LED_ADDRESS_WIDTH,
-        "CAMERA_COLOR_WIDTH": CAMERA_COLOR_WIDTH
-    }
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="led_color_buffer",
-        includes=[proj_path / "hdl"],
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale=("1ns", "1ps"),
-        waves=True,
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="led_color_buffer",
-        test_module="test_led_color_buffer",
-        test_args=run_test_args,
-        waves=True,
-    )
+        "FBUF_COLOR_WIDTH": FBUF_COLOR_WIDTH,
+        "DOUBLE_BUFFER": DOUBLE_BUFFER,
+        "ACCUMULATE": ACCUMULATE,
+    },
+    sweeps={
+        # the out of range writes still have to fit LED_ADDRESS_WIDTH
+        "leds_1000": {"NUM_LEDS": 1000, "LED_ADDRESS_WIDTH": 10},
+        "double_buffer": {"NUM_LEDS": 250, "LED_ADDRESS_WIDTH": 8, "DOUBLE_BUFFER": 1},
+        # top_level's configuration
+        "accumulate": {"NUM_LEDS": 250, "LED_ADDRESS_WIDTH": 8, "DOUBLE_BUFFER": 1, "ACCUMULATE": 1},
+    },
+)
+
+
+def is_runner():
+    """Moving pixel tester"""
+    TESTBENCH.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,162 @@
+import cocotb
+from cocotb.triggers import ClockCycles, FallingEdge, RisingEdge, with_timeout
+import numpy as np
+
+from model.fixtures import reset, start_clock
+from model.runner import Testbench, parameter
+from model.stream import ReadyValidDriver
+
+NUM_LEDS = parameter("NUM_LEDS", 20)
+LED_ADDRESS_WIDTH = parameter("LED_ADDRESS_WIDTH", 5)
+FB_WIDTH = parameter("FB_WIDTH", 16)
+FB_HEIGHT = parameter("FB_HEIGHT", 8)
+SCALE_SHIFT = parameter("SCALE_SHIFT", 1)
+ACTIVE_H = FB_WIDTH << SCALE_SHIFT
+ACTIVE_LINES = FB_HEIGHT << SCALE_SHIFT
+
+
+async def setup(dut):
+    dut._log.info("Starting...")
+    start_clock(dut.clk_pixel, 14)
+    start_clock(dut.clk_led)
+    dut.build_in.value = 0
+    dut.valid_in.value = 0
+    dut.new_frame_in.value = 0
+    dut.next_led_request_address.value = 0
+    dut.fb_pixel_in.value = 0
+    await reset(dut.clk_pixel, dut.rst)
+    return ReadyValidDriver(dut, dut.clk_pixel, "valid_in", ["led_id_in", "hcount_in", "vcount_in"])
+
+
+async def frame_buffer(dut, pixels):
+    """A frame buffer port answering ``fb_addr_out`` with ``pixels[addr]`` 2 cycles later"""
+    registered = 0
+    while True:
+        await FallingEdge(dut.clk_led)
+        address = dut.fb_addr_out.value.integer
+        await RisingEdge(dut.clk_led)
+        dut.fb_pixel_in.value = int(pixels[registered])
+        registered = address
+
+
+async def new_frame(dut):
+    await FallingEdge(dut.clk_pixel)
+    dut.new_frame_in.value = 1
+    await FallingEdge(dut.clk_pixel)
+    dut.new_frame_in.value = 0
+
+
+async def build(dut, drv, ids):
+    """Build the map from one frame of calibration table ids (``ids[vcount, hcount]``)"""
+    await FallingEdge(dut.clk_pixel)
+    dut.build_in.value = 1
+    await ClockCycles(dut.clk_pixel, 4)
+    assert not dut.ready_out.value, "ready_out should drop while a map is built"
+    await new_frame(dut)
+    vcount, hcount = np.indices(ids.shape)
+    await drv.send(led_id_in=ids.ravel(), hcount_in=hcount.ravel(), vcount_in=vcount.ravel())
+    await new_frame(dut)
+    await with_timeout(RisingEdge(dut.ready_out), 20 * NUM_LEDS * 14, "ns")
+    dut.build_in.value = 0
+
+
+def expected_addresses(ids):
+    """Frame buffer address of the rounded centroid of every LED in ``ids``"""
+    vcount, hcount = np.indices(ids.shape)
+    addresses = {}
+    for led in np.unique(ids[ids < NUM_LEDS]):
+        x = hcount[ids == led] >> SCALE_SHIFT
+        y = vcount[ids == led] >> SCALE_SHIFT
+        cx = (int(x.sum()) + x.size // 2) // x.size
+        cy = (int(y.sum()) + y.size // 2) // y.size
+        addresses[int(led)] = (FB_WIDTH - 1 - cx) + FB_WIDTH * cy
+    return addresses
+
+
+def dim(pixel):
+    """{red, green, blue} of an RGB565 pixel, 4 bits each"""
+    return ((pixel >> 12) & 0xF, (pixel >> 7) & 0xF, (pixel >> 1) & 0xF)
+
+
+async def read_led(dut, led):
+    dut.next_led_request_address.value = led
+    await FallingEdge(dut.clk_led)
+    assert not dut.color_valid.value, "color_valid should drop when the request changes"
+    await with_timeout(RisingEdge(dut.color_valid), 100, "ns")
+    await FallingEdge(dut.clk_led)
+    return dut.red_out.value.integer, dut.green_out.value.integer, dut.blue_out.value.integer
+
+
+async def check_map(dut, ids, pixels):
+    addresses = expected_addresses(ids)
+    # every other request so each one changes the address
+    for led in [*range(NUM_LEDS), 0]:
+        await read_led(dut, (led + NUM_LEDS // 2) % NUM_LEDS)
+        color = await read_led(dut, led)
+        if led in addresses:
+            assert dut.fb_addr_out.value == addresses[led], (
+                f"LED {led} reads address {dut.fb_addr_out.value.integer}, expected {addresses[led]}"
+            )
+            assert color == dim(int(pixels[addresses[led]])), f"LED {led} is {color}"
+        else:
+            assert color == (0, 0, 0), f"LED {led} was never seen but is {color}"
+
+
+def blob_ids(rng):
+    """Square blobs of LED ids at random spots, the rest of the frame off"""
+    ids = np.full((ACTIVE_LINES, ACTIVE_H), (1 << LED_ADDRESS_WIDTH) - 1)
+    for led in rng.choice(NUM_LEDS, NUM_LEDS - 4, replace=False):
+        y, x = rng.integers(0, ACTIVE_LINES - 3), rng.integers(0, ACTIVE_H - 3)
+        size = rng.integers(1, 4)
+        ids[y : y + size, x : x + size] = led
+    return ids
+
+
+@cocotb.test()
+async def test_centroids(dut):
+    """Every LED reads the frame buffer at the centroid of its pixels, unseen LEDs read black"""
+    drv = await setup(dut)
+    rng = np.random.default_rng(1)
+    pixels = rng.integers(0, 1 << 16, size=FB_WIDTH * FB_HEIGHT)
+    cocotb.start_soon(frame_buffer(dut, pixels))
+    ids = blob_ids(rng)
+    await build(dut, drv, ids)
+    await check_map(dut, ids, pixels)
+
+
+@cocotb.test()
+async def test_rebuild(dut):
+    """A new build replaces the whole map, LEDs from the old one are gone"""
+    drv = await setup(dut)
+    rng = np.random.default_rng(2)
+    pixels = rng.integers(0, 1 << 16, size=FB_WIDTH * FB_HEIGHT)
+    cocotb.start_soon(frame_buffer(dut, pixels))
+    await build(dut, drv, blob_ids(rng))
+    ids = blob_ids(rng)
+    await build(dut, drv, ids)
+    await check_map(dut, ids, pixels)
+
+
+TESTBENCH = Testbench(
+    toplevel="led_pixel_map",
+    sources=["calibration/led_pixel_map.sv"],
+    parameters={
+        "NUM_LEDS": NUM_LEDS,
+        "LED_ADDRESS_WIDTH": LED_ADDRESS_WIDTH,
+        "FB_WIDTH": FB_WIDTH,
+        "FB_HEIGHT": FB_HEIGHT,
+        "SCALE_SHIFT": SCALE_SHIFT,
+    },
+    sweeps={
+        "top_level": {"NUM_LEDS": 250, "LED_ADDRESS_WIDTH": 8},
+    },
+)
+
+
+def is_runner():
+    """LED to frame buffer centroid map"""
+    TESTBENCH.run()
+
+
+if __name__ == "__main__":
+    is_runner()
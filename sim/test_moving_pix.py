@@ -1,31 +1,23 @@
-import os
-import sys
-from pathlib import Path
-import typing
-from collections import deque
-
 import cocotb
-from cocotb.clock import Clock
-from cocotb.runner import get_runner
 from cocotb.triggers import ClockCycles, FallingEdge, RisingEdge
 
-NUM_LEDS = 5
-NUM_FRAMES_PER_LED = 4
+from model.fixtures import reset, start_clock
+from model.runner import Testbench, parameter
+
+NUM_LEDS = parameter("NUM_LEDS", 5)
+NUM_FRAMES_PER_LED = parameter("FRAMES_PER_LED", 4)
 
 
 @cocotb.test()
 async def test_a(dut):
     """Test for driving first pixel a correct color"""
     dut._log.info("Starting...")
-    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
+    start_clock(dut.clk_in)
 
     await ClockCycles(dut.clk_in, 2)  # check the pre-reset behavior
 
     # Reset
-    dut.rst_in.value = 1
-    await ClockCycles(dut.clk_in, 3)
-    await FallingEdge(dut.clk_in)
-    dut.rst_in.value = 0
+    await reset(dut.clk_in, dut.rst_in)
     dut.next_led_request.value = 0
 
     # Start Driving
@@ -49,37 +41,19 @@ async def test_a(dut):
                     assert dut.blue_out.value == 0
 
 
-def is_runner():
-    """Moving pixel tester"""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    sim = os.getenv("SIM", "icarus")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "pattern" / "moving_pix.sv"]
-    build_test_args = ["-Wall"]
-    parameters = {
+TESTBENCH = Testbench(
+    toplevel="moving_pix",
+    sources=["pattern/moving_pix.sv"],
+    parameters={
         "NUM_LEDS": NUM_LEDS,
         "FRAMES_PER_LED": NUM_FRAMES_PER_LED,
-    }
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="moving_pix",
-        includes=[proj_path / "hdl"],
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale=("1ns", "1ps"),
-        waves=True,
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="moving_pix",
-        test_module="test_moving_pix",
-        test_args=run_test_args,
-        waves=True,
-    )
+    },
+)
+
+
+def is_runner():
+    """Moving pixel tester"""
+    TESTBENCH.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,153 @@
+import cocotb
+from cocotb.triggers import Edge, FallingEdge, Timer, with_timeout
+import numpy as np
+
+from model.fixtures import reset, start_clock
+from model.runner import SIM_PATH, Testbench, parameter
+from model.strand_monitor import StrandMonitor
+from model.ws2812 import WS2812Timing
+
+NUM_LEDS = parameter("NUM_LEDS", 30)
+NUM_STRANDS = parameter("NUM_STRANDS", 4)
+DEPTH = parameter("DEPTH", 4)
+LEDS_PER_STRAND = -(-NUM_LEDS // NUM_STRANDS)
+CLOCK_SPEED = 100_000_000
+# a refresh is 30us per LED of one strand plus a 55us reset
+REFRESH_US = 30 * LEDS_PER_STRAND + 55
+REFRESH_TIMEOUT_US = 2 * REFRESH_US
+
+
+async def setup(dut, colors):
+    dut._log.info("Starting...")
+    dut.force_reset.value = 0
+    dut.color_valid.value = 0
+    start_clock(dut.clk_in)
+    await reset(dut.clk_in, dut.rst_in)
+    # one monitor per strand, all on the strand_out vector
+    timing = WS2812Timing.from_clock_speed(CLOCK_SPEED, tolerance=0)
+    monitors = [StrandMonitor(dut.strand_out, LEDS_PER_STRAND, timing=timing, bit=s).start() for s in range(NUM_STRANDS)]
+    cocotb.start_soon(serve_requests(dut, colors))
+    return monitors
+
+
+async def serve_requests(dut, colors):
+    """Answer requests like led_color_buffer does: color_valid stays high and the old color is
+    still there the cycle after next_led_request changes. Tests stall the source by pulling
+    color_valid low."""
+    request_changed = Edge(dut.next_led_request)
+    falling = FallingEdge(dut.clk_in)
+    dut.green_in.value, dut.red_in.value, dut.blue_in.value = (int(c) for c in colors[0])
+    dut.color_valid.value = 1
+    while True:
+        await request_changed
+        await falling
+        await falling
+        green, red, blue = colors[int(dut.next_led_request.value)]
+        dut.green_in.value = int(green)
+        dut.red_in.value = int(red)
+        dut.blue_in.value = int(blue)
+
+
+def strand_colors(colors):
+    """``(NUM_STRANDS, LEDS_PER_STRAND, 3)`` colors each strand should show, black past NUM_LEDS"""
+    padded = np.zeros((NUM_STRANDS * LEDS_PER_STRAND, 3), dtype=np.uint8)
+    padded[:NUM_LEDS] = colors
+    return padded.reshape(NUM_STRANDS, LEDS_PER_STRAND, 3)
+
+
+async def next_refreshes(monitors):
+    return [await with_timeout(monitor.refreshes.get(), REFRESH_TIMEOUT_US, "us") for monitor in monitors]
+
+
+@cocotb.test()
+async def test_colors(dut):
+    """Every strand shows its own run of LEDs"""
+    colors = np.random.default_rng(1).integers(0, 256, size=(NUM_LEDS, 3), dtype=np.uint8)
+    monitors = await setup(dut, colors)
+    expected = strand_colors(colors)
+
+    for refresh_num in range(2):
+        refreshes = await next_refreshes(monitors)
+        for strand, refresh in enumerate(refreshes):
+            assert refresh.leds_written == LEDS_PER_STRAND, f"strand {strand} wrote {refresh.leds_written} LEDs"
+            wrong = np.flatnonzero((refresh.colors != expected[strand]).any(axis=1))
+            assert wrong.size == 0, (
+                f"refresh {refresh_num} strand {strand}: LED {wrong[0]} is {refresh.colors[wrong[0]].tolist()}, "
+                f"expected {expected[strand][wrong[0]].tolist()}"
+            )
+    for monitor in monitors:
+        monitor.stop()
+
+
+@cocotb.test()
+async def test_lockstep(dut):
+    """The strands are driven together, a refresh only takes as long as one strand"""
+    colors = np.full((NUM_LEDS, 3), 0xAA, dtype=np.uint8)
+    monitors = await setup(dut, colors)
+
+    first = await next_refreshes(monitors)
+    refreshes = await next_refreshes(monitors)
+    starts = {refresh.start_ns for refresh in refreshes}
+    assert len(starts) == 1, f"strands started at {sorted(starts)}"
+    ends = {refresh.end_ns for refresh in refreshes}
+    assert len(ends) == 1, f"strands ended at {sorted(ends)}"
+
+    period_us = (refreshes[0].start_ns - first[0].start_ns) / 1000
+    dut._log.info(f"Refresh every {period_us:.1f}us, {1e6 / period_us:.0f}Hz with {NUM_STRANDS} strands")
+    assert period_us <= REFRESH_US + 1, f"refresh took {period_us:.1f}us, one strand is {REFRESH_US}us"
+    for gap in monitors[0].reset_gaps_ns:
+        assert gap >= 50_000, f"strands were only low for {gap}ns between refreshes"
+    assert dut.underrun_count.value == 0, f"{dut.underrun_count.value.integer} underruns"
+    for monitor in monitors:
+        monitor.stop()
+
+
+@cocotb.test(skip=LEDS_PER_STRAND <= DEPTH + 1)
+async def test_underrun(dut):
+    """A source that stalls for longer than the FIFO holds ends the refresh early, counted as an underrun,
+    and the next refresh starts over at LED 0"""
+    colors = np.random.default_rng(2).integers(0, 256, size=(NUM_LEDS, 3), dtype=np.uint8)
+    monitors = await setup(dut, colors)
+    expected = strand_colors(colors)
+    await next_refreshes(monitors)
+
+    # the next refresh starts 5us after the monitors latch this one, stall during its first LED
+    # for longer than the DEPTH LEDs in the FIFO take to send
+    await Timer(15, "us")
+    dut.color_valid.value = 0
+    await Timer(30 * (DEPTH + 2), "us")
+    dut.color_valid.value = 1
+    assert dut.underrun_count.value == 1, f"{dut.underrun_count.value.integer} underruns"
+
+    short = await next_refreshes(monitors)
+    assert short[0].leds_written < LEDS_PER_STRAND, "the refresh did not end early"
+    refreshes = await next_refreshes(monitors)
+    for strand, refresh in enumerate(refreshes):
+        assert refresh.leds_written == LEDS_PER_STRAND, f"strand {strand} wrote {refresh.leds_written} LEDs"
+        assert (refresh.colors == expected[strand]).all(), f"strand {strand} is off after the underrun"
+    for monitor in monitors:
+        monitor.stop()
+
+
+TESTBENCH = Testbench(
+    toplevel="multi_strand_driver_tb",
+    sources=[SIM_PATH / "tb" / "multi_strand_driver_tb.sv"],
+    parameters={
+        "NUM_LEDS": NUM_LEDS,
+        "NUM_STRANDS": NUM_STRANDS,
+        "DEPTH": DEPTH,
+    },
+    sweeps={
+        "top_level": {"NUM_LEDS": 250, "NUM_STRANDS": 4},
+        "single_strand": {"NUM_LEDS": 250, "NUM_STRANDS": 1},
+    },
+)
+
+
+def is_runner():
+    """Multi strand LED driver fed through the prefetch FIFO."""
+    TESTBENCH.run()
+
+
+if __name__ == "__main__":
+    is_runner()
@@ -1,29 +1,21 @@
-import os
-import sys
-from pathlib import Path
-import typing
-from collections import deque
-
 import cocotb
-from cocotb.clock import Clock
-from cocotb.runner import get_runner
 from cocotb.triggers import ClockCycles, FallingEdge, RisingEdge
 
-NUM_LEDS = 5
+from model.fixtures import reset, start_clock
+from model.runner import Testbench, parameter
+
+NUM_LEDS = parameter("NUM_LEDS", 5)
 
 
 @cocotb.test()
 async def test_a(dut):
     """Test for driving first pixel a correct color"""
     dut._log.info("Starting...")
-    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
+    start_clock(dut.clk_in)
 
     await ClockCycles(dut.clk_in, 2)  # check the pre-reset behavior
 
-    dut.rst_in.value = 1
-    await ClockCycles(dut.clk_in, 3)
-    await FallingEdge(dut.clk_in)
-    dut.rst_in.value = 0
+    await reset(dut.clk_in, dut.rst_in)
 
     dut.next_led_request.value = 0
 
@@ -48,36 +40,21 @@ async def test_a(dut):
         await ClockCycles(dut.clk_in, 100)  # let's demo waiting for a bit
 
 
+TESTBENCH = Testbench(
+    toplevel="pat_gradient",
+    sources=["pattern/pat_gradient.sv"],
+    parameters={
+        "NUM_LEDS": NUM_LEDS,
+    },
+    sweeps={
+        "leds_1024": {"NUM_LEDS": 1024},
+    },
+)
+
+
 def is_runner():
     """LED Driver Tester."""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    sim = os.getenv("SIM", "icarus")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "pattern" / "pat_gradient.sv"]
-    build_test_args = ["-Wall"]
-    parameters = {
-        "NUM_LEDS": NUM_LEDS,
-    }
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="pat_gradient",
-        includes=[proj_path / "hdl"],
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale=("1ns", "1ps"),
-        waves=True,
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="pat_gradient",
-        test_module="test_pat_gradient",
-        test_args=run_test_args,
-        waves=True,
-    )
+    TESTBENCH.run()
 
 
 if __name__ == "__main__":
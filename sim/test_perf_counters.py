@@ -0,0 +1,104 @@
+import cocotb
+from cocotb.triggers import FallingEdge, Timer
+import numpy as np
+
+from model.fixtures import clock_and_reset
+from model.runner import Testbench, parameter
+from model.telemetry import TELEMETRY, read_telemetry, residency
+
+CLOCK_SPEED = parameter("CLOCK_SPEED", 200)
+RATES = ("camera_fps", "hdmi_fps", "led_refreshes", "led_underruns")
+EVENTS = ("camera_frame_in", "hdmi_frame_in", "led_refresh_in", "led_underrun_in")
+STEP_INPUTS = {
+    "step_cycles_in": 32,
+    "wait_cycles_in": 32,
+    "wait_frames_in": 8,
+    "capture_frames_in": 8,
+    "mismatches_in": 16,
+    "slots_used_in": 16,
+}
+
+
+async def setup(dut):
+    dut._log.info("Starting...")
+    for name in EVENTS + tuple(STEP_INPUTS) + ("state_in", "select_in"):
+        getattr(dut, name).value = 0
+    await clock_and_reset(dut.clk_in, dut.rst_in)
+
+
+@cocotb.test()
+async def test_rates(dut):
+    """Every toggle's flips over the last window, from the window after it"""
+    await setup(dut)
+    rng = np.random.default_rng(1)
+    windows = rng.integers(0, 8, size=(4, len(EVENTS)))
+    toggles = [0] * len(EVENTS)
+    for cycle in range(len(windows) * CLOCK_SPEED + CLOCK_SPEED // 2):
+        window, offset = divmod(cycle, CLOCK_SPEED)
+        if window < len(windows):
+            # events a few cycles apart, well clear of the window's ends
+            for i, name in enumerate(EVENTS):
+                if offset >= 10 and (offset - 10) % 6 == 0 and (offset - 10) // 6 < windows[window, i]:
+                    toggles[i] ^= 1
+                    getattr(dut, name).value = toggles[i]
+        if window >= 1 and offset == CLOCK_SPEED // 2:
+            telemetry = read_telemetry(dut)
+            rates = [telemetry[name] for name in RATES]
+            assert rates == windows[window - 1].tolist(), f"window {window - 1}: {rates}"
+        await FallingEdge(dut.clk_in)
+
+
+@cocotb.test()
+async def test_residency(dut):
+    """Cycles in every state, starting over once the state leaves 0"""
+    await setup(dut)
+    for run in range(2):
+        cycles = np.zeros(4, dtype=np.int64)
+        for state, length in [(1, 7 + run), (2, 11), (1, 3), (3, 2 * run), (2, 4), (0, 10)]:
+            dut.state_in.value = state
+            cycles[state] += length
+            for _ in range(length):
+                await FallingEdge(dut.clk_in)
+        assert residency(dut) == cycles.tolist(), f"run {run}: {residency(dut)}"
+        telemetry = read_telemetry(dut)
+        assert (telemetry["show_id_cycles"], telemetry["run_step_cycles"]) == (cycles[1], cycles[2])
+
+
+@cocotb.test()
+async def test_select(dut):
+    """value_out is TELEMETRY[select_in], 0 past the end"""
+    await setup(dut)
+    rng = np.random.default_rng(3)
+    for name, width in STEP_INPUTS.items():
+        getattr(dut, name).value = int(rng.integers(0, 1 << width))
+    dut.state_in.value = 2
+    for _ in range(5):
+        await FallingEdge(dut.clk_in)
+    # state 3 isn't in TELEMETRY, the values hold still from here
+    dut.state_in.value = 3
+    await FallingEdge(dut.clk_in)
+
+    telemetry = read_telemetry(dut)
+    for select in range(16):
+        dut.select_in.value = select
+        await Timer(1, "ns")
+        expected = telemetry[TELEMETRY[select]] if select < len(TELEMETRY) else 0
+        assert dut.value_out.value == expected, f"select {select}: {dut.value_out.value.integer}"
+
+
+TESTBENCH = Testbench(
+    toplevel="perf_counters",
+    sources=["common/perf_counters.sv"],
+    parameters={
+        "CLOCK_SPEED": CLOCK_SPEED,
+    },
+)
+
+
+def is_runner():
+    """Performance counters"""
+    TESTBENCH.run()
+
+
+if __name__ == "__main__":
+    is_runner()
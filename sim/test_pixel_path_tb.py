@@ -0,0 +1,111 @@
+import cocotb
+from cocotb.triggers import FallingEdge, RisingEdge
+import numpy as np
+
+from model.fixtures import reset
+from model.memfile import read_memh, write_memh
+from model.pixel_path import LOWER_THRESHOLD, UPPER_THRESHOLD, detect_masks, unpack_rgb565, ycrcb_planes
+from model.runner import SIM_PATH, Testbench, parameter
+
+HRES = parameter("HRES", 1280)
+VRES = parameter("VRES", 720)
+# result word fields, msb first
+FIELDS = {"red": 8, "green": 8, "blue": 8, "y": 8, "cr": 8, "cb": 8, "detect1": 1, "detect0": 1}
+
+
+async def setup(dut):
+    dut._log.info("Starting...")
+    # the wrapper generates clk_in itself
+    dut.start.value = 0
+    dut.num_pixels.value = 0
+    dut.lower_bound.value = LOWER_THRESHOLD
+    dut.upper_bound.value = UPPER_THRESHOLD
+    await reset(dut.clk_in, dut.rst_in)
+
+
+async def run_frame(dut, pixels, valid, lower=LOWER_THRESHOLD, upper=UPPER_THRESHOLD):
+    """Stream a frame through the pixel path, returns every output plane in the frame's shape."""
+    write_memh("pixels.mem", (valid.astype(np.int64) << 16) | pixels, 17)
+    await FallingEdge(dut.clk_in)
+    dut.lower_bound.value = lower
+    dut.upper_bound.value = upper
+    dut.num_pixels.value = pixels.size
+    dut.start.value = 1
+    await FallingEdge(dut.clk_in)
+    dut.start.value = 0
+    await RisingEdge(dut.done)
+
+    words = read_memh("results.mem", depth=pixels.size)
+    results, shift = {}, 0
+    for name, width in reversed(FIELDS.items()):
+        results[name] = ((words >> shift) & ((1 << width) - 1)).reshape(pixels.shape)
+        shift += width
+    return results
+
+
+def check_frame(pixels, valid, results, lower=LOWER_THRESHOLD, upper=UPPER_THRESHOLD):
+    """Compare every plane against the model, reports the first wrong pixel of each."""
+    red, green, blue = unpack_rgb565(pixels, valid)
+    y, cr, cb = ycrcb_planes(pixels, valid)
+    detect0, detect1 = detect_masks(pixels, valid, lower, upper)
+    expected = {
+        "red": red,
+        "green": green,
+        "blue": blue,
+        "y": y,
+        "cr": cr,
+        "cb": cb,
+        "detect0": detect0,
+        "detect1": detect1,
+    }
+    for name, plane in expected.items():
+        wrong = np.argwhere(results[name] != plane)
+        if wrong.size:
+            at = tuple(int(i) for i in wrong[0])
+            raise AssertionError(
+                f"{name} is wrong for {len(wrong)} pixels, first at {at} "
+                f"(pixel {pixels[at]:#06x}, valid {valid[at]}): {results[name][at]} instead of {int(plane[at])}"
+            )
+
+
+@cocotb.test()
+async def test_random_frame(dut):
+    """Whole random frames, with pixels outside the frame buffer blanked"""
+    await setup(dut)
+    rng = np.random.default_rng(9)
+
+    for frame in range(2):
+        pixels = rng.integers(0, 1 << 16, size=(VRES, HRES))
+        valid = rng.random((VRES, HRES)) < 0.9
+        results = await run_frame(dut, pixels, valid)
+        check_frame(pixels, valid, results)
+        dut._log.info(f"Frame {frame}: {results['detect0'].sum()} red and {results['detect1'].sum()} blue pixels")
+
+
+@cocotb.test()
+async def test_all_colors(dut):
+    """Every RGB565 value against a few threshold windows, edges included"""
+    await setup(dut)
+
+    pixels = np.arange(1 << 16).reshape(256, 256)
+    valid = np.ones(pixels.shape, dtype=bool)
+    for lower, upper in [(LOWER_THRESHOLD, UPPER_THRESHOLD), (0x00, 0xFF), (0x40, 0xC0), (0x7F, 0x80), (0x90, 0x90)]:
+        check_frame(pixels, valid, await run_frame(dut, pixels, valid, lower, upper), lower, upper)
+
+
+TESTBENCH = Testbench(
+    toplevel="pixel_path_tb",
+    sources=[SIM_PATH / "tb" / "pixel_path_tb.sv"],
+    parameters={
+        "MAX_PIXELS": HRES * VRES,
+    },
+)
+
+
+def is_runner():
+    """Camera pixel path against the frame model"""
+    TESTBENCH.run()
+
+
+if __name__ == "__main__":
+    is_runner()
@@ -0,0 +1,185 @@
+import cocotb
+from cocotb.triggers import FallingEdge
+import numpy as np
+
+from model.fixtures import clock_and_reset
+from model.handles import SignalCache
+from model.runner import Testbench, parameter
+
+NUM_PIXELS = parameter("NUM_PIXELS", 64)
+SETTLE_FRAMES = parameter("SETTLE_FRAMES", 2)
+TOLERANCE_SHIFT = parameter("TOLERANCE_SHIFT", 3)
+
+
+async def setup(dut):
+    dut._log.info("Starting...")
+    for name in ("start_in", "new_frame_in", "pixel_valid_in", "mask_in"):
+        getattr(dut, name).value = 0
+    await clock_and_reset(dut.clk_in, dut.rst_in)
+    return SignalCache(dut)
+
+
+async def start(sig):
+    sig.start_in.value = 1
+    await FallingEdge(sig.clk_in)
+    sig.start_in.value = 0
+
+
+async def play_frame(sig, masks):
+    """Play one frame of ``{detect_1, detect_0}`` pixels, a gap cycle between each, then the new_frame pulse.
+
+    Returns ``settled_out`` after the frame boundary.
+    """
+    falling = FallingEdge(sig.clk_in)
+    for mask in masks:
+        sig.pixel_valid_in.value = 1
+        sig.mask_in.value = int(mask)
+        await falling
+        # only the sampled pixels count
+        sig.pixel_valid_in.value = 0
+        sig.mask_in.value = 3
+        await falling
+    sig.new_frame_in.value = 1
+    await falling
+    sig.new_frame_in.value = 0
+    return sig.settled_out.value.integer
+
+
+def pattern(rng, ones, lit=NUM_PIXELS):
+    """A frame with ``ones`` of its ``lit`` pixels on detect_1, the rest of them on detect_0 and the others dark"""
+    masks = np.zeros(NUM_PIXELS, dtype=np.int64)
+    masks[:lit] = 1
+    masks[:ones] = 2
+    return rng.permutation(masks)
+
+
+def flip(rng, masks, count):
+    """``masks`` with ``count`` of its lit pixels swapped between detect_0 and detect_1"""
+    masks = masks.copy()
+    masks[rng.choice(np.flatnonzero(masks), size=count, replace=False)] ^= 3
+    return masks
+
+
+@cocotb.test()
+async def test_settles(dut):
+    """Settles SETTLE_FRAMES frames after the masks stop changing"""
+    sig = await setup(dut)
+    rng = np.random.default_rng(1)
+    await start(sig)
+
+    # partial frame, then the old pattern, then the camera catching up
+    final = pattern(rng, NUM_PIXELS - 4)
+    transient = [pattern(rng, NUM_PIXELS // 8), pattern(rng, NUM_PIXELS // 8), pattern(rng, NUM_PIXELS // 2), final]
+    assert not await play_frame(sig, pattern(rng, 0)[: NUM_PIXELS // 3])
+    for frame, masks in enumerate(transient):
+        assert not await play_frame(sig, masks), f"settled during the transient at frame {frame}"
+
+    # the same masks from here on
+    for frame in range(SETTLE_FRAMES - 1):
+        assert not await play_frame(sig, final), f"settled after {frame + 1} stable frames"
+    assert await play_frame(sig, final), f"not settled after {SETTLE_FRAMES} stable frames"
+    assert sig.frames_out.value == len(transient) + SETTLE_FRAMES
+
+    # sticky until the next start
+    assert await play_frame(sig, pattern(rng, 0))
+    await start(sig)
+    assert not sig.settled_out.value
+    assert sig.frames_out.value == 0
+
+
+@cocotb.test()
+async def test_same_counts(dut):
+    """Masks that move to other pixels are a change, even with the same counts"""
+    sig = await setup(dut)
+    rng = np.random.default_rng(2)
+    await start(sig)
+    await play_frame(sig, [])
+    await play_frame(sig, pattern(rng, NUM_PIXELS // 2, NUM_PIXELS // 2))  # reference
+
+    for frame in range(2 * SETTLE_FRAMES):
+        masks = pattern(rng, NUM_PIXELS // 2, NUM_PIXELS // 2)
+        assert not await play_frame(sig, masks), f"settled at frame {frame} with the same counts"
+    for frame in range(SETTLE_FRAMES - 1):
+        assert not await play_frame(sig, masks)
+    assert await play_frame(sig, masks)
+
+
+@cocotb.test()
+async def test_tolerance(dut):
+    """Up to lit >> TOLERANCE_SHIFT changed samples are stable, one more starts the count over"""
+    sig = await setup(dut)
+    rng = np.random.default_rng(3)
+    for lit in (NUM_PIXELS, NUM_PIXELS // 4):
+        tolerance = lit >> TOLERANCE_SHIFT
+        await start(sig)
+        masks = pattern(rng, lit // 2, lit)
+        await play_frame(sig, masks[:5])  # partial frame
+        await play_frame(sig, masks)  # reference
+
+        frames = 0
+        for count in [tolerance] * (SETTLE_FRAMES - 1) + [tolerance + 1]:
+            frames += 1
+            masks = flip(rng, masks, count)
+            assert not await play_frame(sig, masks), f"{lit} lit: settled at frame {frames}"
+        for frame in range(SETTLE_FRAMES):
+            masks = flip(rng, masks, tolerance)
+            settled = await play_frame(sig, masks)
+            assert settled == (frame == SETTLE_FRAMES - 1), f"{lit} lit: settled {settled} after {frame + 1} frames"
+
+
+@cocotb.test()
+async def test_old_pattern(dut):
+    """A camera still on the pattern from before start_in does not settle, however long it holds it"""
+    sig = await setup(dut)
+    rng = np.random.default_rng(4)
+    old = pattern(rng, NUM_PIXELS // 2)
+    new = pattern(rng, NUM_PIXELS // 2)
+    await play_frame(sig, old)  # showing before the step
+    await start(sig)
+    await play_frame(sig, old[: NUM_PIXELS // 3])  # partial frame
+
+    for frame in range(SETTLE_FRAMES + 1):
+        assert not await play_frame(sig, old), f"settled on the old pattern at frame {frame}"
+    assert not await play_frame(sig, new)
+    for frame in range(SETTLE_FRAMES - 1):
+        assert not await play_frame(sig, new), f"settled after {frame + 1} stable frames"
+    assert await play_frame(sig, new), f"not settled after {SETTLE_FRAMES} stable frames"
+    assert sig.frames_out.value == SETTLE_FRAMES + 2 + SETTLE_FRAMES
+
+
+@cocotb.test()
+async def test_both_masks(dut):
+    """A change on detect_0 alone is not stable either"""
+    sig = await setup(dut)
+    await start(sig)
+    await play_frame(sig, [])
+    await play_frame(sig, [1] * NUM_PIXELS)
+    # detect_1 stays at 0 while detect_0 drops out
+    assert not await play_frame(sig, [0] * NUM_PIXELS)
+    for frame in range(SETTLE_FRAMES - 1):
+        assert not await play_frame(sig, [0] * NUM_PIXELS)
+    assert await play_frame(sig, [0] * NUM_PIXELS)
+
+
+TESTBENCH = Testbench(
+    toplevel="settle_detector",
+    sources=["calibration/settle_detector.sv"],
+    parameters={
+        "NUM_PIXELS": NUM_PIXELS,
+        "SETTLE_FRAMES": SETTLE_FRAMES,
+        "TOLERANCE_SHIFT": TOLERANCE_SHIFT,
+    },
+    sweeps={
+        # no changed sample is noise on 64 pixels
+        "three_frames": {"SETTLE_FRAMES": 3, "TOLERANCE_SHIFT": 7},
+    },
+)
+
+
+def is_runner():
+    """Camera settle detector on small frames"""
+    TESTBENCH.run()
+
+
+if __name__ == "__main__":
+    is_runner()
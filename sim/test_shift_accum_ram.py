@@ -1,24 +1,19 @@
-import os
-import sys
-from pathlib import Path
-import typing
-from collections import deque
-
 import cocotb
-from cocotb.clock import Clock
-from cocotb.runner import get_runner
 from cocotb.triggers import ClockCycles, FallingEdge, RisingEdge
+import numpy as np
+
+from model.fixtures import reset, start_clock
+from model.runner import Testbench, parameter
+from model.stream import ReadyValidDriver
 
-WIDTH = 10
+WIDTH = parameter("WIDTH", 10)
+DEPTH = parameter("DEPTH", 32)
 
 
 async def setup(dut):
     dut._log.info("Starting...")
-    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
-    dut.rst_in.value = 1
-    await ClockCycles(dut.clk_in, 3)
-    await FallingEdge(dut.clk_in)
-    dut.rst_in.value = 0
+    start_clock(dut.clk_in)
+    await reset(dut.clk_in, dut.rst_in)
 
     dut.request_type_in.value = 1  # write
     dut.request_valid_in.value = 0
@@ -108,19 +103,14 @@ async def test_pipelined(dut):
         12: [0, 1, 0, 0, 1, 1, 0, 1],
     }
 
-    # unzip the summands into a list of tuples
-    summands = list(zip(*addr_summands.values()))
-
-    dut.request_valid_in.value = 1
-    for summand_set in summands:
-        for i, addr in enumerate(addr_summands.keys()):
-            dut.addr_in.value = addr
-            dut.summand_in.value = summand_set[i]
-
-            dut._log.info(f"Setting summand to {summand_set[i]}")
+    # interleave the addresses, one write every cycle
+    summands = np.array(list(addr_summands.values())).T
+    addrs = np.broadcast_to(list(addr_summands.keys()), summands.shape)
 
-            # dut.request_valid_in.value = 0
-            await ClockCycles(dut.clk_in, 1)
+    requests = ReadyValidDriver(
+        dut, dut.clk_in, "request_valid_in", ["addr_in", "summand_in", "request_type_in"]
+    )
+    await requests.send(addr_in=addrs.ravel(), summand_in=summands.ravel(), request_type_in=1)
 
     for addr, expected_bits in addr_summands.items():
         expected = (
@@ -143,6 +133,34 @@ async def test_pipelined(dut):
     await ClockCycles(dut.clk_in, 20)
 
 
+@cocotb.test()
+async def test_back_to_back(dut):
+    """One address written every cycle, each write sees the one before it"""
+    await setup(dut)
+    summands = [1, 0, 1, 1, 0, 0, 1, 1, 1, 0]
+    addrs = [20] * len(summands) + [21, 20, 21, 20]
+    summands += [1, 1, 0, 1]
+
+    requests = ReadyValidDriver(
+        dut, dut.clk_in, "request_valid_in", ["addr_in", "summand_in", "request_type_in"]
+    )
+    await requests.send(addr_in=addrs, summand_in=summands, request_type_in=1)
+
+    expected = {}
+    for addr, summand in zip(addrs, summands):
+        expected[addr] = ((expected.get(addr, 0) << 1) | summand) % 2**WIDTH
+    for addr, value in expected.items():
+        dut.request_type_in.value = 0  # read
+        dut.addr_in.value = addr
+        dut.request_valid_in.value = 1
+        await ClockCycles(dut.clk_in, 1)
+        dut.request_valid_in.value = 0
+        await ClockCycles(dut.clk_in, 1)
+        await FallingEdge(dut.clk_in)
+        assert dut.read_out.value == value, f"addr {addr} reads {dut.read_out.value.integer}, expected {value}"
+        await ClockCycles(dut.clk_in, 2)
+
+
 @cocotb.test()
 async def test_disabling_and_overwriting(dut):
     """Test for driving first pixel a correct color"""
@@ -232,37 +250,23 @@ async def test_disabling_and_overwriting(dut):
     await ClockCycles(dut.clk_in, 20)
 
 
+TESTBENCH = Testbench(
+    toplevel="shift_accum_ram",
+    sources=["mem/shift_accum_ram.sv"],
+    parameters={
+        "WIDTH": WIDTH,
+        "DEPTH": DEPTH,
+    },
+    sweeps={
+        # calibration_step_fsm's table: one entry per 4x4 block of 1280x720, up to 1024 LEDs
+        "calibration_table": {"WIDTH": 11, "DEPTH": 320 * 180},
+    },
+)
+
+
 def is_runner():
     """LED Driver Tester."""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    sim = os.getenv("SIM", "icarus")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "mem" / "shift_accum_ram.sv"]
-    build_test_args = ["-Wall"]
-    parameters = {
-        "WIDTH": WIDTH,
-        "DEPTH": 32,
-    }
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="shift_accum_ram",
-        includes=[proj_path / "hdl"],
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale=("1ns", "1ps"),
-        waves=True,
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="shift_accum_ram",
-        test_module="test_shift_accum_ram",
-        test_args=run_test_args,
-        waves=True,
-    )
+    TESTBENCH.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,134 @@
+import cocotb
+from cocotb.triggers import FallingEdge, RisingEdge
+import numpy as np
+
+from model.fixtures import reset
+from model.memfile import read_memh, write_memh
+from model.runner import SIM_PATH, Testbench, parameter
+from model.shift_accum import ShiftAccumModel
+
+WIDTH = parameter("WIDTH", 8)
+DEPTH = parameter("DEPTH", 64)  # few addresses, so back-to-back requests keep hitting each other
+MAX_CYCLES = parameter("MAX_CYCLES", 1 << 20)
+SUMMAND_WIDTH = parameter("SUMMAND_WIDTH", 1)
+ADDR_WIDTH = (DEPTH - 1).bit_length()
+# result word fields, msb first
+FIELDS = {"valid": 1, "request_type": 2, "summand": SUMMAND_WIDTH, "addr": ADDR_WIDTH, "read_out": WIDTH, "sum_out": WIDTH}
+# the RAM keeps its contents from one test to the next, so does the model
+MODEL = ShiftAccumModel(WIDTH, DEPTH, summand_width=SUMMAND_WIDTH)
+
+
+async def setup(dut):
+    dut._log.info("Starting...")
+    # the wrapper generates clk_in itself
+    dut.start.value = 0
+    dut.num_cycles.value = 0
+    await reset(dut.clk_in, dut.rst_in)
+    return MODEL
+
+
+async def run_batch(dut, valid, request_type, summand, addr):
+    """Play one request per cycle through the wrapper, returns the captured outputs per cycle."""
+    request = valid.astype(np.int64) << (ADDR_WIDTH + SUMMAND_WIDTH + 2)
+    request |= (request_type << (ADDR_WIDTH + SUMMAND_WIDTH)) | (summand << ADDR_WIDTH) | addr
+    write_memh("requests.mem", request, ADDR_WIDTH + SUMMAND_WIDTH + 3)
+    await FallingEdge(dut.clk_in)
+    dut.num_cycles.value = len(request)
+    dut.start.value = 1
+    await FallingEdge(dut.clk_in)
+    dut.start.value = 0
+    await RisingEdge(dut.done)
+
+    words = read_memh("results.mem", depth=len(request))
+    results, shift = {}, 0
+    for name, width in reversed(FIELDS.items()):
+        results[name] = (words >> shift) & ((1 << width) - 1)
+        shift += width
+    return results
+
+
+def check_batch(model, valid, request_type, summand, addr, results):
+    """Compare a batch against the model, which is advanced past it."""
+    assert (results["valid"] == valid).all(), "result_valid_out does not follow request_valid_in"
+    cycle = np.flatnonzero(valid)
+    read_out, sum_out = model.apply(addr[cycle], request_type[cycle], summand[cycle], cycle)
+    expected = {
+        "request_type": request_type[cycle],
+        "summand": summand[cycle],
+        "addr": addr[cycle],
+        "read_out": read_out,
+        "sum_out": sum_out,
+    }
+    for name, values in expected.items():
+        wrong = np.flatnonzero(results[name][cycle] != values)
+        if wrong.size:
+            c = cycle[wrong[0]]
+            raise AssertionError(
+                f"{name} is wrong for {wrong.size} requests, first in cycle {c} "
+                f"(addr {addr[c]}, request type {request_type[c]}, summand {summand[c]}): "
+                f"{results[name][c]} instead of {values[wrong[0]]}"
+            )
+
+
+def random_traffic(rng, cycles, p_valid=0.9, types=(0.2, 0.6, 0.15, 0.05), addresses=DEPTH):
+    """Random requests, ``types`` are the READ/WRITE/WRITE_OVER/DISABLE probabilities."""
+    return (
+        rng.random(cycles) < p_valid,
+        rng.choice(4, size=cycles, p=types),
+        rng.integers(0, 1 << SUMMAND_WIDTH, size=cycles),
+        rng.integers(0, addresses, size=cycles),
+    )
+
+
+@cocotb.test()
+async def test_random(dut):
+    """Millions of random requests, one per cycle with a few bubbles"""
+    model = await setup(dut)
+    rng = np.random.default_rng(8)
+
+    for batch in range(2):
+        traffic = random_traffic(rng, MAX_CYCLES)
+        results = await run_batch(dut, *traffic)
+        check_batch(model, *traffic, results)
+        dut._log.info(f"Batch {batch}: {traffic[0].sum()} requests match the model")
+
+
+@cocotb.test()
+async def test_hazards(dut):
+    """Back-to-back requests to two addresses, every request lands in the hazard window"""
+    model = await setup(dut)
+    rng = np.random.default_rng(9)
+
+    # plain writes only, so values grow until they lock themselves out at all ones
+    traffic = random_traffic(rng, 4096, p_valid=1, types=(0, 1, 0, 0), addresses=2)
+    check_batch(model, *traffic, await run_batch(dut, *traffic))
+
+    traffic = random_traffic(rng, 4096, p_valid=1, types=(0.25, 0.25, 0.25, 0.25), addresses=2)
+    check_batch(model, *traffic, await run_batch(dut, *traffic))
+
+
+TESTBENCH = Testbench(
+    toplevel="shift_accum_ram_tb",
+    sources=[SIM_PATH / "tb" / "shift_accum_ram_tb.sv"],
+    parameters={
+        "WIDTH": WIDTH,
+        "DEPTH": DEPTH,
+        "MAX_CYCLES": MAX_CYCLES,
+        "SUMMAND_WIDTH": SUMMAND_WIDTH,
+    },
+    sweeps={
+        # calibration_step_fsm's table: one entry per 4x4 block of 1280x720, up to 1024 LEDs
+        "calibration_table": {"WIDTH": 11, "DEPTH": 320 * 180},
+        # three address bits per calibration step
+        "symbols": {"WIDTH": 12, "DEPTH": 320 * 180, "SUMMAND_WIDTH": 3},
+    },
+)
+
+
+def is_runner():
+    """Shift accumulate RAM against the reference model"""
+    TESTBENCH.run()
+
+
+if __name__ == "__main__":
+    is_runner()
@@ -0,0 +1,130 @@
+import cocotb
+from cocotb.triggers import ClockCycles, FallingEdge
+import numpy as np
+
+from model.fixtures import clock_and_reset
+from model.runner import Testbench, parameter
+from model.shift_accum import DISABLE, READ, WRITE, WRITE_OVER
+from model.stream import ReadyValidDriver
+
+WIDTH = parameter("WIDTH", 10)
+BLOCKS = parameter("BLOCKS", 256)
+SLOTS = parameter("SLOTS", 40)
+READ_LATENCY = 5
+DISABLED = 2**WIDTH - 1
+
+
+async def setup(dut):
+    dut._log.info("Starting...")
+    dut.allocate_in.value = 0
+    dut.request_valid_in.value = 0
+    await clock_and_reset(dut.clk_in, dut.rst_in)
+    return ReadyValidDriver(dut, dut.clk_in, "request_valid_in", ["addr_in", "summand_in", "request_type_in"])
+
+
+async def allocate(dut, drv, occupied, rng):
+    """One request per block in order, like a capture frame: WRITE_OVER of 1 where ``occupied``"""
+    await FallingEdge(dut.clk_in)
+    dut.allocate_in.value = 1
+    await ClockCycles(dut.clk_in, 2)
+    # the blocks come a few pixels apart
+    strobe = np.zeros(BLOCKS * 3, dtype=bool)
+    strobe[np.sort(rng.choice(strobe.size, BLOCKS, replace=False))] = True
+    types = np.where(occupied, WRITE_OVER, DISABLE)
+    await drv.send(strobe=strobe, addr_in=np.arange(BLOCKS), summand_in=1, request_type_in=types)
+    await ClockCycles(dut.clk_in, READ_LATENCY)
+    await FallingEdge(dut.clk_in)
+    dut.allocate_in.value = 0
+    await ClockCycles(dut.clk_in, 2)
+
+
+async def read_all(dut):
+    """READ every block back to back, one per cycle"""
+    table = np.zeros(BLOCKS, dtype=np.int64)
+    dut.request_type_in.value = READ
+    dut.request_valid_in.value = 1
+    for i in range(BLOCKS + READ_LATENCY):
+        await FallingEdge(dut.clk_in)
+        if i >= READ_LATENCY:
+            table[i - READ_LATENCY] = dut.read_out.value.integer
+        if i < BLOCKS:
+            dut.addr_in.value = i
+    dut.request_valid_in.value = 0
+    return table
+
+
+def slotted(occupied):
+    """The blocks that get a slot: the first SLOTS occupied ones"""
+    return occupied & (np.cumsum(occupied) <= SLOTS)
+
+
+@cocotb.test()
+async def test_allocate(dut):
+    """Occupied blocks get slots in block order until they run out, every other block reads disabled"""
+    drv = await setup(dut)
+    rng = np.random.default_rng(1)
+    occupied = rng.random(BLOCKS) < 1.5 * SLOTS / BLOCKS
+    assert occupied.sum() > SLOTS, "the test should run out of slots"
+    await allocate(dut, drv, occupied, rng)
+    assert dut.slots_used_out.value == SLOTS
+
+    table = await read_all(dut)
+    expected = np.where(slotted(occupied), 1, DISABLED)
+    wrong = np.flatnonzero(table != expected)
+    assert wrong.size == 0, f"{wrong.size} blocks read wrong, first is {wrong[0]}: {table[wrong[0]]}"
+
+
+@cocotb.test()
+async def test_accumulate(dut):
+    """Writes shift into the occupied blocks' slots at full rate, in any order, and skip the rest"""
+    drv = await setup(dut)
+    rng = np.random.default_rng(2)
+    occupied = rng.random(BLOCKS) < 0.5 * SLOTS / BLOCKS
+    await allocate(dut, drv, occupied, rng)
+    assert dut.slots_used_out.value == occupied.sum()
+
+    expected = np.where(occupied, 1, DISABLED)
+    for step in range(3):
+        # every block once per step, so no block is written twice within the RAM's read-modify-write
+        order = rng.permutation(BLOCKS)
+        summands = rng.integers(0, 2, size=BLOCKS)
+        types = np.where(rng.random(BLOCKS) < 0.05, DISABLE, WRITE)
+        await drv.send(addr_in=order, summand_in=summands, request_type_in=types)
+        await ClockCycles(dut.clk_in, READ_LATENCY + 2)
+        shifted = ((expected[order] << 1) | summands) & DISABLED
+        locked = (types == DISABLE) | (expected[order] == DISABLED)
+        expected[order] = np.where(occupied[order] & ~locked, shifted, DISABLED)
+
+    table = await read_all(dut)
+    wrong = np.flatnonzero(table != expected)
+    assert wrong.size == 0, f"{wrong.size} blocks read wrong, first is {wrong[0]}: {table[wrong[0]]}"
+
+    # a new allocation starts over
+    occupied = rng.random(BLOCKS) < 0.5 * SLOTS / BLOCKS
+    await allocate(dut, drv, occupied, rng)
+    table = await read_all(dut)
+    assert (table == np.where(occupied, 1, DISABLED)).all()
+
+
+TESTBENCH = Testbench(
+    toplevel="sparse_accum_table",
+    sources=["mem/sparse_accum_table.sv"],
+    parameters={
+        "WIDTH": WIDTH,
+        "BLOCKS": BLOCKS,
+        "SLOTS": SLOTS,
+    },
+    sweeps={
+        # calibration_step_fsm's table with room for 4096 lit blocks of 1280x720, up to 1024 LEDs
+        "calibration_table": {"WIDTH": 11, "BLOCKS": 320 * 180, "SLOTS": 4096},
+    },
+)
+
+
+def is_runner():
+    """Sparse shift accumulate table"""
+    TESTBENCH.run()
+
+
+if __name__ == "__main__":
+    is_runner()
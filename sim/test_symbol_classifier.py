@@ -0,0 +1,84 @@
+import cocotb
+from cocotb.triggers import FallingEdge
+import numpy as np
+
+from model.fixtures import clock_and_reset
+from model.handles import SignalCache
+from model.pixel_path import SYMBOL_COLORS, SYMBOL_MARGIN, classify_symbols, ycrcb_planes
+from model.runner import Testbench, parameter
+
+BITS_PER_STEP = parameter("BITS_PER_STEP", 2)
+
+
+async def classify(dut, cr, cb, margin):
+    """Play ``(cr, cb)`` pairs one per cycle, returns the ``(symbol, valid)`` the DUT decoded for each."""
+    sig = SignalCache(dut)
+    sig.margin_in.value = margin
+    falling = FallingEdge(dut.clk_in)
+    symbols, valid = [], []
+    for i in range(len(cr)):
+        sig.cr_in.value = int(cr[i])
+        sig.cb_in.value = int(cb[i])
+        await falling  # registered, out after the rising edge in between
+        symbols.append(sig.symbol_out.value.integer)
+        valid.append(sig.valid_out.value.integer)
+    return np.array(symbols), np.array(valid, dtype=bool)
+
+
+def assert_matches(cr, cb, margin, symbols, valid):
+    expected_symbols, expected_valid = classify_symbols(cr, cb, BITS_PER_STEP, margin)
+    wrong = np.flatnonzero((valid != expected_valid) | (expected_valid & (symbols != expected_symbols)))
+    if wrong.size:
+        i = wrong[0]
+        raise AssertionError(
+            f"{wrong.size} wrong, first Cr {cr[i]:#04x} Cb {cb[i]:#04x} margin {margin}: "
+            f"symbol {symbols[i]} valid {valid[i]} instead of {expected_symbols[i]} valid {expected_valid[i]}"
+        )
+
+
+@cocotb.test()
+async def test_all_chroma(dut):
+    """Every Cr/Cb pair against the model"""
+    await clock_and_reset(dut.clk_in, dut.rst_in)
+    cr, cb = (plane.ravel() for plane in np.meshgrid(np.arange(256), np.arange(256)))
+    for margin in (SYMBOL_MARGIN, 0):
+        assert_matches(cr, cb, margin, *await classify(dut, cr, cb, margin))
+
+
+@cocotb.test()
+async def test_symbol_colors(dut):
+    """id_shower's colors decode to their own symbol down to half brightness"""
+    await clock_and_reset(dut.clk_in, dut.rst_in)
+    colors = np.array(SYMBOL_COLORS[BITS_PER_STEP], dtype=float)
+    for brightness in (1.0, 0.75, 0.5):
+        red, green, blue = (np.floor(colors[:, channel] * brightness).astype(np.int64) for channel in range(3))
+        pixels = ((red >> 3) << 11) | ((green >> 2) << 5) | (blue >> 3)
+        _, cr, cb = ycrcb_planes(pixels)
+        symbols, valid = await classify(dut, cr, cb, SYMBOL_MARGIN)
+        assert valid.all(), f"symbols {np.flatnonzero(~valid)} are ambiguous at {brightness:.0%} brightness"
+        assert (symbols == np.arange(len(colors))).all(), f"decoded {symbols} at {brightness:.0%} brightness"
+        # black is ambiguous
+        _, cr, cb = ycrcb_planes(0)
+        assert not (await classify(dut, [cr], [cb], SYMBOL_MARGIN))[1][0], "black decodes to a symbol"
+
+
+TESTBENCH = Testbench(
+    toplevel="symbol_classifier",
+    sources=["pixel/symbol_classifier.sv"],
+    parameters={
+        "BITS_PER_STEP": BITS_PER_STEP,
+    },
+    sweeps={
+        "bits_1": {"BITS_PER_STEP": 1},
+        "bits_3": {"BITS_PER_STEP": 3},
+    },
+)
+
+
+def is_runner():
+    """Symbol classifier against the pixel path model"""
+    TESTBENCH.run()
+
+
+if __name__ == "__main__":
+    is_runner()
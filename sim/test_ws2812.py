@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from model.ws2812 import WS2812DecodeError, WS2812Timing, decode_edges, decode_samples, run_lengths
+
+CLOCK_SPEED = 100_000_000
+PERIOD_NS = 1e9 / CLOCK_SPEED
+TIMING = WS2812Timing.from_clock_speed(CLOCK_SPEED)
+
+
+def cycles(duration_ns):
+    return int(round(duration_ns / PERIOD_NS))
+
+
+def bit_samples(bit, high_ns=None, low_ns=None):
+    """One bit as led_driver sends it, with the high or low time overridden"""
+    high = cycles(high_ns if high_ns is not None else TIMING.t1h if bit else TIMING.t0h)
+    low = cycles(low_ns if low_ns is not None else TIMING.t1l if bit else TIMING.t0l)
+    return [1] * high + [0] * low
+
+
+def led_bits(colors):
+    """The wire bits of ``colors`` (LEDs x GRB), MSB first"""
+    return np.unpackbits(np.asarray(colors, dtype=np.uint8).reshape(-1, 1), axis=1).ravel()
+
+
+def frame_samples(colors, latch=True):
+    """A refresh of ``colors``, ended by a reset unless ``latch`` is off"""
+    samples = [s for bit in led_bits(colors) for s in bit_samples(bit)]
+    return samples + [0] * (cycles(TIMING.res) if latch else 0)
+
+
+def to_edges(samples):
+    """Edge times and levels of a sampled waveform, and its end time"""
+    levels, lengths = run_lengths(samples)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    return starts * PERIOD_NS, levels, len(samples) * PERIOD_NS
+
+
+def test_frame():
+    """A multi-LED refresh decodes to its colors, from samples and from edges alike"""
+    colors = np.random.default_rng(1).integers(0, 256, size=(4, 3), dtype=np.uint8)
+    samples = [0] * 100 + frame_samples(colors)
+
+    frames = decode_samples(samples, num_leds=4)
+    assert frames.shape == (1, 4, 3)
+    assert (frames[0] == colors).all()
+    times, levels, end = to_edges(samples)
+    assert (decode_edges(times, levels, num_leds=4, end_time_ns=end) == frames).all()
+
+    # a shorter strand forwards the extra LEDs off its end
+    assert (decode_samples(samples, num_leds=3)[0] == colors[:3]).all()
+
+
+def test_latch_and_hold():
+    """Every reset latches a frame, LEDs that get no new color keep the last one"""
+    first = np.array([[1, 2, 3], [4, 5, 6], [7, 8, 9]], dtype=np.uint8)
+    second = np.array([[0xFF, 0x00, 0x80]], dtype=np.uint8)
+    samples = frame_samples(first) + frame_samples(second)
+
+    frames = decode_samples(samples, num_leds=3)
+    assert frames.shape == (2, 3, 3)
+    assert (frames[0] == first).all()
+    assert (frames[1, 0] == second[0]).all()
+    assert (frames[1, 1:] == first[1:]).all(), "LEDs past the second refresh should hold"
+
+    times, levels, end = to_edges(samples)
+    assert (decode_edges(times, levels, num_leds=3, end_time_ns=end) == frames).all()
+
+
+@pytest.mark.parametrize(
+    "high_ns, low_ns",
+    [
+        ((TIMING.t0h + TIMING.t1h) / 2, None),  # between T0H and T1H
+        (TIMING.t1h + 2 * TIMING.tolerance, None),  # too long for T1H
+        (None, (TIMING.t0l + TIMING.t1l) / 2),  # neither T0L, T1L nor a reset
+    ],
+)
+def test_bad_timing(high_ns, low_ns):
+    """A bit out of tolerance in the middle of a refresh does not decode"""
+    bits = led_bits([[0x12, 0x34, 0x56]])
+    samples = [s for bit in bits[:10] for s in bit_samples(bit)]
+    samples += bit_samples(bits[10], high_ns, low_ns)
+    samples += [s for bit in bits[11:] for s in bit_samples(bit)] + [0] * cycles(TIMING.res)
+    with pytest.raises(WS2812DecodeError):
+        decode_samples(samples, num_leds=1)
+
+
+def test_partial_word():
+    """A refresh that is not a whole number of LEDs does not decode, an unlatched tail is dropped"""
+    colors = np.array([[10, 20, 30], [40, 50, 60]], dtype=np.uint8)
+    partial = [s for bit in led_bits(colors)[:36] for s in bit_samples(bit)] + [0] * cycles(TIMING.res)
+    with pytest.raises(WS2812DecodeError):
+        decode_samples(partial, num_leds=2)
+
+    # the capture ends before the last refresh latched
+    samples = frame_samples(colors) + frame_samples(colors[::-1], latch=False)
+    assert decode_samples(samples, num_leds=2).shape == (1, 2, 3)
+    frames = decode_samples(samples, num_leds=2, latch_at_end=True)
+    assert (frames[1] == colors[::-1]).all()
+
+    # and latching half a word at the end is as wrong as a reset after it
+    samples = frame_samples(colors) + [s for bit in led_bits(colors)[:12] for s in bit_samples(bit)]
+    assert decode_samples(samples, num_leds=2).shape == (1, 2, 3)
+    with pytest.raises(WS2812DecodeError):
+        decode_samples(samples, num_leds=2, latch_at_end=True)